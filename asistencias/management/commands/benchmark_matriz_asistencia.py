@@ -0,0 +1,39 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from asistencias.matriz import LETRA_ESTADO, MatrizAsistencia
+
+ESTADOS = list(LETRA_ESTADO)
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el armado de la matriz de asistencia estudiante × fecha (celdas, totales y filas para la "
+        "plantilla) con tuplas sintéticas en memoria (no consulta la base de datos)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--estudiantes', type=int, default=300)
+        parser.add_argument('--dias', type=int, default=120)
+        parser.add_argument('--repeticiones', type=int, default=5)
+
+    def handle(self, *args, **options):
+        fechas = [date(2025, 1, 6) + timedelta(days=i) for i in range(options['dias'])]
+        filas = [
+            (i, f'Nombre{i}', f'Apellido{i}', f'{i:010d}', fecha, ESTADOS[(i + j) % 4], 'Curso de Guitarra')
+            for i in range(1, options['estudiantes'] + 1)
+            for j, fecha in enumerate(fechas)
+        ]
+        tiempos = []
+        for _ in range(options['repeticiones']):
+            inicio = time.perf_counter()
+            matriz = MatrizAsistencia.desde_filas(filas, campos=('curso',))
+            matriz.filas
+            matriz.totales_fecha
+            matriz.totales
+            tiempos.append(time.perf_counter() - inicio)
+        self.stdout.write(self.style.SUCCESS(
+            f"Matriz {options['estudiantes']} × {options['dias']} ({len(filas)} celdas): "
+            f"mejor {min(tiempos) * 1000:.1f} ms, promedio {sum(tiempos) / len(tiempos) * 1000:.1f} ms"
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from asistencias.models import AsistenciaDiaria
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresca el resumen diario de asistencias (clase, fecha) usando fecha_modificacion como marca. "
+        "Programarlo (cron, systemd timer) para los cambios que no pasan por registrar_asistencias"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--completo',
+            action='store_true',
+            help='Recalcula todos los pares (clase, fecha) en lugar de solo los modificados',
+        )
+
+    def handle(self, *args, **options):
+        pares = AsistenciaDiaria.objects.refrescar(completo=options['completo'])
+        self.stdout.write(self.style.SUCCESS(f"Resumen de asistencias actualizado: {pares} pares (clase, fecha)."))
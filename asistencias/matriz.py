@@ -0,0 +1,146 @@
+"""
+Matriz de asistencia estudiante × fecha.
+
+Las tablas cruzadas (reporte de asistencias del administrador, vista y PDF del
+profesor) se arman con las tuplas de values_list() en un bytearray de un byte
+por celda: 0 = sin registro, 1..4 = estado, en el orden de CAMPOS_RESUMEN. Los
+totales por fila, por fecha y generales se cuentan con bytes.count() sobre
+cortes del arreglo (en C, sin recorrer las celdas en Python) y las plantillas
+reciben las filas ya armadas, sin buscar cada celda en un diccionario.
+"""
+from collections import namedtuple
+from functools import cached_property
+
+from usuarios.models import Usuario
+from .models import CAMPOS_RESUMEN, EstadoAsistencia
+
+Celda = namedtuple('Celda', 'codigo estado letra')
+
+LETRA_ESTADO = {
+    EstadoAsistencia.PRESENTE: 'P',
+    EstadoAsistencia.TARDE: 'T',
+    EstadoAsistencia.AUSENTE: 'A',
+    EstadoAsistencia.JUSTIFICADO: 'J',
+}
+CODIGO_ESTADO = {estado: codigo for codigo, estado in enumerate(CAMPOS_RESUMEN.values(), start=1)}
+CODIGO_CAMPO = {campo: CODIGO_ESTADO[estado] for campo, estado in CAMPOS_RESUMEN.items()}
+# Código -> celda que recibe la plantilla (compartidas por todas las filas)
+CELDAS = (Celda(0, None, '-'),) + tuple(
+    Celda(codigo, str(estado), LETRA_ESTADO[estado]) for estado, codigo in CODIGO_ESTADO.items()
+)
+
+CAMPOS_FILA = (
+    'matricula__estudiante_id',
+    'matricula__estudiante__first_name',
+    'matricula__estudiante__last_name',
+    'matricula__estudiante__cedula',
+    'fecha',
+    'estado',
+)
+
+
+def conteos(celdas):
+    """presentes, tardes, ausentes, justificados, asistio (P+T) y registros de un corte de la matriz"""
+    resultado = {campo: celdas.count(codigo) for campo, codigo in CODIGO_CAMPO.items()}
+    resultado['asistio'] = resultado['presentes'] + resultado['tardes']
+    resultado['registros'] = len(celdas) - celdas.count(0)
+    return resultado
+
+
+class MatrizAsistencia:
+    def __init__(self, estudiantes, datos, fechas, celdas):
+        self.estudiantes = estudiantes
+        self.datos = datos
+        self.fechas = fechas
+        self.celdas = celdas
+
+    @classmethod
+    def desde_filas(cls, filas, fechas=None, campos=()):
+        """
+        `filas`: tuplas (estudiante_id, nombre, apellido, cédula, fecha, estado,
+        *extras), con los extras nombrados por `campos` y tomados de la primera
+        fila de cada estudiante. `fechas`: columnas fijas (los registros fuera de
+        ellas no se muestran); si es None, las fechas con algún registro.
+        """
+        indices = {}
+        estudiantes = []
+        datos = []
+        registros = []
+        for fila in filas:
+            indice = indices.get(fila[0])
+            if indice is None:
+                indice = indices[fila[0]] = len(estudiantes)
+                estudiantes.append(Usuario(id=fila[0], first_name=fila[1], last_name=fila[2], cedula=fila[3]))
+                datos.append(dict(zip(campos, fila[6:])))
+            registros.append((indice, fila[4], CODIGO_ESTADO.get(fila[5], 0)))
+        if fechas is None:
+            fechas = sorted({fecha for _, fecha, _ in registros})
+        fechas = list(fechas)
+
+        # Filas por apellido y nombre
+        orden = sorted(
+            range(len(estudiantes)),
+            key=lambda i: (estudiantes[i].last_name or '', estudiantes[i].first_name or '', estudiantes[i].id),
+        )
+        inicio_fila = [0] * len(orden)
+        ancho = len(fechas)
+        for posicion, indice in enumerate(orden):
+            inicio_fila[indice] = posicion * ancho
+        columnas = {fecha: j for j, fecha in enumerate(fechas)}
+        celdas = bytearray(len(estudiantes) * ancho)
+        for indice, fecha, codigo in registros:
+            j = columnas.get(fecha)
+            if j is not None:
+                celdas[inicio_fila[indice] + j] = codigo
+        return cls([estudiantes[i] for i in orden], [datos[i] for i in orden], fechas, celdas)
+
+    def fila(self, i):
+        ancho = len(self.fechas)
+        return self.celdas[i * ancho:(i + 1) * ancho]
+
+    def columna(self, j):
+        return self.celdas[j::len(self.fechas)]
+
+    @cached_property
+    def totales(self):
+        return conteos(self.celdas)
+
+    @cached_property
+    def totales_fecha(self):
+        return [{'fecha': fecha, **conteos(self.columna(j))} for j, fecha in enumerate(self.fechas)]
+
+    @cached_property
+    def filas(self):
+        """Filas para las plantillas: estudiante, extras, conteos y celdas en orden de fecha"""
+        filas = []
+        for i, (estudiante, datos) in enumerate(zip(self.estudiantes, self.datos)):
+            celdas = self.fila(i)
+            filas.append({
+                'estudiante': estudiante,
+                **datos,
+                **conteos(celdas),
+                'celdas': [CELDAS[codigo] for codigo in celdas],
+            })
+        return filas
+
+    def bloques(self, tamano):
+        """Las filas partidas en bloques de `tamano` fechas, para tablas que no caben a lo ancho"""
+        return [
+            {
+                'fechas': self.fechas[k:k + tamano],
+                'filas': [{**fila, 'celdas': fila['celdas'][k:k + tamano]} for fila in self.filas],
+            }
+            for k in range(0, len(self.fechas), tamano)
+        ]
+
+
+def construir_matriz(asistencias, fechas=None, campos=None):
+    """
+    Matriz de un queryset de Asistencia ya filtrado, en una consulta. `campos`:
+    {nombre: lookup} de valores extra por estudiante (p. ej. el curso), tomados
+    de su registro más antiguo.
+    """
+    campos = campos or {}
+    # Orden fijo: la primera fila de cada estudiante (la que aporta los extras) es la de su primera fecha
+    filas = asistencias.order_by('fecha', 'id').values_list(*CAMPOS_FILA, *campos.values())
+    return MatrizAsistencia.desde_filas(filas.iterator(chunk_size=2000), fechas, tuple(campos))
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("asistencias", "0002_initial"),
+        ("horarios", "0004_horario_inscritos_activos"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MarcaAgregacion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("nombre", models.CharField(max_length=50, unique=True)),
+                ("hasta", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="AsistenciaDiaria",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("fecha", models.DateField()),
+                ("presentes", models.PositiveIntegerField(default=0)),
+                ("tardes", models.PositiveIntegerField(default=0)),
+                ("ausentes", models.PositiveIntegerField(default=0)),
+                ("justificados", models.PositiveIntegerField(default=0)),
+                (
+                    "pendiente",
+                    models.BooleanField(
+                        default=False,
+                        help_text="Marcado al eliminar asistencias; se recalcula en el próximo refresco",
+                    ),
+                ),
+                (
+                    "clase",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="resumenes_asistencia",
+                        to="horarios.horario",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("clase", "fecha")},
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("asistencias", "0003_asistencia_diaria"),
+        ("horarios", "0005_horario_codigo"),
+        ("matriculas", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="asistencia",
+            index=models.Index(
+                fields=["clase", "fecha"], name="asistencia_clase_fecha_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="asistencia",
+            index=models.Index(
+                fields=["fecha", "estado"], name="asistencia_fecha_estado_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("asistencias", "0004_asistencia_indices"),
+        ("horarios", "0006_horario_horario_vigencia_idx"),
+        ("matriculas", "0002_matricula_matricula_clase_estado_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="asistencia",
+            index=models.Index(
+                fields=["fecha_modificacion"], name="asistencia_modificacion_idx"
+            ),
+        ),
+    ]
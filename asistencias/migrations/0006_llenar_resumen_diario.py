@@ -0,0 +1,50 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:05
+
+from django.db import migrations
+from django.db.models import Count, Max, Q
+
+CAMPOS_RESUMEN = {
+    "presentes": "PRESENTE",
+    "tardes": "TARDE",
+    "ausentes": "AUSENTE",
+    "justificados": "JUSTIFICADO",
+}
+
+
+def llenar_resumen(apps, schema_editor):
+    # Primer refresco completo: el historial del panel solo lee el resumen
+    Asistencia = apps.get_model("asistencias", "Asistencia")
+    AsistenciaDiaria = apps.get_model("asistencias", "AsistenciaDiaria")
+    MarcaAgregacion = apps.get_model("asistencias", "MarcaAgregacion")
+
+    marca, _ = MarcaAgregacion.objects.get_or_create(nombre="asistencia_diaria")
+    if marca.hasta is not None:
+        return
+    conteos = (
+        Asistencia.objects.order_by()
+        .values("clase_id", "fecha")
+        .annotate(
+            **{
+                campo: Count("id", filter=Q(estado=estado))
+                for campo, estado in CAMPOS_RESUMEN.items()
+            }
+        )
+    )
+    AsistenciaDiaria.objects.all().delete()
+    AsistenciaDiaria.objects.bulk_create(
+        (AsistenciaDiaria(pendiente=False, **fila) for fila in conteos.iterator()),
+        batch_size=500,
+    )
+    marca.hasta = Asistencia.objects.aggregate(m=Max("fecha_modificacion"))["m"]
+    marca.save(update_fields=["hasta"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("asistencias", "0005_asistencia_modificacion_idx"),
+    ]
+
+    operations = [
+        migrations.RunPython(llenar_resumen, migrations.RunPython.noop),
+    ]
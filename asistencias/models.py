@@ -1,4 +1,7 @@
-from django.db import models
+from datetime import timedelta
+from django.db import connection, models, transaction
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import Coalesce
 from matriculas.models import Matricula
 from horarios.models import Horario
 
@@ -22,8 +25,14 @@ class Asistencia(models.Model):
     fecha_modificacion = models.DateTimeField(auto_now=True)
 
     class Meta:
+        # unique_together ya indexa (matricula, fecha)
         unique_together = ('matricula', 'fecha')
         ordering = ['-fecha', 'matricula__estudiante__first_name']
+        indexes = [
+            models.Index(fields=['clase', 'fecha'], name='asistencia_clase_fecha_idx'),
+            models.Index(fields=['fecha', 'estado'], name='asistencia_fecha_estado_idx'),
+            models.Index(fields=['fecha_modificacion'], name='asistencia_modificacion_idx'),
+        ]
 
     def __str__(self):
         return f"{self.matricula.estudiante.get_full_name()} - {self.fecha} - {self.estado}"
@@ -35,3 +44,133 @@ class Asistencia(models.Model):
     @property
     def curso(self):
         return self.matricula.clase.curso
+
+
+def opciones_upsert(unique_fields, update_fields):
+    """
+    Argumentos de bulk_create para insertar o actualizar por una clave única.
+    MySQL no acepta unique_fields (ON DUPLICATE KEY usa cualquier clave única).
+    """
+    opciones = {'update_conflicts': True, 'update_fields': update_fields}
+    if connection.features.supports_update_conflicts_with_target:
+        opciones['unique_fields'] = unique_fields
+    return opciones
+
+
+# Columna del resumen diario para cada estado de asistencia
+CAMPOS_RESUMEN = {
+    'presentes': EstadoAsistencia.PRESENTE,
+    'tardes': EstadoAsistencia.TARDE,
+    'ausentes': EstadoAsistencia.AUSENTE,
+    'justificados': EstadoAsistencia.JUSTIFICADO,
+}
+
+
+class MarcaAgregacion(models.Model):
+    """Última fecha_modificacion procesada por un proceso de agregación incremental"""
+    nombre = models.CharField(max_length=50, unique=True)
+    hasta = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.nombre} hasta {self.hasta}"
+
+
+class AsistenciaDiariaQuerySet(models.QuerySet):
+    MARCA = 'asistencia_diaria'
+    # Solapamiento para no perder filas de transacciones que confirmaron tarde
+    SOLAPAMIENTO = timedelta(minutes=5)
+
+    def refrescar(self, completo=False):
+        """
+        Recalcula los pares (clase, fecha) modificados desde la última marca
+        (o todos si completo=True). Devuelve la cantidad de pares recalculados.
+        """
+        MarcaAgregacion.objects.get_or_create(nombre=self.MARCA)
+        with transaction.atomic():
+            marca = MarcaAgregacion.objects.select_for_update().get(nombre=self.MARCA)
+            cambios = Asistencia.objects.order_by()
+            if not completo and marca.hasta:
+                cambios = cambios.filter(fecha_modificacion__gt=marca.hasta - self.SOLAPAMIENTO)
+            nueva_marca = cambios.aggregate(m=Max('fecha_modificacion'))['m'] or marca.hasta
+
+            pares = set(cambios.values_list('clase_id', 'fecha').distinct())
+            existentes = self.model.objects.all() if completo else self.model.objects.filter(pendiente=True)
+            pares |= set(existentes.values_list('clase_id', 'fecha'))
+
+            if pares:
+                self._recalcular(pares, completo)
+
+            marca.hasta = nueva_marca
+            marca.save(update_fields=['hasta'])
+        return len(pares)
+
+    def recalcular(self, pares):
+        """
+        Recalcula ya los pares (clase_id, fecha) indicados, sin esperar al
+        refresco programado ni mover la marca (registrar_asistencias)
+        """
+        pares = set(pares)
+        if pares:
+            with transaction.atomic():
+                self._recalcular(pares)
+
+    def _recalcular(self, pares, completo=False):
+        conteos = Asistencia.objects.order_by()
+        if not completo:
+            conteos = conteos.filter(
+                clase_id__in={clase_id for clase_id, _ in pares},
+                fecha__in={fecha for _, fecha in pares},
+            )
+        conteos = (
+            conteos
+            .values('clase_id', 'fecha')
+            .annotate(**{
+                campo: Count('id', filter=Q(estado=estado))
+                for campo, estado in CAMPOS_RESUMEN.items()
+            })
+        )
+        filas = [
+            self.model(pendiente=False, **fila)
+            for fila in conteos
+            if (fila['clase_id'], fila['fecha']) in pares
+        ]
+        self.model.objects.bulk_create(
+            filas,
+            batch_size=500,
+            **opciones_upsert(unique_fields=['clase', 'fecha'], update_fields=[*CAMPOS_RESUMEN, 'pendiente']),
+        )
+        # Pares que ya no tienen registros (todas sus asistencias fueron eliminadas)
+        vigentes = {(f.clase_id, f.fecha) for f in filas}
+        for clase_id, fecha in pares - vigentes:
+            self.model.objects.filter(clase_id=clase_id, fecha=fecha).delete()
+
+    def resumen(self):
+        """Totales por estado sobre las filas del queryset en una sola consulta"""
+        totales = self.aggregate(**{
+            campo: Coalesce(Sum(campo), 0) for campo in CAMPOS_RESUMEN
+        })
+        totales['total'] = sum(totales.values())
+        return totales
+
+
+class AsistenciaDiaria(models.Model):
+    """Resumen de asistencias por (clase, fecha), refrescado de forma incremental"""
+    clase = models.ForeignKey(Horario, on_delete=models.CASCADE, related_name='resumenes_asistencia')
+    fecha = models.DateField()
+    presentes = models.PositiveIntegerField(default=0)
+    tardes = models.PositiveIntegerField(default=0)
+    ausentes = models.PositiveIntegerField(default=0)
+    justificados = models.PositiveIntegerField(default=0)
+    pendiente = models.BooleanField(default=False, help_text="Marcado al eliminar asistencias; se recalcula en el próximo refresco")
+
+    objects = AsistenciaDiariaQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('clase', 'fecha')
+
+    def __str__(self):
+        return f"{self.clase_id} - {self.fecha}: {self.total} registros"
+
+    @property
+    def total(self):
+        return self.presentes + self.tardes + self.ausentes + self.justificados
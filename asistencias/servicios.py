@@ -0,0 +1,73 @@
+"""
+Registro masivo de asistencias compartido por el panel de administración y el
+de profesores: una consulta para las matrículas, una para saber cuáles ya
+existen y un único upsert para toda la clase. Al confirmarse se recalcula el
+resumen diario de la sesión (una consulta agrupada y un upsert), así el
+historial del panel la muestra sin esperar a refresh_attendance_rollup.
+"""
+from django.db import transaction
+
+from matriculas.models import Matricula
+from .models import Asistencia, AsistenciaDiaria, EstadoAsistencia, opciones_upsert
+
+
+def registrar_asistencias(clase, fecha, registros, estado_por_defecto=None):
+    """
+    Crea o actualiza las asistencias de `clase` en `fecha`.
+
+    `registros` mapea estudiante_id -> {'estado': ..., 'observaciones': ...}
+    ('observaciones' es opcional; si ningún registro la trae no se modifica).
+    Con `estado_por_defecto`, los estudiantes matriculados que no aparecen en
+    `registros` se guardan con ese estado; sin él se omiten. Los estudiantes
+    que no están matriculados en la clase se ignoran.
+
+    Devuelve un diccionario con las cantidades 'creadas' y 'actualizadas'.
+    """
+    registros = {str(estudiante_id): datos for estudiante_id, datos in registros.items()}
+    estados_validos = set(EstadoAsistencia.values)
+    con_observaciones = any('observaciones' in datos for datos in registros.values())
+
+    matriculas = Matricula.objects.filter(clase=clase).values_list('id', 'estudiante_id')
+    filas = []
+    for matricula_id, estudiante_id in matriculas:
+        datos = registros.get(str(estudiante_id))
+        if datos is None:
+            if estado_por_defecto is None:
+                continue
+            datos = {'estado': estado_por_defecto}
+        estado = datos.get('estado') or EstadoAsistencia.AUSENTE
+        if estado not in estados_validos:
+            raise ValueError(f"Estado de asistencia inválido: {estado}")
+        filas.append(Asistencia(
+            matricula_id=matricula_id,
+            clase=clase,
+            fecha=fecha,
+            estado=estado,
+            observaciones=datos.get('observaciones', ''),
+        ))
+
+    if not filas:
+        return {'creadas': 0, 'actualizadas': 0}
+
+    # fecha_modificacion se actualiza para que el resumen diario vea el cambio
+    campos = ['estado', 'clase', 'fecha_modificacion']
+    if con_observaciones:
+        campos.append('observaciones')
+
+    with transaction.atomic():
+        # Clase actual de las que ya existen: el upsert puede moverlas de sesión
+        clases_anteriores = list(Asistencia.objects.filter(
+            matricula_id__in=[fila.matricula_id for fila in filas],
+            fecha=fecha,
+        ).values_list('clase_id', flat=True))
+        existentes = len(clases_anteriores)
+        Asistencia.objects.bulk_create(
+            filas,
+            batch_size=500,
+            **opciones_upsert(unique_fields=['matricula', 'fecha'], update_fields=campos),
+        )
+        # Tras confirmar: dentro de la transacción el conteo no vería las asistencias
+        # que otra petición confirme mientras tanto para la misma sesión
+        pares = {(clase_id, fecha) for clase_id in clases_anteriores} | {(clase.id, fecha)}
+        transaction.on_commit(lambda: AsistenciaDiaria.objects.recalcular(pares))
+    return {'creadas': len(filas) - existentes, 'actualizadas': existentes}
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, pre_save
+from django.dispatch import receiver
+from .models import Asistencia, AsistenciaDiaria
+
+
+@receiver(post_delete, sender=Asistencia)
+def marcar_resumen_pendiente(sender, instance, **kwargs):
+    # Una eliminación no deja fecha_modificacion: se marca el par para el próximo refresco
+    AsistenciaDiaria.objects.filter(clase_id=instance.clase_id, fecha=instance.fecha).update(pendiente=True)
+
+
+@receiver(pre_save, sender=Asistencia)
+def marcar_resumen_anterior_pendiente(sender, instance, update_fields=None, **kwargs):
+    # Si la asistencia cambia de clase o de fecha, el refresco solo ve el par nuevo:
+    # el anterior se marca para que deje de contarla
+    if instance.pk is None or (update_fields is not None and not {'clase', 'clase_id', 'fecha'} & set(update_fields)):
+        return
+    anterior = Asistencia.objects.filter(pk=instance.pk).values_list('clase_id', 'fecha').first()
+    if anterior and anterior != (instance.clase_id, instance.fecha):
+        AsistenciaDiaria.objects.filter(clase_id=anterior[0], fecha=anterior[1]).update(pendiente=True)
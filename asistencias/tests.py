@@ -1,3 +1,236 @@
+from datetime import date, time
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-# Create your tests here.
+from asistencias.matriz import CELDAS, MatrizAsistencia, construir_matriz
+from asistencias.models import Asistencia, AsistenciaDiaria, EstadoAsistencia
+from asistencias.servicios import registrar_asistencias
+from cursos.models import Curso
+from horarios.models import Horario
+from matriculas.models import Matricula
+from usuarios.models import Usuario
+
+
+class AsistenciaDiariaTests(TestCase):
+    def setUp(self):
+        curso = Curso.objects.create(nombre='Curso de Violín', precio=0)
+        self.clase = Horario.objects.create(
+            curso=curso,
+            fecha_inicio=date(2025, 1, 1),
+            fecha_fin=date(2025, 6, 30),
+            hora_inicio=time(8, 0),
+            hora_fin=time(9, 0),
+        )
+        self.matriculas = [
+            Matricula.objects.create(
+                estudiante=Usuario.objects.create_user(username=f'est{i}', password='x'),
+                clase=self.clase,
+            )
+            for i in range(3)
+        ]
+        self.fecha = date(2025, 3, 3)
+
+    def registrar(self, matricula, estado, fecha=None):
+        return Asistencia.objects.create(matricula=matricula, clase=self.clase, fecha=fecha or self.fecha, estado=estado)
+
+    def resumen(self, fecha=None):
+        return AsistenciaDiaria.objects.get(clase=self.clase, fecha=fecha or self.fecha)
+
+    def test_refresco_incremental(self):
+        self.registrar(self.matriculas[0], EstadoAsistencia.PRESENTE)
+        self.registrar(self.matriculas[1], EstadoAsistencia.TARDE)
+        AsistenciaDiaria.objects.refrescar()
+        self.assertEqual((self.resumen().presentes, self.resumen().tardes), (1, 1))
+
+        asistencia = self.registrar(self.matriculas[2], EstadoAsistencia.AUSENTE)
+        asistencia.estado = EstadoAsistencia.JUSTIFICADO
+        asistencia.save()
+        AsistenciaDiaria.objects.refrescar()
+
+        resumen = self.resumen()
+        self.assertEqual(resumen.justificados, 1)
+        self.assertEqual(resumen.ausentes, 0)
+        self.assertEqual(resumen.total, 3)
+
+    def test_eliminaciones(self):
+        asistencia = self.registrar(self.matriculas[0], EstadoAsistencia.PRESENTE)
+        self.registrar(self.matriculas[1], EstadoAsistencia.PRESENTE)
+        otra = self.registrar(self.matriculas[0], EstadoAsistencia.AUSENTE, fecha=date(2025, 3, 4))
+        AsistenciaDiaria.objects.refrescar()
+
+        asistencia.delete()
+        otra.delete()
+        AsistenciaDiaria.objects.refrescar()
+
+        self.assertEqual(self.resumen().presentes, 1)
+        self.assertFalse(AsistenciaDiaria.objects.filter(fecha=date(2025, 3, 4)).exists())
+
+    def test_cambio_de_fecha_o_de_clase(self):
+        otra_clase = Horario.objects.create(
+            curso=self.clase.curso, fecha_inicio=date(2025, 1, 1), fecha_fin=date(2025, 6, 30),
+            hora_inicio=time(10, 0), hora_fin=time(11, 0),
+        )
+        movida = self.registrar(self.matriculas[0], EstadoAsistencia.PRESENTE)
+        Asistencia.objects.create(
+            matricula=self.matriculas[1], clase=otra_clase, fecha=self.fecha, estado=EstadoAsistencia.TARDE
+        )
+        AsistenciaDiaria.objects.refrescar()
+
+        movida.fecha = date(2025, 3, 4)
+        movida.save()
+        AsistenciaDiaria.objects.refrescar()
+        self.assertFalse(AsistenciaDiaria.objects.filter(clase=self.clase, fecha=self.fecha).exists())
+        self.assertEqual(self.resumen(date(2025, 3, 4)).presentes, 1)
+
+        # El upsert de registrar_asistencias devuelve la asistencia a la clase de la matrícula
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_asistencias(
+                self.clase, self.fecha, {self.matriculas[1].estudiante_id: {'estado': EstadoAsistencia.TARDE}}
+            )
+        self.assertFalse(AsistenciaDiaria.objects.filter(clase=otra_clase).exists())
+        self.assertEqual(self.resumen().tardes, 1)
+
+    def test_comando_completo(self):
+        self.registrar(self.matriculas[0], EstadoAsistencia.PRESENTE)
+        AsistenciaDiaria.objects.refrescar()
+        AsistenciaDiaria.objects.update(presentes=9)
+
+        call_command('refresh_attendance_rollup', '--completo', stdout=StringIO())
+
+        self.assertEqual(self.resumen().presentes, 1)
+        self.assertEqual(AsistenciaDiaria.objects.filter(clase=self.clase).resumen()['total'], 1)
+
+
+class RegistrarAsistenciasTests(TestCase):
+    def setUp(self):
+        curso = Curso.objects.create(nombre='Curso de Canto', precio=0)
+        self.clase = Horario.objects.create(
+            curso=curso,
+            fecha_inicio=date(2025, 1, 1),
+            fecha_fin=date(2025, 6, 30),
+            hora_inicio=time(8, 0),
+            hora_fin=time(9, 0),
+        )
+        self.estudiantes = [
+            Usuario.objects.create_user(username=f'est{i}', password='x', rol=Usuario.Rol.ESTUDIANTE)
+            for i in range(40)
+        ]
+        for estudiante in self.estudiantes:
+            Matricula.objects.create(estudiante=estudiante, clase=self.clase)
+        self.fecha = date(2025, 2, 3)
+
+    def test_crea_y_actualiza_en_consultas_constantes(self):
+        registros = {e.id: {'estado': EstadoAsistencia.PRESENTE} for e in self.estudiantes}
+
+        with self.assertNumQueries(5):
+            resultado = registrar_asistencias(self.clase, self.fecha, registros)
+        self.assertEqual(resultado, {'creadas': 40, 'actualizadas': 0})
+
+        registros[self.estudiantes[0].id] = {'estado': EstadoAsistencia.TARDE}
+        with self.assertNumQueries(5):
+            resultado = registrar_asistencias(self.clase, self.fecha, registros)
+        self.assertEqual(resultado, {'creadas': 0, 'actualizadas': 40})
+        self.assertEqual(Asistencia.objects.count(), 40)
+        self.assertEqual(Asistencia.objects.get(matricula__estudiante=self.estudiantes[0]).estado, EstadoAsistencia.TARDE)
+
+    def test_estado_por_defecto_y_estudiantes_ajenos(self):
+        ajeno = Usuario.objects.create_user(username='ajeno', password='x', rol=Usuario.Rol.ESTUDIANTE)
+        registros = {
+            self.estudiantes[0].id: {'estado': EstadoAsistencia.PRESENTE, 'observaciones': 'puntual'},
+            ajeno.id: {'estado': EstadoAsistencia.PRESENTE},
+        }
+
+        resultado = registrar_asistencias(self.clase, self.fecha, registros, estado_por_defecto=EstadoAsistencia.AUSENTE)
+
+        self.assertEqual(resultado['creadas'], 40)
+        self.assertEqual(Asistencia.objects.filter(estado=EstadoAsistencia.AUSENTE).count(), 39)
+        self.assertFalse(Asistencia.objects.filter(matricula__estudiante=ajeno).exists())
+
+    def test_actualizacion_llega_al_resumen_diario(self):
+        registros = {e.id: {'estado': EstadoAsistencia.PRESENTE} for e in self.estudiantes}
+        registrar_asistencias(self.clase, self.fecha, registros)
+        AsistenciaDiaria.objects.refrescar()
+
+        registros = {e.id: {'estado': EstadoAsistencia.AUSENTE} for e in self.estudiantes[:10]}
+        registrar_asistencias(self.clase, self.fecha, registros)
+        AsistenciaDiaria.objects.refrescar()
+
+        resumen = AsistenciaDiaria.objects.get(clase=self.clase, fecha=self.fecha)
+        self.assertEqual((resumen.presentes, resumen.ausentes), (30, 10))
+
+    def test_resumen_al_confirmar(self):
+        registros = {e.id: {'estado': EstadoAsistencia.PRESENTE} for e in self.estudiantes}
+        # Sin ningún refresco previo ni la marca del resumen
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_asistencias(self.clase, self.fecha, registros)
+        self.assertEqual(AsistenciaDiaria.objects.get(clase=self.clase, fecha=self.fecha).presentes, 40)
+
+        registros = {e.id: {'estado': EstadoAsistencia.TARDE} for e in self.estudiantes[:5]}
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_asistencias(self.clase, self.fecha, registros)
+        resumen = AsistenciaDiaria.objects.get(clase=self.clase, fecha=self.fecha)
+        self.assertEqual((resumen.presentes, resumen.tardes), (35, 5))
+
+    def test_estado_invalido(self):
+        with self.assertRaises(ValueError):
+            registrar_asistencias(self.clase, self.fecha, {self.estudiantes[0].id: {'estado': 'DORMIDO'}})
+        self.assertFalse(Asistencia.objects.exists())
+
+
+class MatrizAsistenciaTests(TestCase):
+    def test_celdas_y_totales(self):
+        lunes, martes, miercoles = date(2025, 1, 6), date(2025, 1, 7), date(2025, 1, 8)
+        matriz = MatrizAsistencia.desde_filas([
+            (2, 'Ana', 'Zapata', '02', lunes, EstadoAsistencia.PRESENTE, 'Piano'),
+            (1, 'Luis', 'Alvarez', '01', lunes, EstadoAsistencia.TARDE, 'Piano'),
+            (2, 'Ana', 'Zapata', '02', miercoles, EstadoAsistencia.AUSENTE, 'Guitarra'),
+            (1, 'Luis', 'Alvarez', '01', martes, EstadoAsistencia.JUSTIFICADO, 'Piano'),
+        ], campos=('curso',))
+        self.assertEqual(matriz.fechas, [lunes, martes, miercoles])
+        # Un byte por celda, filas por apellido
+        self.assertEqual(bytes(matriz.celdas), bytes([2, 4, 0, 1, 0, 3]))
+        luis, ana = matriz.filas
+        self.assertEqual((luis['estudiante'].last_name, luis['curso']), ('Alvarez', 'Piano'))
+        self.assertEqual(ana['curso'], 'Piano')
+        self.assertEqual([c.letra for c in luis['celdas']], ['T', 'J', '-'])
+        self.assertEqual((luis['asistio'], luis['registros'], ana['ausentes']), (1, 2, 1))
+        self.assertEqual([t['asistio'] for t in matriz.totales_fecha], [2, 0, 0])
+        self.assertEqual(matriz.totales['registros'], 4)
+        bloques = matriz.bloques(2)
+        self.assertEqual([b['fechas'] for b in bloques], [[lunes, martes], [miercoles]])
+        self.assertEqual(bloques[1]['filas'][1]['celdas'], [CELDAS[3]])
+
+    def test_fechas_fijas_y_consulta(self):
+        clase = Horario.objects.create(
+            curso=Curso.objects.create(nombre='Curso de Arpa', precio=0),
+            fecha_inicio=date(2025, 1, 1), fecha_fin=date(2025, 6, 30),
+            hora_inicio=time(8, 0), hora_fin=time(9, 0),
+        )
+        matricula = Matricula.objects.create(
+            estudiante=Usuario.objects.create_user(username='est', password='x'), clase=clase
+        )
+        Asistencia.objects.create(matricula=matricula, clase=clase, fecha=date(2025, 1, 6))
+        Asistencia.objects.create(matricula=matricula, clase=clase, fecha=date(2025, 3, 6))
+        with self.assertNumQueries(1):
+            matriz = construir_matriz(Asistencia.objects.all(), fechas=[date(2025, 1, 5), date(2025, 1, 6)])
+            filas = matriz.filas
+        # La fecha fuera de las columnas no se muestra
+        self.assertEqual([c.estado for c in filas[0]['celdas']], [None, EstadoAsistencia.AUSENTE])
+
+    def test_extras_de_la_primera_fecha(self):
+        estudiante = Usuario.objects.create_user(username='est', password='x')
+        matriculas = []
+        for nombre in ('Curso de Arpa', 'Curso de Piano'):
+            clase = Horario.objects.create(
+                curso=Curso.objects.create(nombre=nombre, precio=0),
+                fecha_inicio=date(2025, 1, 1), fecha_fin=date(2025, 6, 30),
+                hora_inicio=time(8, 0), hora_fin=time(9, 0),
+            )
+            matriculas.append(Matricula.objects.create(estudiante=estudiante, clase=clase))
+        # El registro más antiguo se crea al último: el curso sale de la fecha, no del orden de inserción
+        for matricula, fecha in zip(matriculas, (date(2025, 3, 6), date(2025, 1, 6))):
+            Asistencia.objects.create(matricula=matricula, clase=matricula.clase, fecha=fecha)
+        matriz = construir_matriz(Asistencia.objects.all(), campos={'curso': 'matricula__clase__curso__nombre'})
+        self.assertEqual(matriz.filas[0]['curso'], 'Curso de Piano')
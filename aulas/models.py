@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce, Greatest
 
 # Create your models here.
 
@@ -15,6 +17,16 @@ class Piso(models.TextChoices):
     PISO_2 = '2', 'Piso 2'
     PISO_3 = '3', 'Piso 3'
 
+class AulaQuerySet(models.QuerySet):
+    def with_occupancy(self):
+        """Anota total_matriculados (suma de inscritos_activos de sus clases) y puestos_disponibles"""
+        return self.annotate(
+            total_matriculados=Coalesce(Sum('clases_aula__inscritos_activos'), 0),
+        ).annotate(
+            puestos_disponibles=Greatest(F('capacidad'), F('total_matriculados'), output_field=models.IntegerField())
+            - F('total_matriculados'),
+        )
+
 class Aula(models.Model):
     nombre = models.CharField(max_length=50, unique=True, help_text="Nombre del aula (ej: Aula 101)")
     sede = models.CharField(max_length=10, choices=Sede.choices, default=Sede.MATRIZ)
@@ -23,6 +35,8 @@ class Aula(models.Model):
     capacidad = models.PositiveIntegerField(default=15, help_text="Capacidad máxima de estudiantes")
     activa = models.BooleanField(default=True, help_text="Indica si el aula está disponible para uso")
 
+    objects = AulaQuerySet.as_manager()
+
     class Meta:
         ordering = ['sede', 'edificio', 'piso', 'nombre']
         verbose_name = 'Aula'
@@ -1,3 +1,48 @@
+from datetime import date, time
+
 from django.test import TestCase
+from django.urls import reverse
+
+from aulas.models import Aula, Sede
+from cursos.models import Curso
+from horarios.models import Horario
+from matriculas.models import Matricula
+from usuarios.models import Usuario
+
+
+class AulaOccupancyTests(TestCase):
+    def setUp(self):
+        self.admin = Usuario.objects.create_user(username='admin', password='x', rol=Usuario.Rol.ADMIN)
+        self.aula = Aula.objects.create(nombre='Aula 101', capacidad=3)
+        self.vacia = Aula.objects.create(nombre='Aula 201', sede=Sede.NORTE, capacidad=10)
+        curso = Curso.objects.create(nombre='Curso de Canto', precio=0)
+        for _ in range(2):
+            clase = Horario.objects.create(
+                curso=curso,
+                aula=self.aula,
+                fecha_inicio=date(2025, 1, 1),
+                fecha_fin=date(2025, 6, 30),
+                hora_inicio=time(8, 0),
+                hora_fin=time(9, 0),
+            )
+            for i in range(2):
+                estudiante, _ = Usuario.objects.get_or_create(username=f'est{i}', rol=Usuario.Rol.ESTUDIANTE)
+                Matricula.objects.create(estudiante=estudiante, clase=clase)
+
+    def test_with_occupancy(self):
+        aulas = {aula.id: aula for aula in Aula.objects.with_occupancy()}
+
+        self.assertEqual(aulas[self.aula.id].total_matriculados, 4)
+        self.assertEqual(aulas[self.aula.id].puestos_disponibles, 0)
+        self.assertEqual(aulas[self.vacia.id].total_matriculados, 0)
+        self.assertEqual(aulas[self.vacia.id].puestos_disponibles, 10)
+
+    def test_endpoint_ocupacion_por_ubicacion(self):
+        self.client.force_login(self.admin)
+
+        response = self.client.get(reverse('admin_aulas_ocupacion'), {'sede': Sede.MATRIZ})
 
-# Create your tests here.
+        grupos = response.json()['grupos']
+        self.assertEqual(len(grupos), 1)
+        self.assertEqual(grupos[0]['matriculados'], 4)
+        self.assertEqual(grupos[0]['aulas'][0]['nombre'], 'Aula 101')
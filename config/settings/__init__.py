@@ -0,0 +1,20 @@
+"""
+Settings del proyecto divididos por entorno.
+
+DJANGO_SETTINGS_MODULE sigue siendo 'config.settings': este paquete carga
+config.settings.dev o config.settings.prod según DJANGO_ENTORNO ('dev' por
+defecto). También se puede apuntar DJANGO_SETTINGS_MODULE directamente a uno de
+ellos.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+ENTORNO = os.environ.get('DJANGO_ENTORNO', 'dev')
+
+if ENTORNO == 'prod':
+    from .prod import *  # noqa: F401,F403
+elif ENTORNO == 'dev':
+    from .dev import *  # noqa: F401,F403
+else:
+    raise ImproperlyConfigured(f"DJANGO_ENTORNO debe ser 'dev' o 'prod', no {ENTORNO!r}")
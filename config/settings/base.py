@@ -1,7 +1,11 @@
 """
-Django settings for config project.
+Django settings for config project: valores comunes a todos los entornos.
 
-Generated by 'django-admin startproject' using Django 5.2.4.
+Generated by 'django-admin startproject' using Django 5.2.4. dev.py y prod.py
+parten de este archivo; config/settings/__init__.py elige uno según la variable
+de entorno DJANGO_ENTORNO. Lo que cambia entre instalaciones (clave, base de
+datos, hosts) se lee de variables de entorno, con valores de desarrollo por
+defecto.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/topics/settings/
@@ -13,19 +17,26 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import os
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
-BASE_DIR = Path(__file__).resolve().parent.parent
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+
+def entorno_lista(nombre, defecto=''):
+    """Variable de entorno separada por comas -> lista sin vacíos"""
+    return [valor.strip() for valor in os.environ.get(nombre, defecto).split(',') if valor.strip()]
 
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-&=8=)0(4zlm)p)q726#lk-(puvd@b66y77ucxe)b=38ri*6*sx'
+SECRET_KEY = os.environ.get(
+    'DJANGO_SECRET_KEY', 'django-insecure-&=8=)0(4zlm)p)q726#lk-(puvd@b66y77ucxe)b=38ri*6*sx'
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = False
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = entorno_lista('DJANGO_ALLOWED_HOSTS')
 
 
 # Application definition
@@ -87,24 +98,46 @@ WSGI_APPLICATION = 'config.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.mysql',
-        'NAME': 'academia_db',
-        'USER': 'root',
-        'PASSWORD': 'mateo123',
-        'HOST': 'localhost',
-        'PORT': '3306',
+        'NAME': os.environ.get('DB_NAME', 'academia_db'),
+        'USER': os.environ.get('DB_USER', 'root'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'mateo123'),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '3306'),
+    }
+}
+
+
+# Cache compartida entre workers (las invalidaciones del dashboard deben verse en todos)
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('DJANGO_CACHE_DIR', os.path.join(BASE_DIR, 'cache')),
     }
 }
 
-# DATABASES = {
-#     'default': {
-#         'ENGINE': 'django.db.backends.mysql',
-#         'NAME': 'adcaecab_academiaMusical',
-#         'USER': 'adcaecab_mateo',
-#         'PASSWORD': 'mateo1357',
-#         'HOST': '69.6.213.228',
-#         'PORT': '3306',
-#     }
-# }
+
+# Carpeta donde el worker `procesar_reportes` deja los PDF generados en segundo plano
+REPORTES_DIR = os.path.join(BASE_DIR, 'reportes_generados')
+
+# Caché de PDF ya generados (reportes.cache_pdf): carpeta y tamaño máximo antes de desalojar
+REPORTES_CACHE_DIR = os.path.join(REPORTES_DIR, 'cache')
+REPORTES_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+# Motor de PDF por tipo de reporte (reportes.motores): 'reportlab' o 'xhtml2pdf' (el de respaldo)
+REPORTES_MOTOR_PDF = {
+    'PAGOS': 'reportlab',
+    'ASISTENCIAS': 'reportlab',
+}
+
+# Procesos que renderizan las facturas en lote (reportes.facturas); None = núcleos disponibles
+REPORTES_PROCESOS_FACTURAS = None
+# Facturas como máximo en un PDF unido (pypdf lo arma en memoria); el ZIP no tiene límite
+REPORTES_MAXIMO_FACTURAS_PDF = 500
+
+# Compilar las plantillas PDF y analizar su CSS al arrancar los workers (reportes.renderizador)
+REPORTES_PRECALENTAR_PDF = True
 
 
 # Password validation
@@ -149,6 +182,9 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
 
+# Destino de collectstatic (necesario en prod, que sirve los estáticos con nombres con hash)
+STATIC_ROOT = os.environ.get('DJANGO_STATIC_ROOT', os.path.join(BASE_DIR, 'staticfiles'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
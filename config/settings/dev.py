@@ -0,0 +1,4 @@
+"""Desarrollo: DEBUG activo; conexiones, sesiones y estáticos por defecto de Django."""
+from .base import *  # noqa: F401,F403
+
+DEBUG = True
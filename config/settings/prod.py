@@ -0,0 +1,71 @@
+"""
+Producción: sin DEBUG y con lo que ahorra trabajo en cada petición (conexiones
+persistentes, plantillas compiladas en memoria, sesiones en caché).
+
+Requiere DJANGO_SECRET_KEY y DJANGO_ALLOWED_HOSTS, y ejecutar collectstatic
+antes de arrancar (los estáticos se sirven con el manifiesto de nombres con
+hash).
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *  # noqa: F401,F403
+from .base import DATABASES, TEMPLATES, entorno_lista
+
+DEBUG = False
+
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY')
+if not SECRET_KEY:
+    raise ImproperlyConfigured("Falta la variable de entorno DJANGO_SECRET_KEY")
+
+ALLOWED_HOSTS = entorno_lista('DJANGO_ALLOWED_HOSTS')
+if not ALLOWED_HOSTS:
+    raise ImproperlyConfigured("Falta la variable de entorno DJANGO_ALLOWED_HOSTS (hosts separados por comas)")
+
+# Reutilizar la conexión a MySQL entre peticiones del mismo worker (segundos; 0 = cerrar en cada petición),
+# comprobando al inicio de cada petición que siga viva en lugar de fallar si MySQL la cerró
+DATABASES = {
+    'default': {
+        **DATABASES['default'],
+        'CONN_MAX_AGE': int(os.environ.get('DJANGO_CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# Plantillas compiladas una sola vez por proceso (sin revisar si cambiaron los archivos)
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
+
+# 'file' (por defecto): la caché de base.py, compartida entre workers; 'locmem': en memoria de cada proceso,
+# más rápida pero sin invalidaciones entre workers (solo para un único proceso)
+if os.environ.get('DJANGO_CACHE', 'file') == 'locmem':
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+# Sesiones leídas de la caché y escritas también en la base de datos (no se pierden si se limpia la caché)
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Estáticos con el hash del contenido en el nombre, que se pueden cachear sin vencimiento en el navegador
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'},
+}
+
+# Los errores se registran en la salida de error del worker (sin DEBUG no se muestran en la página)
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'consola': {'class': 'logging.StreamHandler'}},
+    'root': {'handlers': ['consola'], 'level': os.environ.get('DJANGO_LOG_LEVEL', 'WARNING')},
+}
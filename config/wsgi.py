@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Deja listas las cachés de los PDF antes de atender la primera petición
+from reportes.renderizador import precalentar_si_corresponde  # noqa: E402
+
+precalentar_si_corresponde()
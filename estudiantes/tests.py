@@ -1,3 +1,62 @@
+from datetime import date, time, timedelta
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from asistencias.models import Asistencia, EstadoAsistencia
+from cursos.models import Curso
+from horarios.models import Horario
+from matriculas.models import Matricula
+from usuarios.models import Usuario
+
+
+class CalendarioAsistenciasTests(TestCase):
+    def setUp(self):
+        self.estudiante = Usuario.objects.create_user(username='est', password='x', rol=Usuario.Rol.ESTUDIANTE)
+        self.client.force_login(self.estudiante)
+        self.inicio = date(2025, 2, 3)
+        self.matriculas = []
+        for nombre in ['Piano', 'Guitarra', 'Violín', 'Canto', 'Batería']:
+            clase = Horario.objects.create(
+                curso=Curso.objects.create(nombre=nombre, precio=0),
+                fecha_inicio=date(2025, 1, 1), fecha_fin=date(2025, 12, 31),
+                hora_inicio=time(8, 0), hora_fin=time(9, 0),
+            )
+            self.matriculas.append(Matricula.objects.create(estudiante=self.estudiante, clase=clase))
+
+    def consultar(self, dias, **params):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('estudiante_asistencias'), {
+                'fecha_inicio': self.inicio.isoformat(),
+                'fecha_fin': (self.inicio + timedelta(days=dias - 1)).isoformat(),
+                **params,
+            })
+        return response, len(consultas)
+
+    def test_todas_las_clases_del_semestre(self):
+        for matricula in self.matriculas:
+            for semana in range(20):
+                Asistencia.objects.create(
+                    matricula=matricula, clase=matricula.clase,
+                    fecha=self.inicio + timedelta(weeks=semana), estado=EstadoAsistencia.PRESENTE,
+                )
+        _, consultas_un_dia = self.consultar(1)
+        response, consultas = self.consultar(140)
+
+        filas = response.context['filas']
+        self.assertEqual(len(filas), 5)
+        self.assertTrue(all(len(fila['estados']) == 140 for fila in filas))
+        self.assertEqual(sum(fila['estados'].count(EstadoAsistencia.PRESENTE) for fila in filas), 100)
+        self.assertEqual(consultas, consultas_un_dia)
+
+    def test_filtro_por_codigo(self):
+        clase = self.matriculas[1].clase
+        Asistencia.objects.create(matricula=self.matriculas[1], clase=clase, fecha=self.inicio, estado=EstadoAsistencia.TARDE)
+
+        response, _ = self.consultar(7, codigo_clase=clase.codigo.lower())
 
-# Create your tests here.
+        filas = response.context['filas']
+        self.assertEqual([fila['clase'] for fila in filas], [clase])
+        self.assertEqual(filas[0]['estados'][0], EstadoAsistencia.TARDE)
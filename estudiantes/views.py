@@ -3,38 +3,51 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib.auth import update_session_auth_hash
 from asistencias.models import Asistencia
+from matriculas.models import Matricula
 from datetime import date, timedelta
 
+# Rango máximo del calendario (un año lectivo holgado)
+MAX_DIAS_CALENDARIO = 400
+
 @login_required
 def estudiante_asistencias(request):
     fecha_inicio = request.GET.get('fecha_inicio') or ''
     fecha_fin = request.GET.get('fecha_fin') or ''
-    codigo_clase_filtro = request.GET.get('codigo_clase', '').upper()
-    asistencias = []
+    codigo_clase_filtro = request.GET.get('codigo_clase', '').strip().upper()
     fechas_rango = []
-    clase = None
+    filas = []
+
+    try:
+        inicio = date.fromisoformat(fecha_inicio)
+        fin = date.fromisoformat(fecha_fin)
+    except ValueError:
+        inicio = fin = None
+    if inicio and fin and 0 <= (fin - inicio).days < MAX_DIAS_CALENDARIO:
+        fechas_rango = [inicio + timedelta(days=i) for i in range((fin - inicio).days + 1)]
 
-    if fecha_inicio and fecha_fin and codigo_clase_filtro:
-        asistencias_qs = Asistencia.objects.filter(
-            matricula__estudiante=request.user
-        ).select_related('clase__curso', 'matricula__clase')
-        asistencias_qs = asistencias_qs.filter(fecha__gte=fecha_inicio, fecha__lte=fecha_fin)
-        asistencias = [a for a in asistencias_qs if a.clase.codigo.upper() == codigo_clase_filtro]
-        try:
-            inicio = date.fromisoformat(fecha_inicio)
-            fin = date.fromisoformat(fecha_fin)
-            delta = (fin - inicio).days
-            fechas_rango = [(inicio + timedelta(days=i)) for i in range(delta + 1)]
-        except Exception:
-            fechas_rango = []
-        if asistencias:
-            clase = asistencias[0].clase
+        # Todas las clases del estudiante (o solo la del código) y sus asistencias del rango
+        matriculas = Matricula.objects.filter(estudiante=request.user).select_related('clase__curso').order_by(
+            'clase__curso__nombre', 'clase__hora_inicio'
+        )
+        asistencias = Asistencia.objects.filter(
+            matricula__estudiante=request.user, fecha__gte=inicio, fecha__lte=fin
+        )
+        if codigo_clase_filtro:
+            matriculas = matriculas.filter(clase__codigo=codigo_clase_filtro)
+            asistencias = asistencias.filter(clase__codigo=codigo_clase_filtro)
 
-    # Prepara la fila para la tabla
-    fila_asistencias = []
-    for fecha in fechas_rango:
-        asistencia = next((a for a in asistencias if a.fecha == fecha), None)
-        fila_asistencias.append(asistencia)
+        # Índice (matrícula, fecha) -> estado para armar cada fila sin búsquedas lineales
+        estados = {
+            (matricula_id, fecha): estado
+            for matricula_id, fecha, estado in asistencias.values_list('matricula_id', 'fecha', 'estado')
+        }
+        filas = [
+            {
+                'clase': matricula.clase,
+                'estados': [estados.get((matricula.id, fecha)) for fecha in fechas_rango],
+            }
+            for matricula in matriculas
+        ]
 
     return render(request, 'estudiantes/estudiante_asistencias.html', {
         'active_tab': 'asistencias',
@@ -42,8 +55,7 @@ def estudiante_asistencias(request):
         'fecha_fin': fecha_fin,
         'codigo_clase_filtro': codigo_clase_filtro,
         'fechas_rango': fechas_rango,
-        'fila_asistencias': fila_asistencias,
-        'clase': clase,
+        'filas': filas,
         'estudiante': request.user,
     })
 
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from horarios.models import Horario
+
+
+class Command(BaseCommand):
+    help = "Recalcula Horario.inscritos_activos desde las matrículas ACTIVAS con un único UPDATE"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            actualizadas = Horario.objects.reconciliar_inscritos()
+        self.stdout.write(self.style.SUCCESS(f"Contador de inscritos reconciliado en {actualizadas} clases."))
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:28
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def poblar_inscritos_activos(apps, schema_editor):
+    Horario = apps.get_model("horarios", "Horario")
+    Matricula = apps.get_model("matriculas", "Matricula")
+    activas = (
+        Matricula.objects.filter(clase=OuterRef("pk"), estado="ACTIVA")
+        .order_by()
+        .values("clase")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    Horario.objects.update(inscritos_activos=Coalesce(Subquery(activas), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("horarios", "0003_horario_cupos"),
+        ("matriculas", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="horario",
+            name="inscritos_activos",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="Matrículas ACTIVAS (mantenido por matriculas.signals)",
+            ),
+        ),
+        migrations.RunPython(poblar_inscritos_activos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:40
+
+from django.db import migrations, models
+
+
+def poblar_codigo(apps, schema_editor):
+    # Misma regla que Horario.generar_codigo (los modelos históricos no tienen sus métodos)
+    Horario = apps.get_model("horarios", "Horario")
+    clases = list(Horario.objects.select_related("curso").only("id", "codigo", "curso__nombre"))
+    for clase in clases:
+        clase.codigo = f"{clase.curso.nombre[:3].upper()}-{clase.id:04d}"
+    Horario.objects.bulk_update(clases, ["codigo"], batch_size=500)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("horarios", "0004_horario_inscritos_activos"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="horario",
+            name="codigo",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                help_text="Código visible de la clase (prefijo del curso + id), generado al guardar",
+                max_length=20,
+            ),
+        ),
+        migrations.RunPython(poblar_codigo, migrations.RunPython.noop),
+    ]
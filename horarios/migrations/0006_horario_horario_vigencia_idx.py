@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("aulas", "0001_initial"),
+        ("cursos", "0005_remove_curso_profesor_alter_curso_instrumento"),
+        ("horarios", "0005_horario_codigo"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="horario",
+            index=models.Index(
+                fields=["fecha_inicio", "fecha_fin"], name="horario_vigencia_idx"
+            ),
+        ),
+    ]
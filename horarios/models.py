@@ -1,8 +1,43 @@
 from django.db import models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
 from cursos.models import Curso
 from usuarios.models import Usuario
 from aulas.models import Aula
 
+class HorarioQuerySet(models.QuerySet):
+    def with_occupancy(self):
+        """Anota total_matriculados y cupos_disponibles a partir del contador inscritos_activos"""
+        # Greatest(cupos, total) - total nunca es negativo (cupos es UNSIGNED en MySQL)
+        return self.annotate(
+            total_matriculados=F('inscritos_activos'),
+        ).annotate(
+            cupos_disponibles=Greatest(F('cupos'), F('total_matriculados'), output_field=models.IntegerField())
+            - F('total_matriculados'),
+        )
+
+    def ajustar_inscritos(self, delta):
+        """Suma delta al contador inscritos_activos en la base de datos (F-expression, sin carreras)"""
+        if delta > 0:
+            return self.update(inscritos_activos=F('inscritos_activos') + delta)
+        if delta < 0:
+            return self.filter(inscritos_activos__gte=-delta).update(inscritos_activos=F('inscritos_activos') + delta)
+        return 0
+
+    def reconciliar_inscritos(self):
+        """Recalcula inscritos_activos desde matriculas con un único UPDATE"""
+        # Matricula importa Horario, por eso se resuelve desde la relación inversa
+        Matricula = self.model._meta.get_field('matriculas').related_model
+        activas = (
+            Matricula.objects
+            .filter(clase=OuterRef('pk'), estado='ACTIVA')
+            .order_by()
+            .values('clase')
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        return self.update(inscritos_activos=Coalesce(Subquery(activas), 0))
+
 class Horario(models.Model):
     curso = models.ForeignKey(Curso, on_delete=models.CASCADE, related_name='clases')
     profesor = models.ForeignKey(
@@ -26,9 +61,45 @@ class Horario(models.Model):
     hora_fin = models.TimeField()
     descripcion = models.TextField(blank=True)
     cupos = models.PositiveIntegerField(default=15, help_text="Cupos máximos para la clase")
+    inscritos_activos = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Matrículas ACTIVAS (mantenido por matriculas.signals)"
+    )
+    codigo = models.CharField(
+        max_length=20,
+        blank=True,
+        editable=False,
+        db_index=True,
+        help_text="Código visible de la clase (prefijo del curso + id), generado al guardar"
+    )
+
+    objects = HorarioQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Clases vigentes en una fecha (fecha_inicio <= hoy <= fecha_fin)
+            models.Index(fields=['fecha_inicio', 'fecha_fin'], name='horario_vigencia_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        creando = self._state.adding
+        if not creando:
+            # El curso pudo cambiar
+            self.codigo = self.generar_codigo()
+        # inscritos_activos solo cambia vía F-expressions; no pisar el valor concurrente al editar
+        if not creando and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != 'inscritos_activos'
+            ]
+        super().save(*args, **kwargs)
+        if creando:
+            # El código usa el id, que recién existe después del INSERT
+            self.codigo = self.generar_codigo()
+            type(self).objects.filter(pk=self.pk).update(codigo=self.codigo)
 
-    @property
-    def codigo(self):
+    def generar_codigo(self):
         return f"{self.curso.nombre[:3].upper()}-{self.id:04d}"
 
     def __str__(self):
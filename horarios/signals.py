@@ -0,0 +1,17 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from cursos.models import Curso
+from .models import Horario
+
+
+@receiver(post_save, sender=Curso)
+def actualizar_codigos_clases(sender, instance, created, **kwargs):
+    # El código de las clases empieza con el nombre del curso
+    if created:
+        return
+    clases = list(Horario.objects.filter(curso=instance).only('id', 'codigo'))
+    for clase in clases:
+        clase.curso = instance
+        clase.codigo = clase.generar_codigo()
+    Horario.objects.bulk_update(clases, ['codigo'], batch_size=500)
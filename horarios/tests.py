@@ -1,3 +1,108 @@
+from datetime import date, time
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from cursos.models import Curso
+from horarios.models import Horario
+from matriculas.models import Matricula
+from usuarios.models import Usuario
+
+
+class HorarioOccupancyTests(TestCase):
+    def setUp(self):
+        self.admin = Usuario.objects.create_user(username='admin', password='x', rol=Usuario.Rol.ADMIN)
+        self.curso = Curso.objects.create(nombre='Curso de Piano', precio=0)
+        self.estudiantes = [
+            Usuario.objects.create_user(username=f'est{i}', password='x', rol=Usuario.Rol.ESTUDIANTE)
+            for i in range(3)
+        ]
+
+    def crear_clases(self, cantidad, cupos=2):
+        clases = []
+        for _ in range(cantidad):
+            clase = Horario.objects.create(
+                curso=self.curso,
+                fecha_inicio=date(2025, 1, 1),
+                fecha_fin=date(2025, 6, 30),
+                hora_inicio=time(8, 0),
+                hora_fin=time(9, 0),
+                cupos=cupos,
+            )
+            for estudiante in self.estudiantes:
+                Matricula.objects.create(estudiante=estudiante, clase=clase)
+            clases.append(clase)
+        return clases
+
+    def contar_consultas(self, url_name):
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_with_occupancy_cuenta_solo_activas(self):
+        clase = self.crear_clases(1, cupos=5)[0]
+        Matricula.objects.filter(clase=clase, estudiante=self.estudiantes[0]).update(estado='CANCELADA')
+
+        clase = Horario.objects.with_occupancy().get(id=clase.id)
+
+        self.assertEqual(clase.total_matriculados, 2)
+        self.assertEqual(clase.cupos_disponibles, 3)
+
+    def test_with_occupancy_nunca_negativo(self):
+        clase = self.crear_clases(1, cupos=2)[0]
+
+        clase = Horario.objects.with_occupancy().get(id=clase.id)
+
+        self.assertEqual(clase.total_matriculados, 3)
+        self.assertEqual(clase.cupos_disponibles, 0)
+
+    def test_admin_clases_consultas_constantes(self):
+        self.crear_clases(2)
+        pocas = self.contar_consultas('admin_clases')
+        self.crear_clases(10)
+        muchas = self.contar_consultas('admin_clases')
+        self.assertEqual(pocas, muchas)
+
+    def test_admin_matriculas_consultas_constantes(self):
+        self.crear_clases(2)
+        pocas = self.contar_consultas('admin_matriculas')
+        self.crear_clases(10)
+        muchas = self.contar_consultas('admin_matriculas')
+        self.assertEqual(pocas, muchas)
+
+
+class HorarioCodigoTests(TestCase):
+    def setUp(self):
+        self.curso = Curso.objects.create(nombre='Curso de Piano', precio=0)
+
+    def crear_clase(self, curso=None):
+        return Horario.objects.create(
+            curso=curso or self.curso,
+            fecha_inicio=date(2025, 1, 1),
+            fecha_fin=date(2025, 6, 30),
+            hora_inicio=time(8, 0),
+            hora_fin=time(9, 0),
+        )
+
+    def test_codigo_persistido_al_crear(self):
+        clase = self.crear_clase()
+
+        esperado = f"CUR-{clase.id:04d}"
+        self.assertEqual(clase.codigo, esperado)
+        self.assertEqual(Horario.objects.get(codigo=esperado), clase)
+
+    def test_codigo_sigue_al_curso(self):
+        clase = self.crear_clase()
+        guitarra = Curso.objects.create(nombre='Guitarra', precio=0)
+
+        clase.curso = guitarra
+        clase.save()
+        self.assertEqual(Horario.objects.get(pk=clase.pk).codigo, f"GUI-{clase.id:04d}")
 
-# Create your tests here.
+        guitarra.nombre = 'Violín'
+        guitarra.save()
+        self.assertEqual(Horario.objects.get(pk=clase.pk).codigo, f"VIO-{clase.id:04d}")
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("horarios", "0006_horario_horario_vigencia_idx"),
+        ("matriculas", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="matricula",
+            index=models.Index(
+                fields=["clase", "estado"], name="matricula_clase_estado_idx"
+            ),
+        ),
+    ]
@@ -1,6 +1,6 @@
 # matriculas/models.py
 
-from django.db import models
+from django.db import models, transaction
 from usuarios.models import Usuario
 from horarios.models import Horario
 
@@ -9,6 +9,37 @@ class EstadoMatricula(models.TextChoices):
     FINALIZADA = 'FINALIZADA', 'Finalizada'
     CANCELADA = 'CANCELADA', 'Cancelada'
 
+class MatriculaQuerySet(models.QuerySet):
+    def with_pagado(self):
+        """Anota `pagado`: True si la matrícula tiene algún pago en estado PAGADO"""
+        # Pago depende de Matricula; se obtiene por la relación para evitar import circular
+        Pago = self.model._meta.get_field('pagos').related_model
+        return self.annotate(pagado=models.Exists(
+            Pago.objects.filter(matricula=models.OuterRef('pk'), estado='PAGADO')
+        ))
+
+    def update(self, **kwargs):
+        """
+        Igual que QuerySet.update(), pero si cambia estado o clase ajusta
+        Horario.inscritos_activos (los update masivos no disparan señales)
+        """
+        if not {'estado', 'clase', 'clase_id'} & kwargs.keys():
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            antes = list(self.select_for_update().values_list('pk', 'clase_id', 'estado'))
+            filas = super().update(**kwargs)
+            despues = self.model.objects.filter(pk__in=[pk for pk, _, _ in antes]).values_list('clase_id', 'estado')
+            deltas = {}
+            for _, clase_id, estado in antes:
+                if estado == EstadoMatricula.ACTIVA:
+                    deltas[clase_id] = deltas.get(clase_id, 0) - 1
+            for clase_id, estado in despues:
+                if estado == EstadoMatricula.ACTIVA:
+                    deltas[clase_id] = deltas.get(clase_id, 0) + 1
+            for clase_id, delta in deltas.items():
+                Horario.objects.filter(pk=clase_id).ajustar_inscritos(delta)
+        return filas
+
 class Matricula(models.Model):
     estudiante = models.ForeignKey(
         Usuario,
@@ -25,8 +56,19 @@ class Matricula(models.Model):
     estado = models.CharField(max_length=20, choices=EstadoMatricula.choices, default=EstadoMatricula.ACTIVA)
     observaciones = models.TextField(blank=True, null=True)
 
+    objects = MatriculaQuerySet.as_manager()
+
     class Meta:
         unique_together = ('estudiante', 'clase')  # No se permite duplicar una matrícula estudiante-clase
+        indexes = [
+            models.Index(fields=['clase', 'estado'], name='matricula_clase_estado_idx'),
+        ]
 
     def __str__(self):
         return f"{self.estudiante.get_full_name()} - {self.clase.curso.nombre}"
+
+    def save(self, *args, **kwargs):
+        # matriculas.signals bloquea la fila antes del UPDATE y ajusta el contador después:
+        # todo en una transacción para que el bloqueo dure hasta el ajuste
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
@@ -0,0 +1,41 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from horarios.models import Horario
+from .models import Matricula, EstadoMatricula
+
+CAMPOS_CONTADOR = {'estado', 'clase', 'clase_id'}
+
+
+@receiver(pre_save, sender=Matricula)
+def recordar_estado_anterior(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._estado_db = instance._clase_id_db = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not CAMPOS_CONTADOR & set(update_fields):
+        return
+    # El estado anterior se lee con SELECT ... FOR UPDATE dentro de la transacción de
+    # Matricula.save(), no el de la instancia: otro guardado concurrente de la misma
+    # matrícula espera aquí y ve el estado ya confirmado, y una instancia desactualizada
+    # no vuelve a aplicar un cambio que otro ya contó
+    anterior = Matricula.objects.select_for_update().filter(pk=instance.pk).values_list('estado', 'clase_id').first()
+    instance._estado_db, instance._clase_id_db = anterior or (None, None)
+
+
+@receiver(post_save, sender=Matricula)
+def actualizar_inscritos_al_guardar(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not CAMPOS_CONTADOR & set(update_fields)):
+        return
+    estaba_activa = instance._estado_db == EstadoMatricula.ACTIVA
+    clase_anterior = instance._clase_id_db
+    esta_activa = instance.estado == EstadoMatricula.ACTIVA
+
+    if estaba_activa and (not esta_activa or clase_anterior != instance.clase_id):
+        Horario.objects.filter(pk=clase_anterior).ajustar_inscritos(-1)
+    if esta_activa and (not estaba_activa or clase_anterior != instance.clase_id):
+        Horario.objects.filter(pk=instance.clase_id).ajustar_inscritos(1)
+
+
+@receiver(post_delete, sender=Matricula)
+def actualizar_inscritos_al_eliminar(sender, instance, **kwargs):
+    if instance.estado == EstadoMatricula.ACTIVA:
+        Horario.objects.filter(pk=instance.clase_id).ajustar_inscritos(-1)
@@ -1,3 +1,106 @@
+from datetime import date, time
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-# Create your tests here.
+from cursos.models import Curso
+from horarios.models import Horario
+from matriculas.models import Matricula, EstadoMatricula
+from usuarios.models import Usuario
+
+
+class InscritosActivosTests(TestCase):
+    def setUp(self):
+        curso = Curso.objects.create(nombre='Curso de Guitarra', precio=0)
+        self.clases = [
+            Horario.objects.create(
+                curso=curso,
+                fecha_inicio=date(2025, 1, 1),
+                fecha_fin=date(2025, 6, 30),
+                hora_inicio=time(8, 0),
+                hora_fin=time(9, 0),
+            )
+            for _ in range(2)
+        ]
+        self.estudiantes = [
+            Usuario.objects.create_user(username=f'est{i}', password='x', rol=Usuario.Rol.ESTUDIANTE)
+            for i in range(3)
+        ]
+
+    def inscritos(self, clase):
+        return Horario.objects.values_list('inscritos_activos', flat=True).get(pk=clase.pk)
+
+    def test_crear_y_eliminar(self):
+        matricula = Matricula.objects.create(estudiante=self.estudiantes[0], clase=self.clases[0])
+        Matricula.objects.create(estudiante=self.estudiantes[1], clase=self.clases[0])
+        self.assertEqual(self.inscritos(self.clases[0]), 2)
+
+        matricula.delete()
+        self.assertEqual(self.inscritos(self.clases[0]), 1)
+
+        Matricula.objects.filter(clase=self.clases[0]).delete()
+        self.assertEqual(self.inscritos(self.clases[0]), 0)
+
+    def test_cambio_de_estado_y_clase(self):
+        matricula = Matricula.objects.create(estudiante=self.estudiantes[0], clase=self.clases[0])
+
+        matricula.estado = EstadoMatricula.CANCELADA
+        matricula.save()
+        self.assertEqual(self.inscritos(self.clases[0]), 0)
+
+        matricula = Matricula.objects.get(pk=matricula.pk)
+        matricula.estado = EstadoMatricula.ACTIVA
+        matricula.clase = self.clases[1]
+        matricula.save()
+        self.assertEqual(self.inscritos(self.clases[0]), 0)
+        self.assertEqual(self.inscritos(self.clases[1]), 1)
+
+        matricula.observaciones = 'sin cambios de estado'
+        matricula.save()
+        self.assertEqual(self.inscritos(self.clases[1]), 1)
+
+    def test_instancia_desactualizada_no_cuenta_dos_veces(self):
+        Matricula.objects.create(estudiante=self.estudiantes[1], clase=self.clases[0])
+        matricula = Matricula.objects.create(estudiante=self.estudiantes[0], clase=self.clases[0])
+        desactualizada = Matricula.objects.get(pk=matricula.pk)
+
+        matricula.estado = EstadoMatricula.CANCELADA
+        matricula.save()
+        # Leída cuando aún estaba ACTIVA: el delta sale del estado guardado, no del que leyó
+        desactualizada.clase = self.clases[1]
+        desactualizada.save()
+
+        self.assertEqual(self.inscritos(self.clases[0]), 1)
+        self.assertEqual(self.inscritos(self.clases[1]), 1)
+
+    def test_update_masivo(self):
+        for estudiante in self.estudiantes:
+            Matricula.objects.create(estudiante=estudiante, clase=self.clases[0])
+        Matricula.objects.create(estudiante=self.estudiantes[0], clase=self.clases[1])
+
+        Matricula.objects.filter(estudiante__in=self.estudiantes[:2]).update(estado=EstadoMatricula.FINALIZADA)
+        self.assertEqual(self.inscritos(self.clases[0]), 1)
+        self.assertEqual(self.inscritos(self.clases[1]), 0)
+
+        Matricula.objects.update(estado=EstadoMatricula.ACTIVA)
+        self.assertEqual(self.inscritos(self.clases[0]), 3)
+        self.assertEqual(self.inscritos(self.clases[1]), 1)
+
+    def test_editar_clase_no_pisa_contador(self):
+        clase = Horario.objects.get(pk=self.clases[0].pk)
+        Matricula.objects.create(estudiante=self.estudiantes[0], clase=self.clases[0])
+
+        clase.descripcion = 'editada con una instancia desactualizada'
+        clase.save()
+        self.assertEqual(self.inscritos(self.clases[0]), 1)
+
+    def test_reconcile_occupancy(self):
+        for estudiante in self.estudiantes:
+            Matricula.objects.create(estudiante=estudiante, clase=self.clases[0])
+        Horario.objects.update(inscritos_activos=7)
+
+        call_command('reconcile_occupancy', stdout=StringIO())
+
+        self.assertEqual(self.inscritos(self.clases[0]), 3)
+        self.assertEqual(self.inscritos(self.clases[1]), 0)
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:32
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def poblar_total_abonado(apps, schema_editor):
+    Pago = apps.get_model("pagos", "Pago")
+    PagoParcial = apps.get_model("pagos", "PagoParcial")
+    abonos = (
+        PagoParcial.objects.filter(pago=OuterRef("pk"))
+        .order_by()
+        .values("pago")
+        .annotate(total=Sum("monto"))
+        .values("total")
+    )
+    Pago.objects.update(
+        total_abonado=Coalesce(
+            Subquery(abonos),
+            0,
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pagos", "0002_alter_pago_monto_pagoparcial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pago",
+            name="total_abonado",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=0,
+                editable=False,
+                help_text="Suma de los abonos (mantenido por pagos.signals)",
+                max_digits=10,
+            ),
+        ),
+        migrations.RunPython(poblar_total_abonado, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("matriculas", "0002_matricula_matricula_clase_estado_idx"),
+        ("pagos", "0003_pago_total_abonado"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="pago",
+            index=models.Index(
+                fields=["estado", "fecha_pago"], name="pago_estado_fecha_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:50
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pagos", "0004_pago_pago_estado_fecha_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pago",
+            name="fecha_modificacion",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name="pago",
+            index=models.Index(
+                fields=["fecha_modificacion"], name="pago_modificacion_idx"
+            ),
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 from matriculas.models import Matricula
 
 class EstadoPago(models.TextChoices):
@@ -6,27 +8,73 @@ class EstadoPago(models.TextChoices):
     PAGADO = 'PAGADO', 'Pagado'
     CANCELADO = 'CANCELADO', 'Cancelado'
 
+class PagoQuerySet(models.QuerySet):
+    def with_saldo(self):
+        """Anota saldo (monto - total_abonado) calculado en la base de datos"""
+        return self.annotate(
+            saldo=models.ExpressionWrapper(
+                F('monto') - F('total_abonado'),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2),
+            )
+        )
+
+    def ajustar_abonado(self, delta):
+        """
+        Suma delta a total_abonado de forma atómica (F-expression). Con delta 0
+        solo marca la modificación: cambió otro dato del abono que sale en la factura.
+        """
+        # update() no aplica auto_now: marcar la modificación para la caché de reportes
+        if not delta:
+            return self.update(fecha_modificacion=timezone.now())
+        return self.update(total_abonado=F('total_abonado') + delta, fecha_modificacion=timezone.now())
+
 class Pago(models.Model):
     matricula = models.ForeignKey(Matricula, on_delete=models.CASCADE, related_name='pagos')
     monto = models.DecimalField(max_digits=8, decimal_places=2, help_text="Monto total a pagar")
     fecha_pago = models.DateField(auto_now_add=True)
     estado = models.CharField(max_length=10, choices=EstadoPago.choices, default=EstadoPago.PENDIENTE)
     observaciones = models.TextField(blank=True, null=True)
+    total_abonado = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        help_text="Suma de los abonos (mantenido por pagos.signals)"
+    )
+    fecha_modificacion = models.DateTimeField(auto_now=True)
+
+    objects = PagoQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['estado', 'fecha_pago'], name='pago_estado_fecha_idx'),
+            models.Index(fields=['fecha_modificacion'], name='pago_modificacion_idx'),
+        ]
 
     def __str__(self):
         return f"Pago de {self.matricula.estudiante.get_full_name()} - {self.monto} ({self.get_estado_display()})"
 
+    def save(self, *args, **kwargs):
+        # total_abonado solo cambia vía F-expressions; no pisar el valor concurrente al editar
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != 'total_abonado'
+            ]
+        super().save(*args, **kwargs)
+
     @property
     def saldo_pendiente(self):
-        pagado = sum([float(p.monto) for p in self.pagos_parciales.all()])
-        return float(self.monto) - pagado
+        return self.monto - self.total_abonado
 
     def actualizar_estado(self):
+        # Releer el total acumulado por si se registraron abonos después de cargar el pago
+        self.refresh_from_db(fields=['total_abonado'])
         if self.saldo_pendiente <= 0:
             self.estado = EstadoPago.PAGADO
         else:
             self.estado = EstadoPago.PENDIENTE
-        self.save()
+        self.save(update_fields=['estado'])
 
 class PagoParcial(models.Model):
     pago = models.ForeignKey(Pago, on_delete=models.CASCADE, related_name='pagos_parciales')
@@ -36,3 +84,12 @@ class PagoParcial(models.Model):
 
     def __str__(self):
         return f"Abono de ${self.monto} ({self.fecha})"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Monto guardado en BD, usado por pagos.signals para calcular el delta del total abonado
+        if 'monto' in instance.__dict__ and 'pago_id' in instance.__dict__:
+            instance._monto_db = instance.monto
+            instance._pago_id_db = instance.pago_id
+        return instance
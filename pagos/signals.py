@@ -0,0 +1,36 @@
+from decimal import Decimal
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .models import Pago, PagoParcial
+
+
+@receiver(pre_save, sender=PagoParcial)
+def recordar_monto_anterior(sender, instance, raw=False, **kwargs):
+    # Si la instancia no vino de from_db (p. ej. construida con pk), leer el monto guardado
+    if raw or instance._state.adding or hasattr(instance, '_monto_db'):
+        return
+    anterior = PagoParcial.objects.filter(pk=instance.pk).values_list('monto', 'pago_id').first()
+    instance._monto_db, instance._pago_id_db = anterior or (None, None)
+
+
+@receiver(post_save, sender=PagoParcial)
+def actualizar_abonado_al_guardar(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    monto_anterior = None if created else getattr(instance, '_monto_db', None)
+    pago_anterior = None if created else getattr(instance, '_pago_id_db', None)
+
+    if monto_anterior is not None and pago_anterior != instance.pago_id:
+        Pago.objects.filter(pk=pago_anterior).ajustar_abonado(-monto_anterior)
+        monto_anterior = None
+    # El monto puede venir como float/str si no se recargó desde la BD
+    monto = Decimal(str(instance.monto))
+    Pago.objects.filter(pk=instance.pago_id).ajustar_abonado(monto - (monto_anterior or 0))
+
+    instance._monto_db = monto
+    instance._pago_id_db = instance.pago_id
+
+
+@receiver(post_delete, sender=PagoParcial)
+def actualizar_abonado_al_eliminar(sender, instance, **kwargs):
+    Pago.objects.filter(pk=instance.pago_id).ajustar_abonado(-Decimal(str(instance.monto)))
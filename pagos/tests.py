@@ -1,3 +1,53 @@
+from datetime import date, time
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from cursos.models import Curso
+from horarios.models import Horario
+from matriculas.models import Matricula
+from pagos.models import Pago, PagoParcial, EstadoPago
+from usuarios.models import Usuario
+
+
+class TotalAbonadoTests(TestCase):
+    def setUp(self):
+        curso = Curso.objects.create(nombre='Curso de Batería', precio=100)
+        clase = Horario.objects.create(
+            curso=curso,
+            fecha_inicio=date(2025, 1, 1),
+            fecha_fin=date(2025, 6, 30),
+            hora_inicio=time(8, 0),
+            hora_fin=time(9, 0),
+        )
+        estudiante = Usuario.objects.create_user(username='est', password='x')
+        matricula = Matricula.objects.create(estudiante=estudiante, clase=clase)
+        self.pago = Pago.objects.create(matricula=matricula, monto=Decimal('100.00'))
+
+    def total(self):
+        return Pago.objects.values_list('total_abonado', flat=True).get(pk=self.pago.pk)
+
+    def test_abonos_y_saldo(self):
+        PagoParcial.objects.create(pago=self.pago, monto=Decimal('30.10'))
+        abono = PagoParcial.objects.create(pago=self.pago, monto=Decimal('20.20'))
+        self.assertEqual(self.total(), Decimal('50.30'))
+
+        abono.monto = Decimal('69.90')
+        abono.save()
+        self.assertEqual(self.total(), Decimal('100.00'))
+
+        self.pago.actualizar_estado()
+        self.assertEqual(self.pago.estado, EstadoPago.PAGADO)
+        self.assertEqual(self.pago.saldo_pendiente, Decimal('0.00'))
+
+        abono.delete()
+        pago = Pago.objects.with_saldo().get(pk=self.pago.pk)
+        self.assertEqual(pago.saldo, Decimal('69.90'))
+
+    def test_editar_pago_no_pisa_total(self):
+        pago = Pago.objects.get(pk=self.pago.pk)
+        PagoParcial.objects.create(pago=self.pago, monto=Decimal('10.00'))
+
+        pago.observaciones = 'editado con una instancia desactualizada'
+        pago.save()
+        self.assertEqual(self.total(), Decimal('10.00'))
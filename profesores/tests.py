@@ -1,3 +1,70 @@
+import json
+from datetime import date, time
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from asistencias.models import Asistencia, EstadoAsistencia
+from cursos.models import Curso
+from horarios.models import Horario
+from matriculas.models import Matricula
+from pagos.models import Pago, EstadoPago
+from usuarios.models import Usuario
+
+
+class ProfesorClasesTests(TestCase):
+    def setUp(self):
+        self.profesor = Usuario.objects.create_user(username='prof', password='x', rol=Usuario.Rol.PROFESOR)
+        self.client.force_login(self.profesor)
+        self.curso = Curso.objects.create(nombre='Curso de Batería', precio=0)
+        self.n = 0
+
+    def crear_clase(self, estudiantes=3):
+        clase = Horario.objects.create(
+            curso=self.curso, profesor=self.profesor,
+            fecha_inicio=date(2025, 1, 1), fecha_fin=date(2025, 6, 30),
+            hora_inicio=time(8, 0), hora_fin=time(9, 0),
+        )
+        for _ in range(estudiantes):
+            self.n += 1
+            estudiante = Usuario.objects.create_user(username=f'est{self.n}', password='x', rol=Usuario.Rol.ESTUDIANTE)
+            matricula = Matricula.objects.create(estudiante=estudiante, clase=clase)
+            Pago.objects.create(matricula=matricula, monto=10, estado=EstadoPago.PAGADO if self.n % 2 else EstadoPago.PENDIENTE)
+        return clase
+
+    def consultas(self):
+        with CaptureQueriesContext(connection) as capturadas:
+            response = self.client.get(reverse('profesor_clases'))
+        return len(capturadas), response
+
+    def test_consultas_constantes(self):
+        self.crear_clase()
+        antes, _ = self.consultas()
+        for _ in range(5):
+            self.crear_clase(estudiantes=4)
+        despues, _ = self.consultas()
+        self.assertEqual(despues, antes)
+
+    def test_estado_de_pago(self):
+        clase = self.crear_clase(estudiantes=2)
+        _, response = self.consultas()
+
+        estudiantes = json.loads(response.context['estudiantes_por_clase_json'])[str(clase.id)]
+        self.assertEqual([e['pagado'] for e in estudiantes], [True, False])
 
-# Create your tests here.
+    def test_tabla_de_asistencias(self):
+        clase = self.crear_clase(estudiantes=2)
+        for i, matricula in enumerate(Matricula.objects.filter(clase=clase).order_by('id')):
+            Asistencia.objects.create(
+                matricula=matricula, clase=clase, fecha=date(2025, 1, 7),
+                estado=[EstadoAsistencia.PRESENTE, EstadoAsistencia.TARDE][i],
+            )
+        response = self.client.get(reverse('profesor_asistencias'), {
+            'fecha_inicio': '2025-01-06', 'fecha_fin': '2025-01-08', 'codigo_clase': clase.codigo.lower(),
+        })
+        self.assertEqual(response.context['clase'], clase)
+        filas = response.context['tabla_asistencias']
+        self.assertEqual([[c.letra for c in fila['celdas']] for fila in filas], [['-', 'P', '-'], ['-', 'T', '-']])
+        self.assertEqual([t['asistio'] for t in response.context['totales_fecha']], [0, 2, 0])
@@ -4,16 +4,17 @@ from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib.auth import update_session_auth_hash
 from horarios.models import Horario
 from matriculas.models import Matricula
-from pagos.models import Pago, EstadoPago
+from asistencias.matriz import construir_matriz
 from asistencias.models import Asistencia, EstadoAsistencia
+from asistencias.servicios import registrar_asistencias
 from datetime import date, timedelta
 import json
+from django.db.models import Prefetch
 from django.http import JsonResponse, HttpResponse
 from usuarios.models import Usuario
 from django.views.decorators.csrf import csrf_exempt
-from django.template.loader import get_template
-from xhtml2pdf import pisa
-import io
+from reportes.models import TipoReporte
+from reportes.views import respuesta_pdf
 
 @login_required
 def profesor_perfil(request):
@@ -63,21 +64,27 @@ def profesor_clases(request):
     # Solo permite acceso a usuarios con rol PROFESOR
     if not hasattr(request.user, 'rol') or request.user.rol != 'PROFESOR':
         return render(request, 'profesores/acceso_denegado.html', status=403)
-    clases = Horario.objects.filter(profesor=request.user).select_related('curso', 'aula').order_by('-fecha_inicio', '-hora_inicio')
-    # Obtener estudiantes y estado de pago por clase
-    estudiantes_por_clase = {}
-    for clase in clases:
-        matriculas = Matricula.objects.filter(clase=clase).select_related('estudiante')
-        estudiantes_por_clase[clase.id] = [
+    # Estudiantes y estado de pago de todas las clases en una sola consulta adicional
+    clases = Horario.objects.filter(profesor=request.user).select_related('curso', 'aula').prefetch_related(
+        Prefetch(
+            'matriculas',
+            queryset=Matricula.objects.select_related('estudiante').with_pagado().order_by('id'),
+            to_attr='roster',
+        )
+    ).order_by('-fecha_inicio', '-hora_inicio')
+    estudiantes_por_clase = {
+        clase.id: [
             {
                 'id': m.estudiante.id,
                 'nombre': m.estudiante.get_full_name(),
                 'cedula': m.estudiante.cedula,
                 'matricula_id': m.id,
-                'pagado': Pago.objects.filter(matricula=m, estado=EstadoPago.PAGADO).exists()
+                'pagado': m.pagado,
             }
-            for m in matriculas
+            for m in clase.roster
         ]
+        for clase in clases
+    }
     return render(request, 'profesores/profesor_clases.html', {
         'clases': clases,
         'active_tab': 'clases',
@@ -94,9 +101,7 @@ def profesor_asistencias(request):
     fecha_fin = request.GET.get('fecha_fin')
     codigo_clase_filtro = request.GET.get('codigo_clase', '').upper()
     clases = Horario.objects.filter(profesor=request.user).select_related('curso', 'aula')
-    asistencias = Asistencia.objects.filter(clase__profesor=request.user).select_related(
-        'matricula__estudiante', 'clase', 'clase__curso'
-    ).order_by('fecha', 'matricula__estudiante__first_name')
+    asistencias = Asistencia.objects.filter(clase__profesor=request.user)
     fechas_rango = []
     if fecha_inicio and fecha_fin:
         asistencias = asistencias.filter(fecha__gte=fecha_inicio, fecha__lte=fecha_fin)
@@ -111,42 +116,24 @@ def profesor_asistencias(request):
         asistencias = asistencias.filter(fecha=fecha_inicio)
         fechas_rango = [date.fromisoformat(fecha_inicio)]
     if codigo_clase_filtro:
-        asistencias = [a for a in asistencias if a.clase.codigo.upper() == codigo_clase_filtro]
-
-    # Agrupa asistencias por estudiante y fecha
-    estudiantes_dict = {}
-    asistencias_por_estudiante = {}
-    for asistencia in asistencias:
-        est_id = asistencia.matricula.estudiante.id
-        estudiantes_dict[est_id] = asistencia.matricula.estudiante
-        if est_id not in asistencias_por_estudiante:
-            asistencias_por_estudiante[est_id] = {}
-        asistencias_por_estudiante[est_id][asistencia.fecha] = asistencia
+        asistencias = asistencias.filter(clase__codigo=codigo_clase_filtro)
 
-    tabla_asistencias = []
-    for est_id, estudiante in estudiantes_dict.items():
-        fila = {
-            'estudiante': estudiante,
-            'asistencias': []
-        }
-        for fecha in fechas_rango:
-            asistencia = asistencias_por_estudiante.get(est_id, {}).get(fecha)
-            fila['asistencias'].append(asistencia)
-        # Agrega datos de clase solo una vez (todas son de la misma clase por filtro)
-        fila['clase'] = asistencias[0].clase if asistencias else None
-        tabla_asistencias.append(fila)
+    # Tabla estudiante × fecha; todas las filas son de la misma clase por el filtro de código
+    matriz = construir_matriz(asistencias, fechas=fechas_rango, campos={'clase_id': 'clase_id'})
+    clase = None
+    if matriz.datos:
+        clase = clases.filter(id=matriz.datos[0]['clase_id']).first()
 
     return render(request, 'profesores/profesor_asistencias.html', {
         'active_tab': 'asistencias',
-        'asistencias': asistencias,
         'clases': clases,
         'fecha_inicio': fecha_inicio or '',
         'fecha_fin': fecha_fin or '',
         'codigo_clase_filtro': codigo_clase_filtro,
         'fechas_rango': fechas_rango,
-        'estudiantes_dict': estudiantes_dict,
-        'asistencias_por_estudiante': asistencias_por_estudiante,
-        'tabla_asistencias': tabla_asistencias,
+        'clase': clase,
+        'tabla_asistencias': matriz.filas,
+        'totales_fecha': matriz.totales_fecha,
     })
 
 @csrf_exempt
@@ -159,27 +146,15 @@ def guardar_asistencia_profesor(request):
         clase_id = data.get('clase_id')
         fecha = data.get('fecha')
         asistencias = data.get('asistencias', [])
-        from horarios.models import Horario
-        from matriculas.models import Matricula
 
         clase = Horario.objects.get(id=clase_id, profesor=request.user)
         fecha_obj = date.fromisoformat(fecha)
-        for item in asistencias:
-            estudiante_id = item.get('estudiante_id')
-            estado = item.get('estado', EstadoAsistencia.AUSENTE)
-            matricula = Matricula.objects.filter(clase=clase, estudiante_id=estudiante_id).first()
-            if not matricula:
-                continue
-            asistencia_obj, created = Asistencia.objects.get_or_create(
-                matricula=matricula,
-                clase=clase,
-                fecha=fecha_obj,
-                defaults={'estado': estado}
-            )
-            if not created:
-                asistencia_obj.estado = estado
-                asistencia_obj.save()
-        return JsonResponse({'success': True})
+        registros = {
+            item.get('estudiante_id'): {'estado': item.get('estado', EstadoAsistencia.AUSENTE)}
+            for item in asistencias
+        }
+        resultado = registrar_asistencias(clase, fecha_obj, registros)
+        return JsonResponse({'success': True, **resultado})
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
@@ -187,101 +162,4 @@ def guardar_asistencia_profesor(request):
 def profe_reportes_pdf(request):
     if not hasattr(request.user, 'rol') or request.user.rol != 'PROFESOR':
         return redirect('login')
-
-    fecha_inicio = request.GET.get('fecha_inicio')
-    fecha_fin = request.GET.get('fecha_fin')
-    codigo_clase = request.GET.get('codigo_clase', '').upper()
-
-    # Filtrar asistencias del profesor
-    asistencias = Asistencia.objects.filter(
-        clase__profesor=request.user
-    ).select_related('matricula__estudiante', 'clase', 'clase__curso').order_by('fecha', 'matricula__estudiante__first_name')
-
-    if fecha_inicio and fecha_fin:
-        asistencias = asistencias.filter(fecha__gte=fecha_inicio, fecha__lte=fecha_fin)
-    if codigo_clase:
-        asistencias = [a for a in asistencias if a.clase.codigo.upper() == codigo_clase]
-
-    # Obtener fechas del rango
-    fechas_rango = []
-    if fecha_inicio and fecha_fin:
-        try:
-            inicio = date.fromisoformat(fecha_inicio)
-            fin = date.fromisoformat(fecha_fin)
-            delta = (fin - inicio).days
-            fechas_rango = [(inicio + timedelta(days=i)) for i in range(delta + 1)]
-        except Exception:
-            fechas_rango = []
-
-    # Agrupa asistencias por estudiante y fecha
-    estudiantes_dict = {}
-    asistencias_por_estudiante = {}
-    for asistencia in asistencias:
-        est_id = asistencia.matricula.estudiante.id
-        estudiantes_dict[est_id] = asistencia.matricula.estudiante
-        if est_id not in asistencias_por_estudiante:
-            asistencias_por_estudiante[est_id] = {}
-        asistencias_por_estudiante[est_id][asistencia.fecha] = asistencia
-
-    # Ordenamiento consistente por nombre
-    estudiantes_ordenados = sorted(list(estudiantes_dict.values()), key=lambda u: (u.last_name or "", u.first_name or ""))
-
-    # Estructura clásica (no usada por la plantilla nueva, pero mantenida por compatibilidad)
-    tabla_asistencias = []
-    for estudiante in estudiantes_ordenados:
-        est_id = estudiante.id
-        fila = {
-            'estudiante': estudiante,
-            'asistencias': []
-        }
-        for fecha in fechas_rango:
-            asistencia = asistencias_por_estudiante.get(est_id, {}).get(fecha)
-            fila['asistencias'].append(asistencia)
-        fila['clase'] = asistencias[0].clase if asistencias else None
-        tabla_asistencias.append(fila)
-
-    # Partir en bloques de fechas para evitar tablas demasiado anchas
-    chunk_size = 14
-    fechas_chunks = [fechas_rango[i:i + chunk_size] for i in range(0, len(fechas_rango), chunk_size)] if fechas_rango else []
-    tablas_por_chunk = []
-    for fc in fechas_chunks:
-        filas_chunk = []
-        for estudiante in estudiantes_ordenados:
-            est_id = estudiante.id
-            asist_list = []
-            for f in fc:
-                asist_list.append(asistencias_por_estudiante.get(est_id, {}).get(f))
-            filas_chunk.append({
-                'estudiante': estudiante,
-                'clase': asistencias[0].clase if asistencias else None,
-                'asistencias': asist_list,
-            })
-        tablas_por_chunk.append({
-            'fechas': fc,
-            'filas': filas_chunk,
-        })
-
-    context = {
-        'tabla_asistencias': tabla_asistencias,
-        'tablas_por_chunk': tablas_por_chunk,
-        'fechas_chunks': fechas_chunks,
-        'chunk_size': chunk_size,
-        'fechas_rango': fechas_rango,
-        'fecha_inicio': fecha_inicio,
-        'fecha_fin': fecha_fin,
-        'codigo_clase': codigo_clase,
-        'profesor': request.user,
-        'fecha_generacion': date.today(),
-    }
-
-    template = get_template('profesores/profe_reportes.html')
-    html = template.render(context)
-    result = io.BytesIO()
-    pdf = pisa.pisaDocument(io.BytesIO(html.encode("UTF-8")), result)
-    if not pdf.err:
-        response = HttpResponse(result.getvalue(), content_type='application/pdf')
-        filename = f"reporte_asistencias_profesor_{date.today().strftime('%Y%m%d')}.pdf"
-        # Mostrar en el navegador (vista previa) y no descargar automáticamente
-        response['Content-Disposition'] = f'inline; filename="{filename}"'
-        return response
-    return HttpResponse('Error al generar el PDF')
+    return respuesta_pdf(request, TipoReporte.ASISTENCIAS_PROFESOR)
@@ -0,0 +1,161 @@
+"""
+Caché en disco de los PDF ya generados, direccionada por contenido.
+
+La clave es el hash de (tipo de reporte, filtros normalizados, usuario, sello
+de versión de los datos). El sello se arma con la cantidad de filas y la última
+fecha_modificacion de las tablas del reporte (Pago, Asistencia) más un contador
+(VersionCatalogo, una fila que se incrementa con un UPDATE atómico) que las
+señales de reportes.signals incrementan al confirmarse cambios en los datos de
+referencia (usuarios, cursos, clases, aulas, matrículas). Si nada cambió, la
+clave es la misma y el PDF se sirve desde disco; la misma clave es el ETag, así
+que un navegador que ya lo tiene recibe un 304 sin consultar nada más.
+
+La hora de generación que imprimen los PDF ("Generado el ...") no forma parte
+de la clave: un PDF servido desde la caché muestra la de su primer render, es
+decir, desde cuándo los datos son los mismos, no la hora de la descarga.
+
+La carpeta tiene un tamaño máximo: al guardar se eliminan los archivos usados
+hace más tiempo (la fecha de modificación del archivo se actualiza en cada
+acierto y hace de marca de último uso).
+"""
+import hashlib
+import io
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, F, Max
+from django.http import FileResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from .models import VersionCatalogo
+
+TAMANO_MAXIMO = 200 * 1024 * 1024
+
+
+def directorio_cache():
+    return getattr(settings, 'REPORTES_CACHE_DIR', os.path.join(settings.BASE_DIR, 'reportes_generados', 'cache'))
+
+
+def tamano_maximo():
+    return getattr(settings, 'REPORTES_CACHE_MAX_BYTES', TAMANO_MAXIMO)
+
+
+def version_catalogo():
+    return VersionCatalogo.objects.values_list('version', flat=True).filter(pk=1).first() or 1
+
+
+def invalidar_catalogo():
+    # UPDATE ... SET version = version + 1: dos incrementos simultáneos no se pisan
+    if not VersionCatalogo.objects.filter(pk=1).update(version=F('version') + 1):
+        VersionCatalogo.objects.get_or_create(pk=1, defaults={'version': 2})
+
+
+def sello_datos(*consultas):
+    """
+    Sello de versión de los datos: el contador del catálogo más (cantidad,
+    última fecha_modificacion) de cada queryset. Contar detecta las
+    eliminaciones, que no dejan fecha_modificacion.
+    """
+    sello = [version_catalogo()]
+    for consulta in consultas:
+        valores = consulta.order_by().aggregate(n=Count('pk'), m=Max('fecha_modificacion'))
+        sello.append([valores['n'], valores['m']])
+    return sello
+
+
+def clave_reporte(tipo, filtros, usuario_id, sello):
+    """
+    Hash hexadecimal que identifica el contenido del PDF. No incluye la hora de
+    generación impresa en el PDF (cambiaría en cada petición): las descargas
+    siguientes muestran la del primer render con esos datos.
+    """
+    datos = json.dumps(
+        [tipo, sorted(filtros.items()), usuario_id, sello], cls=DjangoJSONEncoder, separators=(',', ':')
+    )
+    return hashlib.sha256(datos.encode()).hexdigest()
+
+
+def _ruta(clave):
+    return os.path.join(directorio_cache(), f'{clave}.pdf')
+
+
+def obtener(clave):
+    """Ruta del PDF cacheado o None; marca el archivo como usado recientemente"""
+    ruta = _ruta(clave)
+    try:
+        os.utime(ruta)
+    except OSError:
+        return None
+    return ruta
+
+
+def guardar(clave, contenido):
+    directorio = directorio_cache()
+    os.makedirs(directorio, exist_ok=True)
+    # Escribir aparte y renombrar: otro worker nunca lee un PDF a medias
+    descriptor, temporal = tempfile.mkstemp(dir=directorio, suffix='.tmp')
+    with os.fdopen(descriptor, 'wb') as archivo:
+        archivo.write(contenido)
+    os.replace(temporal, _ruta(clave))
+    desalojar()
+
+
+def desalojar(limite=None):
+    """Elimina los PDF usados hace más tiempo hasta que la carpeta quede bajo el límite"""
+    limite = tamano_maximo() if limite is None else limite
+    archivos = []
+    total = 0
+    with os.scandir(directorio_cache()) as entradas:
+        for entrada in entradas:
+            if not entrada.name.endswith('.pdf'):
+                continue
+            try:
+                info = entrada.stat()
+            except OSError:
+                continue
+            archivos.append((info.st_mtime, info.st_size, entrada.path))
+            total += info.st_size
+    eliminados = 0
+    for _, tamano, ruta in sorted(archivos):
+        if total <= limite:
+            break
+        try:
+            os.remove(ruta)
+        except OSError:
+            continue
+        total -= tamano
+        eliminados += 1
+    return eliminados
+
+
+def respuesta_pdf_cacheada(request, clave, generar, nombre_archivo):
+    """
+    Devuelve el PDF identificado por `clave`: 304 si el navegador ya lo tiene,
+    desde disco si está cacheado o llamando a generar() (que devuelve los bytes
+    del PDF) y guardándolo si no.
+    """
+    etag = quote_etag(clave)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        archivo = None
+        ruta = obtener(clave)
+        if ruta is not None:
+            try:
+                archivo = open(ruta, 'rb')
+            except OSError:
+                # Otro worker lo desalojó entre obtener() y open()
+                archivo = None
+        if archivo is None:
+            contenido = generar()
+            guardar(clave, contenido)
+            # Lo recién generado se sirve desde memoria (el desalojo pudo haberlo borrado ya)
+            archivo = io.BytesIO(contenido)
+        response = FileResponse(archivo, filename=nombre_archivo, content_type='application/pdf')
+    response['ETag'] = etag
+    # Revalidar siempre: el ETag cambia en cuanto cambian los datos
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,58 @@
+"""
+Estadísticas de los reportes.
+
+Cada reporte calcula sus totales, conteos por estado y rango de fechas con una
+sola consulta de agregación condicional (SUM/COUNT ... FILTER o CASE WHEN,
+según el motor) sobre el queryset ya filtrado, en lugar de una consulta por
+cifra. Las filas se recorren aparte, una sola vez.
+"""
+from decimal import Decimal
+
+from django.db.models import Count, Max, Min, Q, Sum
+
+from asistencias.models import CAMPOS_RESUMEN
+from pagos.models import EstadoPago
+
+# Sufijo de cada estado de pago en las claves del resultado
+SUFIJOS_PAGO = {
+    'pendientes': EstadoPago.PENDIENTE,
+    'pagados': EstadoPago.PAGADO,
+    'cancelados': EstadoPago.CANCELADO,
+}
+
+
+def estadisticas_pagos(pagos):
+    """
+    total_pagos, total_<estado> (suma de montos), count_<estado>, count_pagos y
+    min_fecha/max_fecha de fecha_pago, en una consulta.
+    """
+    medidas = {
+        'total_pagos': Sum('monto'),
+        'count_pagos': Count('id'),
+        'min_fecha': Min('fecha_pago'),
+        'max_fecha': Max('fecha_pago'),
+    }
+    for sufijo, estado in SUFIJOS_PAGO.items():
+        medidas[f'total_{sufijo}'] = Sum('monto', filter=Q(estado=estado))
+        medidas[f'count_{sufijo}'] = Count('id', filter=Q(estado=estado))
+    resultado = pagos.order_by().aggregate(**medidas)
+    # SUM de un conjunto vacío es NULL
+    for clave in ['total_pagos', *(f'total_{sufijo}' for sufijo in SUFIJOS_PAGO)]:
+        resultado[clave] = resultado[clave] or Decimal('0')
+    return resultado
+
+
+def estadisticas_asistencias(asistencias):
+    """
+    Conteos por estado con las claves de CAMPOS_RESUMEN (presentes, tardes,
+    ausentes, justificados), total, dias (fechas distintas) y min_fecha/max_fecha,
+    en una consulta.
+    """
+    medidas = {campo: Count('id', filter=Q(estado=estado)) for campo, estado in CAMPOS_RESUMEN.items()}
+    return asistencias.order_by().aggregate(
+        total=Count('id'),
+        dias=Count('fecha', distinct=True),
+        min_fecha=Min('fecha'),
+        max_fecha=Max('fecha'),
+        **medidas,
+    )
@@ -0,0 +1,319 @@
+"""
+Exportación de los datos de los reportes a CSV y XLSX.
+
+Usa los mismos filtros que los PDF (generacion.filtrar_pagos/filtrar_asistencias)
+y se envía con StreamingHttpResponse. Las filas se leen como tuplas con
+values_list(), sin instanciar modelos, en bloques de TAMANO_BLOQUE: cada bloque
+es una consulta aparte que continúa después de la última fila del anterior
+(paginación por clave sobre las columnas del orden, terminadas en id). No se usa
+iterator(), porque con el cursor por defecto de PyMySQL el driver trae todo el
+resultado antes de entregar la primera fila; así la memoria depende del tamaño
+del bloque y no del reporte. Cada bloque se escribe a la respuesta apenas está
+listo.
+
+El XLSX se arma aquí mismo (un XLSX es un ZIP de archivos XML): la hoja se
+escribe fila por fila dentro del ZIP y lo comprimido se va enviando, sin
+necesitar openpyxl ni tener el libro completo en memoria.
+"""
+import csv
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.db.models import F
+from django.db.models.fields.tuple_lookups import Tuple, TupleGreaterThan
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+
+from asistencias.models import EstadoAsistencia
+from pagos.models import EstadoPago
+from .generacion import filtrar_asistencias, filtrar_pagos, nombre_archivo, normalizar_filtros
+from .models import TipoReporte
+
+TAMANO_BLOQUE = 2000
+# Orden de filtrar_pagos terminado en id, para paginar por clave (también reportes.facturas)
+ORDEN_PAGOS = ('fecha_pago', 'matricula__estudiante__last_name', 'matricula__estudiante__first_name', 'id')
+# Inicio de celda que Excel evalúa como fórmula (los números negativos no son str)
+INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def _por_bloques(consulta, orden, *campos):
+    """
+    values_list(*campos) de `consulta` ordenada por `orden` (columnas sin NULL
+    que terminan en 'id'), pidiendo TAMANO_BLOQUE filas por consulta.
+    """
+    consulta = consulta.order_by(*orden)
+    n = len(orden)
+    ultima = None
+    while True:
+        bloque = consulta
+        if ultima is not None:
+            # (a, b, id) > (a0, b0, id0) como comparación de filas (Django la desarrolla en
+            # SQLite, que no la admite). a >= a0 acota además el rango de la primera columna
+            # para que el índice que empiece por ella limite las filas a ordenar
+            bloque = bloque.filter(
+                TupleGreaterThan(Tuple(*(F(campo) for campo in orden)), ultima),
+                **{f'{orden[0]}__gte': ultima[0]},
+            )
+        filas = list(bloque.values_list(*orden, *campos)[:TAMANO_BLOQUE])
+        for fila in filas:
+            yield fila[n:]
+        if len(filas) < TAMANO_BLOQUE:
+            return
+        ultima = filas[-1][:n]
+
+
+def _filas_pagos(filtros):
+    pagos, _, _ = filtrar_pagos(filtros)
+    filas = _por_bloques(
+        pagos,
+        ORDEN_PAGOS,
+        'id',
+        'fecha_pago',
+        'matricula__estudiante__cedula',
+        'matricula__estudiante__last_name',
+        'matricula__estudiante__first_name',
+        'matricula__clase__curso__nombre',
+        'monto',
+        'total_abonado',
+        'estado',
+        'observaciones',
+    )
+    etiquetas = dict(EstadoPago.choices)
+    for id_, fecha, cedula, apellido, nombre, curso, monto, abonado, estado, observaciones in filas:
+        yield (
+            id_, fecha, cedula, apellido, nombre, curso, monto, abonado, monto - abonado,
+            etiquetas.get(estado, estado), observaciones,
+        )
+
+
+def _filas_asistencias(filtros):
+    asistencias, _, _ = filtrar_asistencias(filtros)
+    filas = _por_bloques(
+        asistencias,
+        ('fecha', 'matricula__estudiante__last_name', 'matricula__estudiante__first_name', 'id'),
+        'fecha',
+        'matricula__estudiante__cedula',
+        'matricula__estudiante__last_name',
+        'matricula__estudiante__first_name',
+        'clase__curso__nombre',
+        'clase__codigo',
+        'estado',
+        'observaciones',
+    )
+    etiquetas = dict(EstadoAsistencia.choices)
+    for fecha, cedula, apellido, nombre, curso, clase, estado, observaciones in filas:
+        yield fecha, cedula, apellido, nombre, curso, clase, etiquetas.get(estado, estado), observaciones
+
+
+# tipo -> (encabezados, generador de filas)
+EXPORTACIONES = {
+    TipoReporte.PAGOS: (
+        ('ID', 'Fecha', 'Cédula', 'Apellidos', 'Nombres', 'Curso', 'Monto', 'Abonado', 'Saldo', 'Estado',
+         'Observaciones'),
+        _filas_pagos,
+    ),
+    TipoReporte.ASISTENCIAS: (
+        ('Fecha', 'Cédula', 'Apellidos', 'Nombres', 'Curso', 'Clase', 'Estado', 'Observaciones'),
+        _filas_asistencias,
+    ),
+}
+
+
+class _Buffer:
+    """Destino de escritura que acumula lo escrito hasta que se retira con vaciar()"""
+
+    def __init__(self, vacio):
+        self.vacio = vacio
+        self.partes = []
+
+    def write(self, datos):
+        self.partes.append(datos)
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = self.vacio.join(self.partes)
+        self.partes = []
+        return datos
+
+
+def _texto_csv(valor):
+    # Excel evalúa como fórmula el texto que empieza con = + - @: el apóstrofo lo deja como texto
+    if isinstance(valor, str) and valor.startswith(INICIO_FORMULA):
+        return f"'{valor}"
+    return valor
+
+
+def filas_csv(encabezados, filas):
+    """Genera el CSV por bloques de TAMANO_BLOQUE filas"""
+    buffer = _Buffer('')
+    writer = csv.writer(buffer)
+    # BOM: Excel abre el archivo como UTF-8 (tildes y ñ)
+    buffer.write('\ufeff')
+    writer.writerow(encabezados)
+    for n, fila in enumerate(filas, start=1):
+        writer.writerow([_texto_csv(valor) for valor in fila])
+        if n % TAMANO_BLOQUE == 0:
+            yield buffer.vaciar()
+    yield buffer.vaciar()
+
+
+# --- XLSX ---
+
+XLSX_ESTATICOS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Estilos de celda: 0 normal, 1 fecha, 2 moneda, 3 encabezado en negrita
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="4">'
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+        '</cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+
+XLSX_HOJA_INICIO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+XLSX_HOJA_FIN = '</sheetData></worksheet>'
+
+ESTILO_FECHA = 1
+ESTILO_MONEDA = 2
+ESTILO_ENCABEZADO = 3
+
+# Día 0 de las fechas seriales de Excel (sistema 1900)
+EPOCA_EXCEL = date(1899, 12, 30)
+# Caracteres de control que XML 1.0 no admite
+CARACTERES_INVALIDOS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _libro(nombre_hoja):
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(nombre_hoja)}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+
+def _columna(indice):
+    """Letra de columna de Excel para un índice desde 0 (0 -> A, 26 -> AA)"""
+    letras = ''
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def _celda(referencia, valor, estilo=0):
+    if valor is None or valor == '':
+        return ''
+    if isinstance(valor, datetime):
+        valor = valor.date()
+    if isinstance(valor, date):
+        return f'<c r="{referencia}" s="{ESTILO_FECHA}"><v>{(valor - EPOCA_EXCEL).days}</v></c>'
+    if isinstance(valor, Decimal):
+        return f'<c r="{referencia}" s="{ESTILO_MONEDA}"><v>{valor}</v></c>'
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return f'<c r="{referencia}"><v>{valor}</v></c>'
+    # inlineStr: Excel lo muestra como texto aunque empiece con '=' (no es una fórmula)
+    texto = escape(CARACTERES_INVALIDOS.sub('', str(valor)))
+    return f'<c r="{referencia}" t="inlineStr" s="{estilo}"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _fila_xlsx(numero, columnas, valores, estilo=0):
+    celdas = ''.join(_celda(f'{col}{numero}', valor, estilo) for col, valor in zip(columnas, valores))
+    return f'<row r="{numero}">{celdas}</row>'.encode()
+
+
+def filas_xlsx(encabezados, filas, nombre_hoja='Datos'):
+    """
+    Genera el XLSX por bloques. El ZIP se escribe sobre un destino sin seek():
+    zipfile agrega entonces descriptores de datos tras cada archivo y lo ya
+    comprimido se puede enviar antes de terminar.
+    """
+    buffer = _Buffer(b'')
+    columnas = [_columna(i) for i in range(len(encabezados))]
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as libro:
+        for nombre, contenido in XLSX_ESTATICOS.items():
+            libro.writestr(nombre, contenido)
+        libro.writestr('xl/workbook.xml', _libro(nombre_hoja))
+        # force_zip64: el tamaño final de la hoja no se conoce al empezar a escribirla
+        with libro.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as hoja:
+            hoja.write(XLSX_HOJA_INICIO.encode())
+            hoja.write(_fila_xlsx(1, columnas, encabezados, ESTILO_ENCABEZADO))
+            for numero, fila in enumerate(filas, start=2):
+                hoja.write(_fila_xlsx(numero, columnas, fila))
+                if numero % TAMANO_BLOQUE == 0:
+                    yield buffer.vaciar()
+            hoja.write(XLSX_HOJA_FIN.encode())
+    yield buffer.vaciar()
+
+
+def respuesta_exportacion(request, tipo):
+    """Exporta los datos del reporte `tipo` con los filtros de la petición en ?formato=csv|xlsx"""
+    formato = request.GET.get('formato', 'csv')
+    if formato not in FORMATOS:
+        return HttpResponseBadRequest('Formato de exportación inválido')
+    encabezados, generador = EXPORTACIONES[tipo]
+    filas = generador(normalizar_filtros(tipo, request.GET))
+    if formato == 'csv':
+        contenido = filas_csv(encabezados, filas)
+    else:
+        contenido = filas_xlsx(encabezados, filas, nombre_hoja=tipo.label)
+    response = StreamingHttpResponse(contenido, content_type=FORMATOS[formato])
+    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo(tipo, formato)}"'
+    return response
@@ -0,0 +1,155 @@
+"""
+Facturas en lote.
+
+Genera la factura (la misma plantilla de usuarios.views.factura_pago_pdf) de
+cada pago que cumple los filtros del reporte de pagos y las entrega en un solo
+PDF unido con pypdf o en un ZIP con un PDF por pago. Lo usan los trabajos
+FACTURAS del worker `procesar_reportes` y el comando `generar_facturas`.
+
+El renderizado, que es lo que cuesta, se reparte en lotes entre procesos
+aparte. Los procesos no consultan la base de datos: reciben los pagos ya
+cargados con sus relaciones y abonos, y devuelven los bytes de cada PDF.
+
+Los pagos se leen de a TAMANO_CARGA (paginación por clave, como la exportación)
+y solo hay unos pocos lotes en vuelo por proceso, así la memoria no crece con
+la cantidad de facturas. El ZIP se escribe factura por factura; el PDF unido
+no, porque pypdf guarda todas las páginas hasta escribir el archivo: por eso
+admite como mucho REPORTES_MAXIMO_FACTURAS_PDF facturas.
+"""
+import io
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+from pypdf import PdfWriter
+
+from .exportacion import ORDEN_PAGOS, _por_bloques
+from .generacion import filtrar_pagos, renderizar_pdf
+from .motores import ErrorGeneracionPDF
+from .renderizador import precalentar_si_corresponde
+
+PLANTILLA_FACTURA = 'reportes/factura_pago_pdf.html'
+# Facturas por tarea enviada a un proceso: lotes chicos reparten mejor la carga y
+# permiten informar el avance seguido; muy chicos pagan más en comunicación
+TAMANO_LOTE = 8
+# Pagos cargados por consulta, con sus relaciones y abonos
+TAMANO_CARGA = 200
+# Lotes enviados y aún sin recoger por cada proceso
+LOTES_EN_VUELO = 2
+
+
+def procesos_facturas():
+    return getattr(settings, 'REPORTES_PROCESOS_FACTURAS', None) or os.cpu_count() or 1
+
+
+def maximo_facturas_pdf():
+    return getattr(settings, 'REPORTES_MAXIMO_FACTURAS_PDF', 500)
+
+
+def _partir(elementos, tamano):
+    elementos = iter(elementos)
+    while lote := list(islice(elementos, tamano)):
+        yield lote
+
+
+def pagos_para_facturar(params):
+    """Pagos que cumplen `params` en el orden del reporte, cargados de a TAMANO_CARGA"""
+    pagos, _, _ = filtrar_pagos(params)
+    ids = (pago_id for pago_id, in _por_bloques(pagos, ORDEN_PAGOS, 'id'))
+    for bloque in _partir(ids, TAMANO_CARGA):
+        cargados = pagos.prefetch_related('pagos_parciales').in_bulk(bloque)
+        # Un pago borrado entre consultas simplemente no se factura
+        yield from (cargados[pago_id] for pago_id in bloque if pago_id in cargados)
+
+
+def _iniciar_proceso():
+    # Con spawn o forkserver el proceso arranca sin Django configurado
+    if not apps.ready:
+        django.setup()
+    # Con fork las cachés ya vienen del padre si este las precalentó
+    precalentar_si_corresponde()
+
+
+def _renderizar_lote(pagos, usuario, fecha_generacion):
+    """[pago] -> [(pago_id, bytes del PDF)]; se ejecuta en los procesos del pool"""
+    resultado = []
+    for pago in pagos:
+        destino = io.BytesIO()
+        renderizar_pdf(PLANTILLA_FACTURA, {
+            'pago': pago,
+            'usuario_generador': usuario,
+            'fecha_generacion': fecha_generacion,
+        }, destino)
+        resultado.append((pago.id, destino.getvalue()))
+    return resultado
+
+
+def renderizar_facturas(pagos, usuario, procesos=None):
+    """Genera (pago_id, PDF) en el orden de `pagos`, repartiendo lotes entre `procesos` procesos"""
+    procesos = procesos or procesos_facturas()
+    fecha_generacion = datetime.now()
+    lotes = _partir(pagos, TAMANO_LOTE)
+    if procesos <= 1:
+        for lote in lotes:
+            yield from _renderizar_lote(lote, usuario, fecha_generacion)
+        return
+    # Con fork los procesos heredan las conexiones abiertas: cerrarlas antes para
+    # que ninguno comparta el socket del padre (el padre reconecta al consultar)
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_proceso) as pool:
+        # Con fork el primer envío crea todos los procesos: que sea antes de leer los pagos
+        pool.submit(os.getpid).result()
+        # pool.map enviaría todos los lotes de una vez (y leería todos los pagos)
+        en_vuelo = deque()
+        for lote in lotes:
+            en_vuelo.append(pool.submit(_renderizar_lote, lote, usuario, fecha_generacion))
+            if len(en_vuelo) >= procesos * LOTES_EN_VUELO:
+                yield from en_vuelo.popleft().result()
+        while en_vuelo:
+            yield from en_vuelo.popleft().result()
+
+
+def generar_facturas(params, usuario, destino, progreso=None, procesos=None):
+    """
+    Escribe en `destino` las facturas de los pagos que cumplen `params`: un PDF
+    unido o, con params['formato'] == 'zip', un ZIP. progreso(hechas, total) se
+    llama al empezar y tras cada lote. Devuelve la cantidad de facturas.
+    """
+    total = filtrar_pagos(params)[0].count()
+    if not total:
+        raise ErrorGeneracionPDF('No hay pagos que coincidan con los filtros seleccionados')
+    en_zip = params.get('formato') == 'zip'
+    if not en_zip and total > maximo_facturas_pdf():
+        raise ErrorGeneracionPDF(
+            f'El PDF unido admite hasta {maximo_facturas_pdf()} facturas ({total} pedidas): '
+            'use el formato ZIP o acote los filtros'
+        )
+    if progreso:
+        progreso(0, total)
+    # Con un solo lote no vale la pena levantar procesos
+    procesos = min(procesos or procesos_facturas(), -(-total // TAMANO_LOTE))
+    facturas = renderizar_facturas(pagos_para_facturar(params), usuario, procesos)
+
+    def avisar(hechas):
+        if progreso and (hechas % TAMANO_LOTE == 0 or hechas == total):
+            progreso(hechas, total)
+
+    if en_zip:
+        with zipfile.ZipFile(destino, 'w', compression=zipfile.ZIP_DEFLATED) as archivo:
+            for hechas, (pago_id, contenido) in enumerate(facturas, start=1):
+                archivo.writestr(f'factura_pago_{pago_id}.pdf', contenido)
+                avisar(hechas)
+    else:
+        unido = PdfWriter()
+        for hechas, (pago_id, contenido) in enumerate(facturas, start=1):
+            unido.append(io.BytesIO(contenido))
+            avisar(hechas)
+        unido.write(destino)
+    return total
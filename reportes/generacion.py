@@ -0,0 +1,495 @@
+"""
+Generación de los reportes PDF.
+
+Cada reporte se arma a partir de un diccionario de filtros (request.GET en las
+vistas síncronas o los parámetros guardados en un TrabajoReporte) y del usuario
+que lo solicita, de modo que la misma función sirve para responder en la
+petición o para renderizar en segundo plano con el worker `procesar_reportes`.
+"""
+import os
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from asistencias.matriz import construir_matriz
+from asistencias.models import Asistencia
+from cursos.models import Curso
+from horarios.models import Horario
+from pagos.models import Pago
+from usuarios.importacion import procesar_importacion
+from usuarios.models import Usuario
+from . import motores
+from .estadisticas import estadisticas_asistencias, estadisticas_pagos
+from .models import EstadoTrabajo, TipoReporte, TrabajoReporte, directorio_reportes
+from .motores import ErrorGeneracionPDF  # noqa: F401
+
+
+def _parse_date_param(value):
+    # Parseo seguro de fechas (para mostrar correctamente en el template)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except Exception:
+        return None
+
+
+def filtrar_pagos(params):
+    """Pagos que cumplen los filtros del reporte; devuelve (queryset, fecha_inicio, fecha_fin)"""
+    fecha_inicio_str = params.get('fecha_inicio')
+    fecha_fin_str = params.get('fecha_fin')
+    estado_filtro = params.get('estado')
+    curso_id = params.get('curso')
+    clase_id = params.get('clase')
+    profesor_id = params.get('profesor')
+    q = params.get('q')  # nombre o cédula del estudiante
+
+    # Filtrar pagos
+    pagos = Pago.objects.select_related(
+        'matricula__estudiante',
+        'matricula__clase__curso'
+    ).order_by('fecha_pago', 'matricula__estudiante__last_name', 'matricula__estudiante__first_name')
+
+    fecha_inicio = _parse_date_param(fecha_inicio_str)
+    fecha_fin = _parse_date_param(fecha_fin_str)
+
+    if fecha_inicio:
+        pagos = pagos.filter(fecha_pago__gte=fecha_inicio)
+
+    if fecha_fin:
+        pagos = pagos.filter(fecha_pago__lte=fecha_fin)
+
+    if estado_filtro:
+        pagos = pagos.filter(estado=estado_filtro)
+    if curso_id:
+        pagos = pagos.filter(matricula__clase__curso_id=curso_id)
+    if clase_id:
+        pagos = pagos.filter(matricula__clase_id=clase_id)
+    if profesor_id:
+        pagos = pagos.filter(matricula__clase__profesor_id=profesor_id)
+    if q:
+        pagos = pagos.filter(
+            Q(matricula__estudiante__first_name__icontains=q) |
+            Q(matricula__estudiante__last_name__icontains=q) |
+            Q(matricula__estudiante__cedula__icontains=q)
+        )
+    return pagos, fecha_inicio, fecha_fin
+
+
+def contexto_reporte_pagos(params, usuario):
+    estado_filtro = params.get('estado')
+    curso_id = params.get('curso')
+    clase_id = params.get('clase')
+    profesor_id = params.get('profesor')
+    q = params.get('q')
+
+    pagos, fecha_inicio, fecha_fin = filtrar_pagos(params)
+
+    # Totales, conteos por estado y rango de fechas en una sola consulta
+    stats = estadisticas_pagos(pagos)
+
+    # Determinar período efectivo a mostrar (si no vienen ambas fechas, min/max del conjunto filtrado)
+    periodo_inicio = fecha_inicio or stats['min_fecha']
+    periodo_fin = fecha_fin or stats['max_fecha']
+
+    # Obtener objetos seleccionados para mostrar en el PDF
+    curso_sel = None
+    clase_sel = None
+    profesor_sel = None
+    if curso_id:
+        try:
+            curso_sel = Curso.objects.get(id=curso_id)
+        except Curso.DoesNotExist:
+            curso_sel = None
+    if clase_id:
+        try:
+            clase_sel = Horario.objects.select_related('curso').get(id=clase_id)
+        except Horario.DoesNotExist:
+            clase_sel = None
+    if profesor_id:
+        try:
+            profesor_sel = Usuario.objects.get(id=profesor_id)
+        except Usuario.DoesNotExist:
+            profesor_sel = None
+
+    return {
+        'pagos': pagos,
+        'total_pagos': stats['total_pagos'],
+        'total_pendientes': stats['total_pendientes'],
+        'total_pagados': stats['total_pagados'],
+        'total_cancelados': stats['total_cancelados'],
+        'count_pendientes': stats['count_pendientes'],
+        'count_pagados': stats['count_pagados'],
+        'count_cancelados': stats['count_cancelados'],
+        'fecha_inicio': fecha_inicio,
+        'fecha_fin': fecha_fin,
+        'periodo_inicio': periodo_inicio,
+        'periodo_fin': periodo_fin,
+        'estado_filtro': estado_filtro,
+        'curso_sel': curso_sel,
+        'clase_sel': clase_sel,
+        'profesor_sel': profesor_sel,
+        'query_estudiante': q,
+        'fecha_generacion': datetime.now(),
+        'usuario_generador': usuario,
+        'count_pagos': stats['count_pagos'],
+    }
+
+
+def filtrar_asistencias(params):
+    """Asistencias que cumplen los filtros del reporte; devuelve (queryset, fecha_inicio, fecha_fin)"""
+    fecha_inicio_str = params.get('fecha_inicio')
+    fecha_fin_str = params.get('fecha_fin')
+    clase_filtro = params.get('clase')
+    estado_filtro = params.get('estado')
+    curso_id = params.get('curso')
+    profesor_id = params.get('profesor')
+    q = params.get('q')  # nombre o cédula del estudiante
+
+    # Filtrar asistencias
+    asistencias = Asistencia.objects.all()
+
+    fecha_inicio = _parse_date_param(fecha_inicio_str)
+    fecha_fin = _parse_date_param(fecha_fin_str)
+
+    if fecha_inicio:
+        asistencias = asistencias.filter(fecha__gte=fecha_inicio)
+
+    if fecha_fin:
+        asistencias = asistencias.filter(fecha__lte=fecha_fin)
+
+    if clase_filtro:
+        asistencias = asistencias.filter(clase_id=clase_filtro)
+
+    if estado_filtro:
+        asistencias = asistencias.filter(estado=estado_filtro)
+
+    if curso_id:
+        asistencias = asistencias.filter(clase__curso_id=curso_id)
+
+    if profesor_id:
+        asistencias = asistencias.filter(clase__profesor_id=profesor_id)
+
+    if q:
+        asistencias = asistencias.filter(
+            Q(matricula__estudiante__first_name__icontains=q) |
+            Q(matricula__estudiante__last_name__icontains=q) |
+            Q(matricula__estudiante__cedula__icontains=q)
+        )
+    return asistencias, fecha_inicio, fecha_fin
+
+
+def contexto_reporte_asistencias(params, usuario):
+    clase_filtro = params.get('clase')
+    estado_filtro = params.get('estado')
+    curso_id = params.get('curso')
+    profesor_id = params.get('profesor')
+    q = params.get('q')
+
+    asistencias, fecha_inicio, fecha_fin = filtrar_asistencias(params)
+
+    # Totales por estado, días y rango de fechas en una sola consulta
+    stats = estadisticas_asistencias(asistencias)
+
+    # Tabla cruzada estudiante × fecha en una pasada por las filas (tuplas, sin instanciar modelos)
+    matriz = construir_matriz(asistencias, campos={'curso': 'matricula__clase__curso__nombre'})
+
+    total_presentes = stats['presentes']
+    total_tardanzas = stats['tardes']
+    total_ausentes = stats['ausentes']
+    total_justificados = stats['justificados']
+    total_asistencias = stats['total']
+
+    # Porcentajes
+    porcentaje_presentes = (total_presentes / total_asistencias * 100) if total_asistencias > 0 else 0
+    porcentaje_ausentes = ((total_ausentes + total_tardanzas) / total_asistencias * 100) if total_asistencias > 0 else 0
+
+    # Obtener información de la clase seleccionada
+    clase_seleccionada = None
+    if clase_filtro:
+        try:
+            clase_seleccionada = Horario.objects.select_related('curso', 'profesor').get(id=clase_filtro)
+        except Horario.DoesNotExist:
+            pass
+
+    # Determinar período efectivo a mostrar
+    periodo_inicio = fecha_inicio or stats['min_fecha']
+    periodo_fin = fecha_fin or stats['max_fecha']
+
+    # Obtener objetos seleccionados para mostrar en el PDF
+    curso_sel = None
+    profesor_sel = None
+    if curso_id:
+        try:
+            curso_sel = Curso.objects.get(id=curso_id)
+        except Curso.DoesNotExist:
+            curso_sel = None
+    if profesor_id:
+        try:
+            profesor_sel = Usuario.objects.get(id=profesor_id)
+        except Usuario.DoesNotExist:
+            profesor_sel = None
+
+    return {
+        'filas_asistencia': matriz.filas,
+        'totales_fecha': matriz.totales_fecha,
+        'fechas_periodo': matriz.fechas,
+        'total_asistencias': total_asistencias,
+        'total_presentes': total_presentes,
+        'total_tardanzas': total_tardanzas,
+        'total_ausentes': total_ausentes,
+        'total_justificados': total_justificados,
+        'porcentaje_presentes': round(porcentaje_presentes, 1),
+        'porcentaje_ausentes': round(porcentaje_ausentes, 1),
+        'fecha_inicio': fecha_inicio,
+        'fecha_fin': fecha_fin,
+        'periodo_inicio': periodo_inicio,
+        'periodo_fin': periodo_fin,
+        'clase_filtro': clase_filtro,
+        'clase_seleccionada': clase_seleccionada,
+        'estado_filtro': estado_filtro,
+        'curso_sel': curso_sel,
+        'profesor_sel': profesor_sel,
+        'query_estudiante': q,
+        'fecha_generacion': datetime.now(),
+        'usuario_generador': usuario,
+        'total_estudiantes': len(matriz.estudiantes),
+        'total_dias': stats['dias'],
+    }
+
+
+def filtrar_asistencias_profesor(params, usuario):
+    """Asistencias de las clases del profesor en el rango y la clase pedidos"""
+    fecha_inicio = params.get('fecha_inicio')
+    fecha_fin = params.get('fecha_fin')
+    codigo_clase = (params.get('codigo_clase') or '').upper()
+
+    asistencias = Asistencia.objects.filter(clase__profesor=usuario)
+    if fecha_inicio and fecha_fin:
+        asistencias = asistencias.filter(fecha__gte=fecha_inicio, fecha__lte=fecha_fin)
+    if codigo_clase:
+        asistencias = asistencias.filter(clase__codigo=codigo_clase)
+    return asistencias
+
+
+def contexto_reporte_profesor(params, usuario):
+    fecha_inicio = params.get('fecha_inicio')
+    fecha_fin = params.get('fecha_fin')
+    codigo_clase = (params.get('codigo_clase') or '').upper()
+
+    asistencias = filtrar_asistencias_profesor(params, usuario)
+
+    # Obtener fechas del rango
+    fechas_rango = []
+    if fecha_inicio and fecha_fin:
+        try:
+            inicio = date.fromisoformat(fecha_inicio)
+            fin = date.fromisoformat(fecha_fin)
+            delta = (fin - inicio).days
+            fechas_rango = [(inicio + timedelta(days=i)) for i in range(delta + 1)]
+        except Exception:
+            fechas_rango = []
+
+    matriz = construir_matriz(asistencias, fechas=fechas_rango, campos={'clase_id': 'clase_id'})
+    clase = None
+    if matriz.datos:
+        clase = Horario.objects.select_related('curso').filter(id=matriz.datos[0]['clase_id']).first()
+
+    # Partir en bloques de fechas para evitar tablas demasiado anchas
+    chunk_size = 14
+    tablas_por_chunk = matriz.bloques(chunk_size)
+
+    return {
+        'clase': clase,
+        'tablas_por_chunk': tablas_por_chunk,
+        'chunk_size': chunk_size,
+        'fechas_rango': fechas_rango,
+        'fecha_inicio': fecha_inicio,
+        'fecha_fin': fecha_fin,
+        'codigo_clase': codigo_clase,
+        'profesor': usuario,
+        'fecha_generacion': date.today(),
+    }
+
+
+# Tipo de reporte -> (función de contexto, plantilla, nombre del archivo)
+REPORTES = {
+    TipoReporte.PAGOS: (
+        contexto_reporte_pagos, 'reportes/pagos_reporte_pdf.html', 'reporte_pagos.pdf',
+    ),
+    TipoReporte.ASISTENCIAS: (
+        contexto_reporte_asistencias, 'reportes/asistencias_reporte_pdf.html', 'reporte_asistencias.pdf',
+    ),
+    TipoReporte.ASISTENCIAS_PROFESOR: (
+        contexto_reporte_profesor, 'profesores/profe_reportes.html', 'reporte_asistencias_profesor_{hoy:%Y%m%d}.pdf',
+    ),
+}
+
+# Las facturas en lote no tienen plantilla de reporte propia (reportes.facturas)
+NOMBRE_FACTURAS = 'facturas_{hoy:%Y%m%d}.pdf'
+
+# Filtros que acepta cada reporte (lo demás se descarta)
+PARAMETROS_REPORTE = {
+    TipoReporte.PAGOS: ('fecha_inicio', 'fecha_fin', 'estado', 'curso', 'clase', 'profesor', 'q'),
+    TipoReporte.ASISTENCIAS: ('fecha_inicio', 'fecha_fin', 'estado', 'curso', 'clase', 'profesor', 'q'),
+    TipoReporte.ASISTENCIAS_PROFESOR: ('fecha_inicio', 'fecha_fin', 'codigo_clase'),
+    TipoReporte.FACTURAS: ('fecha_inicio', 'fecha_fin', 'estado', 'curso', 'clase', 'profesor', 'q', 'formato'),
+}
+FORMATOS_FACTURAS = ('pdf', 'zip')
+
+
+def consultas_sello(tipo, params, usuario):
+    """
+    Filas del reporte (con fecha_modificacion) cuyo sello de versión invalida el
+    PDF cacheado: las mismas que filtra el reporte, no la tabla entera.
+    """
+    if tipo == TipoReporte.PAGOS:
+        return (filtrar_pagos(params)[0],)
+    if tipo == TipoReporte.ASISTENCIAS:
+        return (filtrar_asistencias(params)[0],)
+    return (filtrar_asistencias_profesor(params, usuario),)
+
+
+def normalizar_filtros(tipo, params):
+    """
+    Filtros del reporte sin valores vacíos y en forma canónica (fechas ISO,
+    código de clase en mayúsculas), para que filtros equivalentes den la misma
+    clave de caché. Las fechas y formatos inválidos se descartan, como al generar.
+    """
+    filtros = {}
+    for campo in PARAMETROS_REPORTE[tipo]:
+        valor = (params.get(campo) or '').strip()
+        if campo.startswith('fecha_'):
+            fecha = _parse_date_param(valor)
+            valor = fecha.isoformat() if fecha else ''
+        elif campo == 'codigo_clase':
+            valor = valor.upper()
+        elif campo == 'formato':
+            valor = valor.lower() if valor.lower() in FORMATOS_FACTURAS else ''
+        if valor:
+            filtros[campo] = valor
+    return filtros
+
+
+def nombre_archivo(tipo, extension='pdf'):
+    patron = NOMBRE_FACTURAS if tipo == TipoReporte.FACTURAS else REPORTES[tipo][2]
+    return f"{os.path.splitext(patron.format(hoy=date.today()))[0]}.{extension}"
+
+
+def renderizar_pdf(plantilla, contexto, destino):
+    """Renderiza la plantilla con xhtml2pdf y escribe el PDF en `destino` (archivo binario)"""
+    motores.MOTORES[motores.MOTOR_POR_DEFECTO].renderizar(None, plantilla, contexto, destino)
+
+
+def generar_reporte(tipo, params, usuario, destino, motor=None):
+    """
+    Arma el contexto del reporte `tipo` con los filtros `params` y escribe el PDF
+    en `destino` con el motor configurado (o `motor`). Devuelve el motor usado.
+    """
+    funcion_contexto, plantilla, _ = REPORTES[tipo]
+    return motores.renderizar(tipo, plantilla, funcion_contexto(params, usuario), destino, motor)
+
+
+def _avance(trabajo, aviso=None):
+    """progreso(hechas, total) que guarda el avance del trabajo en la base de datos"""
+    def progreso(hechas, total):
+        TrabajoReporte.objects.filter(id=trabajo.id).update(progreso=hechas, total=total)
+        trabajo.progreso, trabajo.total = hechas, total
+        if aviso:
+            aviso(hechas, total)
+    return progreso
+
+
+# Segundos entre latidos de un trabajo en curso (procesar_reportes --reintentar-tras)
+SEGUNDOS_LATIDO = 30
+
+
+@contextmanager
+def _latiendo(trabajo):
+    """
+    Renueva trabajo.latido cada SEGUNDOS_LATIDO desde un hilo aparte, también
+    mientras se renderiza un PDF que no informa avance.
+    """
+    detener = threading.Event()
+
+    def latir():
+        try:
+            while not detener.wait(SEGUNDOS_LATIDO):
+                TrabajoReporte.objects.latir(trabajo.id)
+        finally:
+            # Conexión propia del hilo
+            connection.close()
+
+    hilo = threading.Thread(target=latir, name=f'latido-trabajo-{trabajo.id}', daemon=True)
+    hilo.start()
+    try:
+        yield
+    finally:
+        detener.set()
+        hilo.join()
+
+
+def _procesar_importacion(trabajo, aviso=None, procesos=None):
+    """Importa los usuarios del archivo subido; el resumen queda en trabajo.resultado"""
+    try:
+        trabajo.resultado = procesar_importacion(trabajo.parametros, progreso=_avance(trabajo, aviso), procesos=procesos)
+    except Exception as e:
+        trabajo.estado = EstadoTrabajo.ERROR
+        trabajo.error = str(e) or e.__class__.__name__
+    else:
+        trabajo.estado = EstadoTrabajo.COMPLETADO
+    trabajo.fecha_fin = timezone.now()
+    trabajo.save(update_fields=['estado', 'resultado', 'error', 'fecha_fin'])
+
+
+def procesar_trabajo(trabajo, aviso=None, procesos=None):
+    """
+    Genera el archivo de un TrabajoReporte ya tomado por el worker. El archivo se
+    escribe con un nombre temporal y se renombra al terminar, así la descarga
+    nunca ve un archivo a medio escribir. En las facturas en lote y las
+    importaciones de usuarios, `aviso(hechas, total)` recibe el avance y
+    `procesos` fija los procesos de renderizado o de hash. Mientras dura, el
+    trabajo late cada SEGUNDOS_LATIDO para que ningún worker lo reencole.
+    """
+    with _latiendo(trabajo):
+        if trabajo.tipo == TipoReporte.IMPORTACION_USUARIOS:
+            _procesar_importacion(trabajo, aviso, procesos)
+        else:
+            _procesar_archivo(trabajo, aviso, procesos)
+
+
+def _procesar_archivo(trabajo, aviso=None, procesos=None):
+    """Genera el PDF o ZIP del trabajo y lo deja en REPORTES_DIR"""
+    directorio = directorio_reportes()
+    os.makedirs(directorio, exist_ok=True)
+    extension = 'pdf'
+    if trabajo.tipo == TipoReporte.FACTURAS:
+        extension = trabajo.parametros.get('formato') or 'pdf'
+    archivo = f"reporte_{trabajo.id}.{extension}"
+    temporal = os.path.join(directorio, f"{archivo}.tmp")
+    try:
+        with open(temporal, 'wb') as destino:
+            if trabajo.tipo == TipoReporte.FACTURAS:
+                # Importación diferida: reportes.facturas usa este módulo
+                from .facturas import generar_facturas
+                generar_facturas(
+                    trabajo.parametros, trabajo.usuario, destino, progreso=_avance(trabajo, aviso), procesos=procesos,
+                )
+            else:
+                generar_reporte(trabajo.tipo, trabajo.parametros, trabajo.usuario, destino)
+        os.replace(temporal, os.path.join(directorio, archivo))
+    except Exception as e:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        trabajo.estado = EstadoTrabajo.ERROR
+        trabajo.error = str(e) or e.__class__.__name__
+    else:
+        trabajo.estado = EstadoTrabajo.COMPLETADO
+        trabajo.archivo = archivo
+        trabajo.nombre_descarga = nombre_archivo(trabajo.tipo, extension)
+    trabajo.fecha_fin = timezone.now()
+    trabajo.save(update_fields=['estado', 'archivo', 'nombre_descarga', 'error', 'fecha_fin'])
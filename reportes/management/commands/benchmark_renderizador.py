@@ -0,0 +1,102 @@
+import io
+import time
+from datetime import date, datetime, time as hora, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.template.loader import get_template
+from xhtml2pdf import pisa
+from asistencias.matriz import MatrizAsistencia
+from cursos.models import Curso
+from horarios.models import Horario
+from matriculas.models import Matricula
+from pagos.models import EstadoPago, Pago, PagoParcial
+from reportes import renderizador
+from reportes.management.commands.benchmark_reportes import (
+    ESTADOS_ASISTENCIA, _estudiantes, contexto_asistencias, contexto_pagos,
+)
+from usuarios.models import Usuario
+
+
+def contexto_factura(usuario):
+    """Contexto de una factura con dos abonos ya cargados (como los deja prefetch_related)"""
+    estudiante = _estudiantes(1)[0]
+    pago = Pago(
+        id=1, matricula=Matricula(estudiante=estudiante, clase=Horario(curso=Curso(nombre='Curso de Guitarra'))),
+        monto=Decimal('90.00'), total_abonado=Decimal('60.00'), fecha_pago=date(2025, 1, 6),
+        estado=EstadoPago.PENDIENTE,
+    )
+    abonos = [PagoParcial(pago=pago, monto=Decimal('30.00'), fecha=date(2025, 1, 6 + i)) for i in range(2)]
+    pago._prefetched_objects_cache = {'pagos_parciales': PagoParcial.objects.none()}
+    pago._prefetched_objects_cache['pagos_parciales']._result_cache = abonos
+    return {'pago': pago, 'usuario_generador': usuario, 'fecha_generacion': datetime.now()}
+
+
+def contexto_profesor(estudiantes, usuario, dias):
+    """Contexto del PDF de asistencias del profesor: la matriz de una clase en bloques de 14 fechas"""
+    clase = Horario(curso=Curso(nombre='Curso de Guitarra'), codigo='GUI-01', hora_inicio=hora(8), hora_fin=hora(10))
+    fechas = [date(2025, 1, 6) + timedelta(days=7 * i) for i in range(dias)]
+    matriz = MatrizAsistencia.desde_filas(
+        (e.id, e.first_name, e.last_name, e.cedula, fecha, ESTADOS_ASISTENCIA[(e.id + j) % 4])
+        for e in estudiantes
+        for j, fecha in enumerate(fechas)
+    )
+    return {
+        'profesor': usuario, 'clase': clase, 'fecha_inicio': fechas[0], 'fecha_fin': fechas[-1],
+        'fecha_generacion': datetime.now(), 'tablas_por_chunk': matriz.bloques(14),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara por documento xhtml2pdf directo (plantilla y CSS procesados en cada PDF) con el renderizador "
+        "precalentado de reportes.renderizador, en las plantillas PDF y con datos sintéticos en memoria"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--documentos',
+            type=int,
+            default=30,
+            help='Documentos por plantilla y forma de renderizar (por defecto: 30)',
+        )
+        parser.add_argument(
+            '--estudiantes',
+            type=int,
+            default=10,
+            help='Estudiantes en los reportes de pagos y asistencias (por defecto: 10, documentos chicos)',
+        )
+
+    def handle(self, *args, **options):
+        usuario = Usuario(username='benchmark', first_name='Benchmark')
+        estudiantes = _estudiantes(options['estudiantes'])
+        contextos = {
+            'reportes/factura_pago_pdf.html': contexto_factura(usuario),
+            'reportes/pagos_reporte_pdf.html': contexto_pagos(estudiantes, usuario),
+            'reportes/asistencias_reporte_pdf.html': contexto_asistencias(estudiantes, usuario, 8),
+            'profesores/profe_reportes.html': contexto_profesor(estudiantes, usuario, 8),
+        }
+
+        def directo(plantilla, contexto, destino):
+            html = get_template(plantilla).render(contexto)
+            pisa.pisaDocument(io.BytesIO(html.encode('UTF-8')), destino)
+
+        renderizador.limpiar()
+        inicio = time.perf_counter()
+        renderizador.precalentar()
+        self.stdout.write(f"Precalentado en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+        self.stdout.write(f"{'plantilla':<40} {'directo ms':>10} {'caché ms':>9} {'ahorro':>7}")
+        for plantilla, contexto in contextos.items():
+            medidas = []
+            for funcion in (directo, renderizador.renderizar):
+                # Un documento fuera de la medición (carga de fuentes, cargador de plantillas)
+                funcion(plantilla, contexto, io.BytesIO())
+                inicio = time.perf_counter()
+                for _ in range(options['documentos']):
+                    funcion(plantilla, contexto, io.BytesIO())
+                medidas.append((time.perf_counter() - inicio) / options['documentos'] * 1000)
+            self.stdout.write(
+                f"{plantilla:<40} {medidas[0]:>10.1f} {medidas[1]:>9.1f} {1 - medidas[1] / medidas[0]:>7.0%}"
+            )
+        self.stdout.write(self.style.SUCCESS("Benchmark terminado."))
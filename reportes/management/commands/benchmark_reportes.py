@@ -0,0 +1,139 @@
+import io
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from asistencias.matriz import LETRA_ESTADO, MatrizAsistencia
+from cursos.models import Curso
+from horarios.models import Horario
+from matriculas.models import Matricula
+from pagos.models import EstadoPago, Pago
+from reportes.generacion import REPORTES
+from reportes.models import TipoReporte
+from reportes.motores import MOTORES
+from usuarios.models import Usuario
+
+ESTADOS_ASISTENCIA = list(LETRA_ESTADO)
+ESTADOS_PAGO = [EstadoPago.PAGADO, EstadoPago.PENDIENTE, EstadoPago.CANCELADO]
+
+
+def _estudiantes(cantidad):
+    return [
+        Usuario(id=i, first_name=f'Nombre{i}', last_name=f'Apellido{i}', cedula=f'{i:010d}')
+        for i in range(1, cantidad + 1)
+    ]
+
+
+def contexto_pagos(estudiantes, usuario):
+    """Contexto del reporte de pagos con un pago por estudiante, sin tocar la base de datos"""
+    clase = Horario(curso=Curso(nombre='Curso de Guitarra'))
+    pagos = [
+        Pago(
+            matricula=Matricula(estudiante=estudiante, clase=clase),
+            monto=Decimal('45.00'),
+            fecha_pago=date(2025, 1, 1) + timedelta(days=i % 28),
+            estado=ESTADOS_PAGO[i % 3],
+        )
+        for i, estudiante in enumerate(estudiantes)
+    ]
+    total = sum(p.monto for p in pagos)
+    return {
+        'pagos': pagos, 'total_pagos': total, 'total_pendientes': total / 3, 'total_pagados': total / 3,
+        'total_cancelados': total / 3, 'count_pendientes': 0, 'count_pagados': 0, 'count_cancelados': 0,
+        'fecha_inicio': date(2025, 1, 1), 'fecha_fin': date(2025, 1, 31),
+        'periodo_inicio': date(2025, 1, 1), 'periodo_fin': date(2025, 1, 31),
+        'estado_filtro': None, 'curso_sel': None, 'clase_sel': None, 'profesor_sel': None,
+        'query_estudiante': None, 'fecha_generacion': datetime.now(), 'usuario_generador': usuario,
+        'count_pagos': len(pagos),
+    }
+
+
+def contexto_asistencias(estudiantes, usuario, dias):
+    """Contexto de la tabla cruzada de asistencias: `dias` fechas por estudiante"""
+    fechas = [date(2025, 1, 6) + timedelta(days=7 * i) for i in range(dias)]
+    matriz = MatrizAsistencia.desde_filas(
+        (
+            (e.id, e.first_name, e.last_name, e.cedula, fecha, ESTADOS_ASISTENCIA[(e.id + j) % 4], 'Curso de Guitarra')
+            for e in estudiantes
+            for j, fecha in enumerate(fechas)
+        ),
+        campos=('curso',),
+    )
+    total = len(estudiantes) * dias
+    return {
+        'filas_asistencia': matriz.filas, 'totales_fecha': matriz.totales_fecha, 'fechas_periodo': fechas,
+        'total_asistencias': total,
+        'total_presentes': total // 4, 'total_tardanzas': total // 4, 'total_ausentes': total // 4,
+        'total_justificados': total // 4, 'porcentaje_presentes': 25.0, 'porcentaje_ausentes': 50.0,
+        'fecha_inicio': fechas[0], 'fecha_fin': fechas[-1], 'periodo_inicio': fechas[0], 'periodo_fin': fechas[-1],
+        'clase_filtro': None, 'clase_seleccionada': None, 'estado_filtro': None, 'curso_sel': None,
+        'profesor_sel': None, 'query_estudiante': None, 'fecha_generacion': datetime.now(),
+        'usuario_generador': usuario, 'total_estudiantes': len(estudiantes), 'total_dias': len(fechas),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el tiempo de los motores de PDF (xhtml2pdf y reportlab) en los reportes de pagos y "
+        "asistencias con datos sintéticos en memoria (no consulta la base de datos)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--estudiantes',
+            type=int,
+            nargs='+',
+            default=[50, 500, 5000],
+            help='Cantidades de estudiantes a medir (por defecto: 50 500 5000)',
+        )
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=16,
+            help='Fechas por estudiante en la tabla de asistencias (por defecto: 16, un trimestre semanal)',
+        )
+        parser.add_argument(
+            '--motores',
+            nargs='+',
+            choices=sorted(MOTORES),
+            default=sorted(MOTORES),
+        )
+        parser.add_argument(
+            '--reportes',
+            nargs='+',
+            choices=[TipoReporte.PAGOS, TipoReporte.ASISTENCIAS],
+            default=[TipoReporte.PAGOS, TipoReporte.ASISTENCIAS],
+        )
+        parser.add_argument(
+            '--limite-xhtml2pdf',
+            type=int,
+            default=None,
+            help='Omite xhtml2pdf por encima de esta cantidad de estudiantes (puede tardar varios minutos)',
+        )
+
+    def handle(self, *args, **options):
+        usuario = Usuario(username='benchmark', first_name='Benchmark')
+        self.stdout.write(f"{'reporte':<12} {'estudiantes':>11} {'motor':<10} {'segundos':>9} {'KB':>8}")
+        for tipo in options['reportes']:
+            plantilla = REPORTES[tipo][1]
+            for cantidad in options['estudiantes']:
+                estudiantes = _estudiantes(cantidad)
+                if tipo == TipoReporte.PAGOS:
+                    contexto = contexto_pagos(estudiantes, usuario)
+                else:
+                    contexto = contexto_asistencias(estudiantes, usuario, options['dias'])
+                for nombre in options['motores']:
+                    if nombre == 'xhtml2pdf' and options['limite_xhtml2pdf'] and cantidad > options['limite_xhtml2pdf']:
+                        self.stdout.write(f"{tipo:<12} {cantidad:>11} {nombre:<10} {'omitido':>9}")
+                        continue
+                    destino = io.BytesIO()
+                    inicio = time.perf_counter()
+                    try:
+                        MOTORES[nombre].renderizar(tipo, plantilla, contexto, destino)
+                    except Exception as e:
+                        raise CommandError(f"{nombre} falló con {tipo} ({cantidad} estudiantes): {e}")
+                    segundos = time.perf_counter() - inicio
+                    self.stdout.write(
+                        f"{tipo:<12} {cantidad:>11} {nombre:<10} {segundos:>9.2f} {len(destino.getvalue()) // 1024:>8}"
+                    )
@@ -0,0 +1,69 @@
+import shutil
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from pagos.models import EstadoPago
+from reportes.generacion import FORMATOS_FACTURAS, normalizar_filtros, procesar_trabajo
+from reportes.models import EstadoTrabajo, TipoReporte, TrabajoReporte
+from usuarios.models import Usuario
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera en lote las facturas de los pagos filtrados (estado, curso, fechas) en un PDF unido o un ZIP, "
+        "renderizándolas en varios procesos. Queda registrado como trabajo de reporte, con su avance"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--estado', choices=EstadoPago.values)
+        parser.add_argument('--curso', type=int, help='ID del curso')
+        parser.add_argument('--fecha-inicio', help='Fecha de pago desde (AAAA-MM-DD)')
+        parser.add_argument('--fecha-fin', help='Fecha de pago hasta (AAAA-MM-DD)')
+        parser.add_argument('--formato', choices=FORMATOS_FACTURAS, default='pdf')
+        parser.add_argument(
+            '--procesos',
+            type=int,
+            default=None,
+            help='Procesos de renderizado (por defecto: REPORTES_PROCESOS_FACTURAS o los núcleos disponibles)',
+        )
+        parser.add_argument(
+            '--usuario',
+            help='Usuario que figura como generador (por defecto: el primer administrador activo)',
+        )
+        parser.add_argument('--salida', help='Copia el archivo generado a esta ruta')
+
+    def handle(self, *args, **options):
+        administradores = Usuario.objects.filter(rol=Usuario.Rol.ADMIN, is_active=True).order_by('id')
+        if options['usuario']:
+            usuario = Usuario.objects.filter(username=options['usuario']).first()
+        else:
+            usuario = administradores.first()
+        if usuario is None:
+            raise CommandError("No se encontró el usuario generador.")
+
+        parametros = normalizar_filtros(TipoReporte.FACTURAS, {
+            'estado': options['estado'],
+            'curso': str(options['curso'] or ''),
+            'fecha_inicio': options['fecha_inicio'],
+            'fecha_fin': options['fecha_fin'],
+            'formato': options['formato'],
+        })
+        # Se registra y procesa en el acto: el avance también se ve desde la página de reportes.
+        # Con latido, como los que toma el worker: si este proceso muere, el worker lo reencola
+        ahora = timezone.now()
+        trabajo = TrabajoReporte.objects.create(
+            tipo=TipoReporte.FACTURAS, parametros=parametros, usuario=usuario,
+            estado=EstadoTrabajo.PROCESANDO, fecha_inicio=ahora, latido=ahora,
+        )
+
+        def aviso(hechas, total):
+            self.stdout.write(f"{hechas}/{total} facturas")
+
+        procesar_trabajo(trabajo, aviso=aviso, procesos=options['procesos'])
+        if trabajo.estado != EstadoTrabajo.COMPLETADO:
+            raise CommandError(f"Trabajo #{trabajo.id}: {trabajo.error}")
+        ruta = trabajo.ruta_archivo
+        if options['salida']:
+            shutil.copyfile(ruta, options['salida'])
+            ruta = options['salida']
+        self.stdout.write(self.style.SUCCESS(f"{trabajo.total} facturas generadas en {ruta} (trabajo #{trabajo.id})."))
@@ -0,0 +1,70 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+from reportes.generacion import SEGUNDOS_LATIDO, procesar_trabajo
+from reportes.models import EstadoTrabajo, TrabajoReporte
+from reportes.renderizador import precalentar_si_corresponde
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker de reportes PDF: toma los trabajos pendientes de la tabla TrabajoReporte y los genera "
+        "en disco. Se ejecuta como un proceso aparte (systemd, supervisor, etc.), sin broker externo"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help='Procesa los trabajos pendientes y termina en lugar de quedarse esperando',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=2.0,
+            help='Segundos de espera entre consultas cuando no hay trabajos (por defecto: 2)',
+        )
+        parser.add_argument(
+            '--reintentar-tras',
+            type=int,
+            default=120,
+            help=(
+                'Segundos sin latido tras los que un trabajo PROCESANDO se considera interrumpido y se reencola '
+                f'(por defecto: 120; los trabajos en curso laten cada {SEGUNDOS_LATIDO})'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options['reintentar_tras'] <= SEGUNDOS_LATIDO:
+            raise CommandError(f"--reintentar-tras debe ser mayor que el intervalo de latido ({SEGUNDOS_LATIDO} s).")
+        precalentar_si_corresponde()
+
+        procesados = 0
+        while True:
+            # El worker vive mucho tiempo: descartar conexiones caídas o vencidas
+            close_old_connections()
+            # Trabajos de otro worker que murió o quedó colgado (su latido se atrasó)
+            limite = timezone.now() - timedelta(seconds=options['reintentar_tras'])
+            reencolados = TrabajoReporte.objects.reencolar_interrumpidos(limite)
+            if reencolados:
+                self.stdout.write(f"{reencolados} trabajos interrumpidos devueltos a la cola.")
+            trabajo = TrabajoReporte.objects.select_related('usuario').tomar_siguiente()
+            if trabajo is None:
+                if options['una_vez']:
+                    break
+                time.sleep(options['intervalo'])
+                continue
+
+            inicio = time.monotonic()
+            procesar_trabajo(trabajo)
+            procesados += 1
+            segundos = time.monotonic() - inicio
+            if trabajo.estado == EstadoTrabajo.COMPLETADO:
+                self.stdout.write(f"Reporte #{trabajo.id} ({trabajo.get_tipo_display()}) generado en {segundos:.1f} s.")
+            else:
+                self.stderr.write(f"Reporte #{trabajo.id} ({trabajo.get_tipo_display()}) falló: {trabajo.error}")
+
+        self.stdout.write(self.style.SUCCESS(f"{procesados} reportes procesados."))
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrabajoReporte",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "tipo",
+                    models.CharField(
+                        choices=[
+                            ("PAGOS", "Pagos"),
+                            ("ASISTENCIAS", "Asistencias"),
+                            ("ASISTENCIAS_PROFESOR", "Asistencias del profesor"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "parametros",
+                    models.JSONField(
+                        blank=True,
+                        default=dict,
+                        help_text="Filtros del formulario del reporte",
+                    ),
+                ),
+                (
+                    "estado",
+                    models.CharField(
+                        choices=[
+                            ("PENDIENTE", "Pendiente"),
+                            ("PROCESANDO", "Procesando"),
+                            ("COMPLETADO", "Completado"),
+                            ("ERROR", "Error"),
+                        ],
+                        default="PENDIENTE",
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "archivo",
+                    models.CharField(
+                        blank=True,
+                        help_text="Nombre del PDF dentro de REPORTES_DIR",
+                        max_length=255,
+                    ),
+                ),
+                ("nombre_descarga", models.CharField(blank=True, max_length=100)),
+                ("error", models.TextField(blank=True)),
+                ("fecha_creacion", models.DateTimeField(auto_now_add=True)),
+                ("fecha_inicio", models.DateTimeField(blank=True, null=True)),
+                ("fecha_fin", models.DateTimeField(blank=True, null=True)),
+                (
+                    "usuario",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="trabajos_reporte",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["estado", "fecha_creacion"],
+                        name="trabajo_estado_fecha_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reportes", "0001_trabajoreporte"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="trabajoreporte",
+            name="progreso",
+            field=models.PositiveIntegerField(
+                default=0, help_text="Elementos generados (facturas en lote)"
+            ),
+        ),
+        migrations.AddField(
+            model_name="trabajoreporte",
+            name="total",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Elementos a generar; 0 si el trabajo no informa avance",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="trabajoreporte",
+            name="archivo",
+            field=models.CharField(
+                blank=True,
+                help_text="Nombre del archivo dentro de REPORTES_DIR",
+                max_length=255,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="trabajoreporte",
+            name="tipo",
+            field=models.CharField(
+                choices=[
+                    ("PAGOS", "Pagos"),
+                    ("ASISTENCIAS", "Asistencias"),
+                    ("ASISTENCIAS_PROFESOR", "Asistencias del profesor"),
+                    ("FACTURAS", "Facturas"),
+                ],
+                max_length=20,
+            ),
+        ),
+    ]
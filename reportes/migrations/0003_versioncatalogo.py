@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:27
+
+from django.db import migrations, models
+
+
+def crear_fila(apps, schema_editor):
+    VersionCatalogo = apps.get_model("reportes", "VersionCatalogo")
+    VersionCatalogo.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reportes", "0002_trabajoreporte_progreso"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VersionCatalogo",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("version", models.PositiveBigIntegerField(default=1)),
+            ],
+        ),
+        migrations.RunPython(crear_fila, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reportes", "0003_versioncatalogo"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="trabajoreporte",
+            name="resultado",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                help_text="Resumen de los trabajos sin archivo (importaciones)",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="trabajoreporte",
+            name="tipo",
+            field=models.CharField(
+                choices=[
+                    ("PAGOS", "Pagos"),
+                    ("ASISTENCIAS", "Asistencias"),
+                    ("ASISTENCIAS_PROFESOR", "Asistencias del profesor"),
+                    ("FACTURAS", "Facturas"),
+                    ("IMPORTACION_USUARIOS", "Importación de usuarios"),
+                ],
+                max_length=20,
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:48
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def latido_desde_inicio(apps, schema_editor):
+    # Los trabajos que ya estaban en curso se reencolan según su fecha de inicio
+    TrabajoReporte = apps.get_model("reportes", "TrabajoReporte")
+    TrabajoReporte.objects.filter(estado="PROCESANDO").update(latido=F("fecha_inicio"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reportes", "0004_trabajoreporte_importacion"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="trabajoreporte",
+            name="latido",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="Última señal del worker que lo procesa; si se atrasa, el trabajo se reencola",
+                null=True,
+            ),
+        ),
+        migrations.RunPython(latido_desde_inicio, migrations.RunPython.noop),
+    ]
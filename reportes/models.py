@@ -1,3 +1,110 @@
+import os
+
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+
+class TipoReporte(models.TextChoices):
+    PAGOS = 'PAGOS', 'Pagos'
+    ASISTENCIAS = 'ASISTENCIAS', 'Asistencias'
+    ASISTENCIAS_PROFESOR = 'ASISTENCIAS_PROFESOR', 'Asistencias del profesor'
+    FACTURAS = 'FACTURAS', 'Facturas'
+    # No genera archivo: importa usuarios desde el archivo subido en el panel
+    IMPORTACION_USUARIOS = 'IMPORTACION_USUARIOS', 'Importación de usuarios'
+
+
+class EstadoTrabajo(models.TextChoices):
+    PENDIENTE = 'PENDIENTE', 'Pendiente'
+    PROCESANDO = 'PROCESANDO', 'Procesando'
+    COMPLETADO = 'COMPLETADO', 'Completado'
+    ERROR = 'ERROR', 'Error'
+
+
+def directorio_reportes():
+    """Carpeta donde el worker deja los archivos generados"""
+    return getattr(settings, 'REPORTES_DIR', os.path.join(settings.BASE_DIR, 'reportes_generados'))
+
+
+class TrabajoReporteQuerySet(models.QuerySet):
+    def tomar_siguiente(self):
+        """
+        Marca como PROCESANDO el trabajo pendiente más antiguo y lo devuelve
+        (None si no hay). El UPDATE condicionado al estado evita que dos
+        workers tomen el mismo trabajo sin necesitar bloqueos de fila.
+        """
+        while True:
+            trabajo = self.filter(estado=EstadoTrabajo.PENDIENTE).order_by('fecha_creacion', 'id').first()
+            if trabajo is None:
+                return None
+            ahora = timezone.now()
+            tomado = self.filter(id=trabajo.id, estado=EstadoTrabajo.PENDIENTE).update(
+                estado=EstadoTrabajo.PROCESANDO, fecha_inicio=ahora, latido=ahora,
+            )
+            if tomado:
+                trabajo.estado = EstadoTrabajo.PROCESANDO
+                trabajo.fecha_inicio = trabajo.latido = ahora
+                return trabajo
+
+    def latir(self, trabajo_id):
+        """Renueva el latido del trabajo mientras el worker lo sigue procesando"""
+        return self.filter(id=trabajo_id, estado=EstadoTrabajo.PROCESANDO).update(latido=timezone.now())
+
+    def reencolar_interrumpidos(self, antes_de):
+        """
+        Devuelve a PENDIENTE los trabajos PROCESANDO cuyo último latido es anterior
+        a `antes_de`: el worker que los tomó murió o quedó colgado.
+        """
+        return self.filter(estado=EstadoTrabajo.PROCESANDO, latido__lt=antes_de).update(
+            estado=EstadoTrabajo.PENDIENTE, fecha_inicio=None, latido=None,
+        )
+
+
+class TrabajoReporte(models.Model):
+    tipo = models.CharField(max_length=20, choices=TipoReporte.choices)
+    parametros = models.JSONField(default=dict, blank=True, help_text="Filtros del formulario del reporte")
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='trabajos_reporte'
+    )
+    estado = models.CharField(max_length=10, choices=EstadoTrabajo.choices, default=EstadoTrabajo.PENDIENTE)
+    archivo = models.CharField(max_length=255, blank=True, help_text="Nombre del archivo dentro de REPORTES_DIR")
+    nombre_descarga = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+    progreso = models.PositiveIntegerField(default=0, help_text="Elementos generados (facturas en lote)")
+    total = models.PositiveIntegerField(default=0, help_text="Elementos a generar; 0 si el trabajo no informa avance")
+    resultado = models.JSONField(default=dict, blank=True, help_text="Resumen de los trabajos sin archivo (importaciones)")
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+    latido = models.DateTimeField(
+        null=True, blank=True, help_text="Última señal del worker que lo procesa; si se atrasa, el trabajo se reencola"
+    )
+
+    objects = TrabajoReporteQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['estado', 'fecha_creacion'], name='trabajo_estado_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.id} ({self.get_estado_display()})"
+
+    @property
+    def ruta_archivo(self):
+        return os.path.join(directorio_reportes(), self.archivo) if self.archivo else None
+
+    @property
+    def terminado(self):
+        return self.estado in (EstadoTrabajo.COMPLETADO, EstadoTrabajo.ERROR)
+
+
+class VersionCatalogo(models.Model):
+    """
+    Contador de una sola fila (reportes.cache_pdf): se incrementa con un UPDATE
+    atómico cuando cambian los datos de referencia que aparecen en los PDF.
+    """
+    version = models.PositiveBigIntegerField(default=1)
 
-# Create your models here.
+    def __str__(self):
+        return f"Catálogo v{self.version}"
@@ -0,0 +1,322 @@
+"""
+Motores de renderizado de los reportes PDF.
+
+Todos los motores reciben el mismo contexto que arma reportes.generacion y
+escriben el PDF en un archivo binario. `xhtml2pdf` renderiza la plantilla HTML
+(con las cachés de reportes.renderizador) y sirve para cualquier reporte;
+`reportlab` construye las tablas directamente con platypus, sin pasar por HTML,
+y solo implementa los reportes de pagos y de asistencias (las tablas grandes).
+El motor de cada reporte se elige con el setting REPORTES_MOTOR_PDF; si el
+elegido no soporta el reporte o falla, se usa xhtml2pdf.
+"""
+import io
+import logging
+
+from django.conf import settings
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.platypus import HRFlowable, LongTable, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from . import renderizador
+from .models import TipoReporte
+
+logger = logging.getLogger(__name__)
+
+MOTOR_POR_DEFECTO = 'xhtml2pdf'
+
+
+class ErrorGeneracionPDF(Exception):
+    pass
+
+
+class MotorXhtml2pdf:
+    nombre = 'xhtml2pdf'
+
+    def soporta(self, tipo):
+        return True
+
+    def renderizar(self, tipo, plantilla, contexto, destino):
+        pdf = renderizador.renderizar(plantilla, contexto, destino)
+        if pdf.err:
+            raise ErrorGeneracionPDF('Error al generar el PDF')
+
+
+# Estilos compartidos por los reportes de ReportLab (equivalentes al CSS de las plantillas)
+TITULO = ParagraphStyle('titulo', fontName='Helvetica-Bold', fontSize=18, leading=22, alignment=TA_CENTER)
+SUBTITULO = ParagraphStyle('subtitulo', fontName='Helvetica', fontSize=12, leading=15, alignment=TA_CENTER)
+PIE = ParagraphStyle('pie', fontName='Helvetica', fontSize=8, leading=10, alignment=TA_CENTER)
+SIN_DATOS = ParagraphStyle('sin_datos', fontName='Helvetica-Oblique', fontSize=10, leading=14, alignment=TA_CENTER)
+
+ESTILO_TABLA = [
+    ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f5f5f5')),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#fafafa')]),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+]
+
+FECHAS_POR_BLOQUE = 20
+
+# Alto fijo de las filas (una o dos líneas de texto a 8-9 pt): sin medir cada celda,
+# dividir la tabla entre páginas cuesta lo mismo en la primera que en la última
+ALTO_FILA = 16
+ALTO_FILA_DOBLE = 24
+
+
+def _fecha(valor, formato='%d/%m/%Y'):
+    return valor.strftime(formato) if valor else ''
+
+
+def _moneda(valor):
+    return f"$ {valor or 0:,.2f}"
+
+
+def _nombre(usuario):
+    return f"{usuario.last_name}, {usuario.first_name}"
+
+
+def _iterar(filas):
+    # Los querysets se recorren por bloques sin llenar su caché de resultados
+    return filas.iterator(chunk_size=2000) if hasattr(filas, 'iterator') else iter(filas)
+
+
+class MotorReportlab:
+    nombre = 'reportlab'
+
+    def soporta(self, tipo):
+        return tipo in (TipoReporte.PAGOS, TipoReporte.ASISTENCIAS)
+
+    def renderizar(self, tipo, plantilla, contexto, destino):
+        if tipo == TipoReporte.PAGOS:
+            self._pagos(contexto, destino)
+        else:
+            self._asistencias(contexto, destino)
+
+    def _encabezado(self, titulo, meta, tamano_meta, ancho):
+        estilo_meta = TableStyle([
+            ('FONT', (0, 0), (-1, -1), 'Helvetica', tamano_meta),
+            ('FONT', (0, 0), (0, -1), 'Helvetica-Bold', tamano_meta),
+            ('FONT', (2, 0), (2, -1), 'Helvetica-Bold', tamano_meta),
+            ('LEFTPADDING', (0, 0), (-1, -1), 0),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ])
+        return [
+            Paragraph('Academia Musical', TITULO),
+            Paragraph(titulo, SUBTITULO),
+            HRFlowable(width='100%', thickness=1, color=colors.black, spaceBefore=6, spaceAfter=10),
+            Table(meta, colWidths=[ancho * 0.18, ancho * 0.32] * 2, style=estilo_meta, hAlign='LEFT'),
+            Spacer(1, 8),
+        ]
+
+    def _resumen(self, celdas, tamano, ancho):
+        return Table([celdas], colWidths=[ancho / len(celdas)] * len(celdas), style=TableStyle([
+            ('FONT', (0, 0), (-1, -1), 'Helvetica-Bold', tamano),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ]))
+
+    def _pie(self, contexto):
+        generado = _fecha(contexto['fecha_generacion'], '%d/%m/%Y %H:%M')
+        return [
+            HRFlowable(width='100%', thickness=1, color=colors.black, spaceBefore=10, spaceAfter=6),
+            Paragraph(f"Academia Musical - Sistema de Gestión | Generado el {generado}", PIE),
+        ]
+
+    def _generado_por(self, contexto):
+        usuario = contexto['usuario_generador']
+        return [
+            'Generado:', _fecha(contexto['fecha_generacion'], '%d/%m/%Y %H:%M'),
+            'Usuario:', usuario.get_full_name() or usuario.username,
+        ]
+
+    def _pagos(self, contexto, destino):
+        doc = SimpleDocTemplate(
+            destino, pagesize=A4, leftMargin=1.5 * cm, rightMargin=1.5 * cm,
+            topMargin=1.5 * cm, bottomMargin=1.5 * cm, title='Reporte de Pagos - Academia Musical',
+        )
+        ancho = doc.width
+
+        inicio, fin = contexto['periodo_inicio'], contexto['periodo_fin']
+        if inicio and fin:
+            periodo = f"{_fecha(inicio)} - {_fecha(fin)}"
+        elif inicio:
+            periodo = f"Desde {_fecha(inicio)}"
+        elif fin:
+            periodo = f"Hasta {_fecha(fin)}"
+        else:
+            periodo = '-'
+        estados = {'PAGADO': 'Pagados', 'PENDIENTE': 'Pendientes', 'CANCELADO': 'Cancelados'}
+        estado = contexto['estado_filtro']
+        meta = [
+            self._generado_por(contexto),
+            ['Período:', periodo, 'Registros:', str(contexto['count_pagos'])],
+            ['Estado:', estados.get(estado, estado) if estado else 'Todos', '', ''],
+        ]
+        if contexto['curso_sel']:
+            meta.append(['Curso:', contexto['curso_sel'].nombre, '', ''])
+        if contexto['clase_sel']:
+            clase = contexto['clase_sel']
+            meta.append(['Clase:', f"{clase.curso.nombre} - {clase.aula or ''} ({clase.hora_inicio})", '', ''])
+        if contexto['profesor_sel']:
+            meta.append(['Profesor:', _nombre(contexto['profesor_sel']), '', ''])
+        if contexto['query_estudiante']:
+            meta.append(['Estudiante:', contexto['query_estudiante'], '', ''])
+
+        historia = self._encabezado('Reporte de Pagos', meta, 10, ancho)
+        historia.append(self._resumen([
+            f"Total General\n{_moneda(contexto['total_pagos'])}",
+            f"Total Pagado\n{_moneda(contexto['total_pagados'])}",
+            f"Total Pendiente\n{_moneda(contexto['total_pendientes'])}",
+        ], 11, ancho))
+        historia.append(Spacer(1, 10))
+
+        filas = [['N°', 'Estudiante', 'Cédula', 'Curso', 'Fecha de pago', 'Monto', 'Estado']]
+        for numero, pago in enumerate(_iterar(contexto['pagos']), start=1):
+            estudiante = pago.matricula.estudiante
+            filas.append([
+                str(numero),
+                _nombre(estudiante),
+                estudiante.cedula or '-',
+                pago.matricula.clase.curso.nombre,
+                _fecha(pago.fecha_pago),
+                _moneda(pago.monto),
+                pago.get_estado_display(),
+            ])
+        if len(filas) > 1:
+            proporciones = (0.05, 0.25, 0.12, 0.24, 0.12, 0.12, 0.10)
+            historia.append(LongTable(
+                filas, colWidths=[ancho * p for p in proporciones], rowHeights=[ALTO_FILA] * len(filas), repeatRows=1,
+                style=TableStyle(ESTILO_TABLA + [
+                    ('FONT', (0, 1), (-1, -1), 'Helvetica', 9),
+                    ('FONTSIZE', (0, 0), (-1, 0), 9),
+                    ('ALIGN', (0, 0), (0, -1), 'CENTER'),
+                    ('ALIGN', (2, 0), (2, -1), 'CENTER'),
+                    ('ALIGN', (4, 0), (4, -1), 'CENTER'),
+                    ('ALIGN', (5, 1), (5, -1), 'RIGHT'),
+                    ('ALIGN', (6, 0), (6, -1), 'CENTER'),
+                ]),
+            ))
+        else:
+            historia.append(Paragraph('No se encontraron registros para los filtros seleccionados.', SIN_DATOS))
+
+        historia += self._pie(contexto)
+        doc.build(historia)
+
+    def _asistencias(self, contexto, destino):
+        doc = SimpleDocTemplate(
+            destino, pagesize=landscape(A4), leftMargin=1.2 * cm, rightMargin=1.2 * cm,
+            topMargin=1.2 * cm, bottomMargin=1.2 * cm, title='Reporte de Asistencias - Academia Musical',
+        )
+        ancho = doc.width
+
+        clase = contexto['clase_seleccionada']
+        profesor = contexto['profesor_sel']
+        periodo = ' - '.join(_fecha(f) for f in (contexto['periodo_inicio'], contexto['periodo_fin']) if f)
+        meta = [
+            self._generado_por(contexto),
+            ['Período:', periodo, 'Estudiantes:', str(contexto['total_estudiantes'])],
+            ['Clase:', f"{clase.curso.nombre} - {clase.aula or ''}" if clase else 'Todas',
+             'Total Días:', str(contexto['total_dias'])],
+            ['Estado:', contexto['estado_filtro'].title() if contexto['estado_filtro'] else 'Todos',
+             'Curso:', contexto['curso_sel'].nombre if contexto['curso_sel'] else 'Todos'],
+            ['Profesor:', _nombre(profesor) if profesor else 'Todos',
+             'Estudiante:', contexto['query_estudiante'] or '-'],
+        ]
+        historia = self._encabezado('Reporte de Asistencias', meta, 9, ancho)
+        historia.append(self._resumen([
+            f"Presentes\n{contexto['total_presentes']} ({contexto['porcentaje_presentes']}%)",
+            f"Tardanzas\n{contexto['total_tardanzas']}",
+            f"Ausentes\n{contexto['total_ausentes']}",
+            f"Justificados\n{contexto['total_justificados']}",
+        ], 9, ancho))
+        historia.append(Spacer(1, 10))
+
+        estudiantes = contexto['filas_asistencia']
+        fechas = contexto['fechas_periodo']
+        if not estudiantes:
+            historia.append(Paragraph(
+                'No se encontraron registros. No hay asistencias que coincidan con los filtros seleccionados.',
+                SIN_DATOS,
+            ))
+            historia += self._pie(contexto)
+            doc.build(historia)
+            return
+
+        # Columnas fijas por estudiante; las fechas se reparten en bloques para que la tabla quepa a lo ancho
+        fijas = []
+        for numero, datos in enumerate(estudiantes, start=1):
+            estudiante = datos['estudiante']
+            fijas.append([str(numero), f"{_nombre(estudiante)}\n{estudiante.cedula or '-'}", datos['curso']])
+        asistio = [f"{datos['asistio']}/{contexto['total_dias']}" for datos in estudiantes]
+        totales = [str(total['asistio']) for total in contexto['totales_fecha']]
+        inicios = range(0, len(fechas), FECHAS_POR_BLOQUE) or [0]
+
+        ancho_fijas = [0.9 * cm, 5.5 * cm, 3.5 * cm]
+        ancho_total = 1.9 * cm
+        for inicio in inicios:
+            bloque = fechas[inicio:inicio + FECHAS_POR_BLOQUE]
+            if len(inicios) > 1:
+                historia.append(Paragraph(
+                    f"Fechas {_fecha(bloque[0], '%d/%m')} a {_fecha(bloque[-1], '%d/%m')}",
+                    ParagraphStyle('bloque', fontName='Helvetica-Bold', fontSize=9, leading=12, spaceBefore=6),
+                ))
+            filas = [['N°', 'Estudiante', 'Curso'] + [_fecha(f, '%d/%m') for f in bloque] + ['Asist. (P+T)']]
+            for fila_fija, datos, total in zip(fijas, estudiantes, asistio):
+                celdas = [celda.letra for celda in datos['celdas'][inicio:inicio + FECHAS_POR_BLOQUE]]
+                filas.append(fila_fija + celdas + [total])
+            filas.append(['', 'Asistieron (P+T)', ''] + totales[inicio:inicio + FECHAS_POR_BLOQUE] + [''])
+            ancho_fecha = (ancho - sum(ancho_fijas) - ancho_total) / max(len(bloque), FECHAS_POR_BLOQUE)
+            historia.append(LongTable(
+                filas, colWidths=ancho_fijas + [ancho_fecha] * len(bloque) + [ancho_total],
+                rowHeights=[ALTO_FILA] + [ALTO_FILA_DOBLE] * len(estudiantes) + [ALTO_FILA], repeatRows=1,
+                style=TableStyle(ESTILO_TABLA + [
+                    ('FONT', (0, 1), (-1, -1), 'Helvetica', 8),
+                    ('FONTSIZE', (0, 0), (-1, 0), 8),
+                    ('FONT', (3, 1), (-2, -1), 'Helvetica-Bold', 8),
+                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                    ('ALIGN', (1, 0), (2, -1), 'LEFT'),
+                    ('LEFTPADDING', (0, 0), (-1, -1), 3),
+                    ('RIGHTPADDING', (0, 0), (-1, -1), 3),
+                ]),
+            ))
+
+        historia.append(Paragraph(
+            '<b>Leyenda:</b> P = Presente &nbsp;&nbsp; T = Tardanza &nbsp;&nbsp; A = Ausente '
+            '&nbsp;&nbsp; J = Justificado &nbsp;&nbsp; - = Sin registro',
+            ParagraphStyle('leyenda', fontName='Helvetica', fontSize=7, leading=9, spaceBefore=6),
+        ))
+        historia += self._pie(contexto)
+        doc.build(historia)
+
+
+MOTORES = {motor.nombre: motor for motor in (MotorXhtml2pdf(), MotorReportlab())}
+
+
+def motor_para(tipo, nombre=None):
+    """Motor configurado para el reporte `tipo` (o el indicado), si lo soporta; si no, xhtml2pdf"""
+    if nombre is None:
+        nombre = getattr(settings, 'REPORTES_MOTOR_PDF', {}).get(tipo, MOTOR_POR_DEFECTO)
+    motor = MOTORES.get(nombre)
+    if motor is None or not motor.soporta(tipo):
+        return MOTORES[MOTOR_POR_DEFECTO]
+    return motor
+
+
+def renderizar(tipo, plantilla, contexto, destino, motor=None):
+    motor = motor_para(tipo, motor)
+    if motor.nombre == MOTOR_POR_DEFECTO:
+        motor.renderizar(tipo, plantilla, contexto, destino)
+        return motor.nombre
+    # Renderizar aparte: si el motor falla, destino sigue vacío para el respaldo
+    contenido = io.BytesIO()
+    try:
+        motor.renderizar(tipo, plantilla, contexto, contenido)
+    except Exception:
+        logger.exception("El motor %s falló con el reporte %s; se usa %s", motor.nombre, tipo, MOTOR_POR_DEFECTO)
+        MOTORES[MOTOR_POR_DEFECTO].renderizar(tipo, plantilla, contexto, destino)
+        return MOTOR_POR_DEFECTO
+    destino.write(contenido.getvalue())
+    return motor.nombre
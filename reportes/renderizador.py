@@ -0,0 +1,189 @@
+"""
+Renderizador xhtml2pdf con cachés por proceso para las plantillas PDF.
+
+Cada documento que pisa genera vuelve a analizar la hoja de estilos por
+defecto y la de la plantilla, y vuelve a resolver qué reglas CSS aplican a cada
+elemento HTML, aunque la plantilla (y por lo tanto el CSS) sea siempre la
+misma. En un documento chico, como una factura, eso es la mayor parte del
+tiempo. Aquí se guardan, por proceso:
+
+- la plantilla compilada de Django;
+- las hojas de estilo ya analizadas, por texto del CSS. Las reglas @page,
+  @frame y @font-face se vuelven a procesar en cada documento porque
+  configuran ese documento (páginas, marcos, fuentes registradas);
+- los atributos CSS resueltos de cada elemento, por su ruta en el documento
+  (etiqueta, clase, id y estilo de él y de sus ancestros). pisa ya reutiliza
+  estos atributos entre hermanos iguales dentro de un documento, así que
+  asume lo mismo: que ninguna regla depende de la posición entre hermanos
+  (:first-child, +, ~). Las plantillas PDF del proyecto no usan esos selectores.
+
+precalentar() llena las cachés renderizando una vez cada plantilla (también
+carga las métricas de las fuentes estándar de ReportLab); se llama al iniciar
+los workers. Los reemplazos de pisa se instalan en el primer renderizar(), no
+al importar el módulo, y fuera de renderizar() pisa se comporta como siempre.
+"""
+import io
+import logging
+import re
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.template.loader import get_template
+from xhtml2pdf import parser as pisa_parser
+from xhtml2pdf import pisa
+from xhtml2pdf.context import pisaContext
+from xhtml2pdf.w3c import css
+
+logger = logging.getLogger(__name__)
+
+PLANTILLAS_PDF = (
+    'reportes/pagos_reporte_pdf.html',
+    'reportes/asistencias_reporte_pdf.html',
+    'reportes/factura_pago_pdf.html',
+    'profesores/profe_reportes.html',
+)
+# Rutas de elementos guardadas por hoja de estilos; estilos en línea variables no la hacen crecer sin límite
+MAXIMO_RUTAS = 20000
+# Hojas de estilo guardadas; un CSS generado por documento no hace crecer la caché sin límite
+MAXIMO_HOJAS = 64
+
+# Reglas que configuran el documento al analizarse (no son estilos de elementos)
+REGLA_CON_EFECTOS = re.compile(r'@(page|frame|font-face)\b', re.IGNORECASE)
+
+_plantillas = {}
+# (CSS de la plantilla, CSS por defecto) -> (hoja, hoja por defecto, reglas con efectos, atributos por ruta)
+_hojas = {}
+_precalentado = False
+_activo = ContextVar('renderizador_pdf_activo', default=False)
+
+_parse_css_original = pisaContext.parseCSS
+_css_collect_original = pisa_parser.CSSCollect
+
+
+def _reglas_con_efectos(texto):
+    """Bloques @page/@frame/@font-face de primer nivel del CSS, con sus llaves anidadas"""
+    bloques = []
+    posicion = 0
+    while True:
+        encontrada = REGLA_CON_EFECTOS.search(texto, posicion)
+        if encontrada is None:
+            return '\n'.join(bloques)
+        apertura = texto.find('{', encontrada.end())
+        if apertura == -1:
+            return '\n'.join(bloques)
+        nivel = 0
+        for fin in range(apertura, len(texto)):
+            if texto[fin] == '{':
+                nivel += 1
+            elif texto[fin] == '}':
+                nivel -= 1
+                if nivel == 0:
+                    break
+        bloques.append(texto[encontrada.start():fin + 1])
+        posicion = fin + 1
+
+
+def _parse_css(self):
+    if not _activo.get():
+        return _parse_css_original(self)
+    clave = (self.cssText, self.cssDefaultText)
+    guardado = _hojas.get(clave)
+    if guardado is None:
+        _parse_css_original(self)
+        self._atributos_css = {}
+        if len(_hojas) < MAXIMO_HOJAS:
+            _hojas[clave] = (self.css, self.cssDefault, _reglas_con_efectos(self.cssText), self._atributos_css)
+        return
+    hoja, hoja_defecto, con_efectos, self._atributos_css = guardado
+    # Analizar solo las reglas que configuran este documento y usar las hojas ya analizadas
+    self.cssText, self.cssDefaultText = con_efectos, ''
+    try:
+        _parse_css_original(self)
+    finally:
+        self.cssText, self.cssDefaultText = clave
+    self.css, self.cssDefault = hoja, hoja_defecto
+    self.cssCascade = css.CSSCascadeStrategy(userAgent=hoja_defecto, user=hoja)
+    self.cssCascade.parser = self.cssParser
+
+
+def _ruta(nodo):
+    ruta = getattr(nodo, '_ruta_css', None)
+    if ruta is None:
+        padre = nodo.parentNode
+        ruta_padre = _ruta(padre) if hasattr(padre, 'tagName') else ()
+        # La clave de pisa sin el id() del padre: etiqueta#clase#id#estilo
+        ruta = nodo._ruta_css = (ruta_padre, pisa_parser.getCSSAttrCacheKey(nodo).split('#', 1)[1])
+    return ruta
+
+
+def _css_collect(nodo, c):
+    atributos_por_ruta = getattr(c, '_atributos_css', None)
+    padre = nodo.parentNode
+    # Los hijos de <html> tampoco usan la caché de pisa
+    if atributos_por_ruta is None or not c.css or getattr(padre, 'tagName', 'html').lower() == 'html':
+        return _css_collect_original(nodo, c)
+    ruta = _ruta(nodo)
+    atributos = atributos_por_ruta.get(ruta)
+    if atributos is None:
+        atributos = _css_collect_original(nodo, c)
+        if len(atributos_por_ruta) < MAXIMO_RUTAS:
+            atributos_por_ruta[ruta] = atributos
+    nodo.cssAttrs = atributos
+    return atributos
+
+
+def _instalar():
+    # Idempotente: pisa sigue usando las funciones originales mientras _activo sea falso
+    pisaContext.parseCSS = _parse_css
+    pisa_parser.CSSCollect = _css_collect
+
+
+def plantilla(nombre):
+    # Con DEBUG se deja al cargador de Django, que recarga las plantillas modificadas
+    if settings.DEBUG:
+        return get_template(nombre)
+    compilada = _plantillas.get(nombre)
+    if compilada is None:
+        compilada = _plantillas[nombre] = get_template(nombre)
+    return compilada
+
+
+def renderizar(nombre, contexto, destino):
+    """Renderiza la plantilla `nombre` con pisa usando las cachés; devuelve el resultado de pisa"""
+    html = plantilla(nombre).render(contexto)
+    _instalar()
+    token = _activo.set(True)
+    try:
+        return pisa.pisaDocument(io.BytesIO(html.encode('UTF-8')), destino)
+    finally:
+        _activo.reset(token)
+
+
+def precalentar(plantillas=PLANTILLAS_PDF):
+    """Compila las plantillas y analiza su CSS renderizándolas una vez sin datos"""
+    # Import local: este módulo se carga desde reportes.motores, antes de que haga falta el modelo
+    from usuarios.models import Usuario
+
+    # Las plantillas usan usuario_generador como argumento de un filtro, que no puede faltar
+    contexto = {'usuario_generador': Usuario()}
+    for nombre in plantillas:
+        try:
+            renderizar(nombre, contexto, io.BytesIO())
+        except Exception:
+            # Un fallo aquí no debe impedir que arranque el worker: la plantilla se compila al usarla
+            logger.exception('No se pudo precalentar la plantilla PDF %s', nombre)
+
+
+def precalentar_si_corresponde():
+    """precalentar() una vez por proceso si REPORTES_PRECALENTAR_PDF está activo"""
+    global _precalentado
+    if not _precalentado and getattr(settings, 'REPORTES_PRECALENTAR_PDF', False):
+        precalentar()
+        _precalentado = True
+
+
+def limpiar():
+    global _precalentado
+    _plantillas.clear()
+    _hojas.clear()
+    _precalentado = False
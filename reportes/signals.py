@@ -0,0 +1,12 @@
+from aulas.models import Aula
+from cursos.models import Curso
+from horarios.models import Horario
+from matriculas.models import Matricula
+from usuarios.models import Usuario
+from usuarios.signals import invalidar_al_confirmar
+from .cache_pdf import invalidar_catalogo
+
+# Datos de referencia que aparecen en los PDF y no tienen fecha_modificacion
+MODELOS_CATALOGO = (Usuario, Curso, Horario, Aula, Matricula)
+
+invalidar_reportes = invalidar_al_confirmar(invalidar_catalogo, MODELOS_CATALOGO, 'reportes')
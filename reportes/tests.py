@@ -1,3 +1,573 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.template.loader import get_template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone as django_timezone
+from pypdf import PdfReader
+from xhtml2pdf import pisa
+
+from asistencias.models import Asistencia, EstadoAsistencia
+from aulas.models import Aula
+from cursos.models import Curso
+from horarios.models import Horario
+from matriculas.models import Matricula
+from pagos.models import EstadoPago, Pago, PagoParcial
+from reportes import cache_pdf, facturas, motores, renderizador
+from reportes.exportacion import ORDEN_PAGOS
+from reportes.generacion import (
+    contexto_reporte_asistencias, contexto_reporte_pagos, generar_reporte, procesar_trabajo, renderizar_pdf,
+)
+from reportes.models import EstadoTrabajo, TipoReporte, TrabajoReporte
+from usuarios.models import Usuario
+
+
+class TrabajosReporteTests(TestCase):
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        ajustes = override_settings(REPORTES_DIR=self.directorio)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.admin = Usuario.objects.create_user(username='admin', password='x', rol=Usuario.Rol.ADMIN)
+        self.profesor = Usuario.objects.create_user(username='prof', password='x', rol=Usuario.Rol.PROFESOR)
+        curso = Curso.objects.create(nombre='Curso de Piano', precio=0)
+        self.clase = Horario.objects.create(
+            curso=curso, profesor=self.profesor,
+            fecha_inicio=date(2025, 1, 1), fecha_fin=date(2025, 6, 30),
+            hora_inicio=time(8, 0), hora_fin=time(9, 0),
+        )
+        estudiante = Usuario.objects.create_user(username='est', password='x', rol=Usuario.Rol.ESTUDIANTE)
+        matricula = Matricula.objects.create(estudiante=estudiante, clase=self.clase)
+        Pago.objects.create(matricula=matricula, monto=25)
+        Asistencia.objects.create(
+            matricula=matricula, clase=self.clase, fecha=date(2025, 1, 6), estado=EstadoAsistencia.PRESENTE
+        )
+
+    def solicitar(self, usuario, **datos):
+        self.client.force_login(usuario)
+        return self.client.post(reverse('reporte_trabajo_solicitar'), datos)
+
+    def test_solicitar_guarda_solo_los_filtros_del_reporte(self):
+        response = self.solicitar(
+            self.admin, tipo=TipoReporte.PAGOS, fecha_inicio='2025-01-01', curso='', otro='x'
+        )
+        self.assertEqual(response.status_code, 202)
+        trabajo = TrabajoReporte.objects.get(id=response.json()['id'])
+        self.assertEqual(trabajo.estado, EstadoTrabajo.PENDIENTE)
+        self.assertEqual(trabajo.parametros, {'fecha_inicio': '2025-01-01'})
+
+    def test_permisos_por_rol(self):
+        self.assertEqual(self.solicitar(self.profesor, tipo=TipoReporte.PAGOS).status_code, 403)
+        self.assertEqual(self.solicitar(self.admin, tipo=TipoReporte.ASISTENCIAS_PROFESOR).status_code, 403)
+        self.assertEqual(self.solicitar(self.admin, tipo='OTRO').status_code, 400)
+        self.assertEqual(self.solicitar(self.profesor, tipo=TipoReporte.ASISTENCIAS_PROFESOR).status_code, 202)
+
+    def test_worker_genera_y_se_descarga_desde_disco(self):
+        ids = [
+            self.solicitar(self.admin, tipo=tipo, fecha_inicio='2025-01-01', fecha_fin='2025-01-31').json()['id']
+            for tipo in (TipoReporte.PAGOS, TipoReporte.ASISTENCIAS)
+        ]
+        ids.append(self.solicitar(
+            self.profesor, tipo=TipoReporte.ASISTENCIAS_PROFESOR,
+            fecha_inicio='2025-01-01', fecha_fin='2025-01-31', codigo_clase=self.clase.codigo,
+        ).json()['id'])
+
+        salida = io.StringIO()
+        call_command('procesar_reportes', una_vez=True, stdout=salida, stderr=io.StringIO())
+        self.assertIn('3 reportes procesados', salida.getvalue())
+
+        self.client.force_login(self.admin)
+        for trabajo_id in ids:
+            estado = self.client.get(reverse('reporte_trabajo_estado', args=[trabajo_id])).json()
+            self.assertEqual(estado['estado'], EstadoTrabajo.COMPLETADO)
+            response = self.client.get(estado['url_descarga'])
+            self.assertTrue(response.streaming)
+            self.assertEqual(b''.join(response.streaming_content)[:4], b'%PDF')
+        self.assertEqual(len(os.listdir(self.directorio)), 3)
+
+    def test_otro_usuario_no_ve_el_trabajo(self):
+        trabajo_id = self.solicitar(self.profesor, tipo=TipoReporte.ASISTENCIAS_PROFESOR).json()['id']
+        otro = Usuario.objects.create_user(username='prof2', password='x', rol=Usuario.Rol.PROFESOR)
+        self.client.force_login(otro)
+        self.assertEqual(self.client.get(reverse('reporte_trabajo_estado', args=[trabajo_id])).status_code, 404)
+
+    def test_un_trabajo_se_toma_una_sola_vez(self):
+        trabajo = TrabajoReporte.objects.create(tipo=TipoReporte.PAGOS, usuario=self.admin)
+        self.assertEqual(TrabajoReporte.objects.tomar_siguiente().id, trabajo.id)
+        self.assertIsNone(TrabajoReporte.objects.tomar_siguiente())
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, EstadoTrabajo.PROCESANDO)
+
+    def test_reencola_por_latido_atrasado(self):
+        ahora = django_timezone.now()
+        vivo = TrabajoReporte.objects.create(
+            tipo=TipoReporte.PAGOS, usuario=self.admin, estado=EstadoTrabajo.PROCESANDO,
+            fecha_inicio=ahora - timedelta(hours=2), latido=ahora,
+        )
+        caido = TrabajoReporte.objects.create(
+            tipo=TipoReporte.PAGOS, usuario=self.admin, estado=EstadoTrabajo.PROCESANDO,
+            fecha_inicio=ahora - timedelta(minutes=5), latido=ahora - timedelta(minutes=5),
+        )
+        # El worker lo reencola dentro de su ciclo y lo vuelve a tomar
+        salida = io.StringIO()
+        call_command('procesar_reportes', una_vez=True, stdout=salida, stderr=io.StringIO())
+        self.assertIn('1 trabajos interrumpidos', salida.getvalue())
+        vivo.refresh_from_db()
+        caido.refresh_from_db()
+        self.assertEqual((vivo.estado, caido.estado), (EstadoTrabajo.PROCESANDO, EstadoTrabajo.COMPLETADO))
+
+    def test_el_trabajo_late_mientras_se_genera(self):
+        trabajo = TrabajoReporte.objects.create(tipo=TipoReporte.PAGOS, usuario=self.admin)
+        latio = threading.Event()
+
+        def generar_lento(*args):
+            # El PDF no informa avance: el latido sale del hilo aparte
+            self.assertTrue(latio.wait(5))
+
+        with mock.patch('reportes.generacion.SEGUNDOS_LATIDO', 0.01), \
+                mock.patch.object(TrabajoReporte.objects, 'latir', side_effect=lambda _: latio.set()) as latir, \
+                mock.patch('reportes.generacion.generar_reporte', generar_lento):
+            procesar_trabajo(TrabajoReporte.objects.tomar_siguiente())
+        latir.assert_called_with(trabajo.id)
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, EstadoTrabajo.COMPLETADO)
+
+
+class CachePDFTests(TestCase):
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        ajustes = override_settings(REPORTES_CACHE_DIR=self.directorio)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.admin = Usuario.objects.create_user(username='admin', password='x', rol=Usuario.Rol.ADMIN)
+        self.client.force_login(self.admin)
+        self.curso = Curso.objects.create(nombre='Curso de Violín', precio=0)
+        clase = Horario.objects.create(
+            curso=self.curso, fecha_inicio=date(2025, 1, 1), fecha_fin=date(2025, 6, 30),
+            hora_inicio=time(8, 0), hora_fin=time(9, 0),
+        )
+        estudiante = Usuario.objects.create_user(username='est', password='x', rol=Usuario.Rol.ESTUDIANTE)
+        self.pago = Pago.objects.create(matricula=Matricula.objects.create(estudiante=estudiante, clase=clase), monto=40)
+
+    def pedir(self, nombre='reporte_pagos_pdf', args=(), filtros=None, **extra):
+        filtros = filtros or {'fecha_inicio': '2025-01-01', 'q': ' '}
+        with mock.patch('reportes.views.generar_reporte', wraps=generar_reporte) as reporte, \
+                mock.patch('usuarios.views.renderizar_pdf', wraps=renderizar_pdf) as factura:
+            response = self.client.get(reverse(nombre, args=args), filtros, **extra)
+        return response, reporte.call_count + factura.call_count
+
+    def test_segunda_peticion_sale_de_disco(self):
+        primera, renders = self.pedir()
+        self.assertEqual(renders, 1)
+        self.assertEqual(b''.join(primera.streaming_content)[:4], b'%PDF')
+        segunda, renders = self.pedir()
+        self.assertEqual(renders, 0)
+        self.assertEqual(segunda['ETag'], primera['ETag'])
+        self.assertEqual(len(os.listdir(self.directorio)), 1)
+
+    def test_if_none_match_devuelve_304(self):
+        primera, _ = self.pedir()
+        segunda, renders = self.pedir(HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(segunda.status_code, 304)
+        self.assertEqual(renders, 0)
+
+    def test_cambios_en_los_datos_cambian_la_clave(self):
+        etags = {self.pedir()[0]['ETag']}
+        self.pago.estado = EstadoPago.PAGADO
+        self.pago.save()
+        etags.add(self.pedir()[0]['ETag'])
+        PagoParcial.objects.create(pago=self.pago, monto=5)
+        etags.add(self.pedir()[0]['ETag'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.curso.nombre = 'Curso de Viola'
+            self.curso.save()
+        etags.add(self.pedir()[0]['ETag'])
+        self.assertEqual(len(etags), 4)
+
+    def test_version_del_catalogo_al_confirmar(self):
+        version = cache_pdf.version_catalogo()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.curso.save()
+            Aula.objects.create(nombre='Aula 1')
+        self.assertEqual(cache_pdf.version_catalogo(), version)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(cache_pdf.version_catalogo(), version + 2)
+
+    def test_sello_solo_de_las_filas_filtradas(self):
+        otra_clase = Horario.objects.create(
+            curso=Curso.objects.create(nombre='Curso de Flauta', precio=0),
+            fecha_inicio=date(2025, 1, 1), fecha_fin=date(2025, 6, 30), hora_inicio=time(10, 0), hora_fin=time(11, 0),
+        )
+        estudiante = Usuario.objects.create_user(username='otro', password='x', rol=Usuario.Rol.ESTUDIANTE)
+        otro = Pago.objects.create(matricula=Matricula.objects.create(estudiante=estudiante, clase=otra_clase), monto=10)
+        filtros = {'curso': str(self.curso.id)}
+        primera, _ = self.pedir(filtros=filtros)
+        # Un pago de otro curso no cambia el PDF filtrado por curso
+        otro.estado = EstadoPago.PAGADO
+        otro.save()
+        segunda, renders = self.pedir(filtros=filtros)
+        self.assertEqual((segunda['ETag'], renders), (primera['ETag'], 0))
+
+    def test_factura(self):
+        primera, renders = self.pedir('factura_pago_pdf', args=[self.pago.id])
+        self.assertEqual(renders, 1)
+        self.assertEqual(self.pedir('factura_pago_pdf', args=[self.pago.id])[1], 0)
+        abono = PagoParcial.objects.create(pago=self.pago, monto=5)
+        segunda, renders = self.pedir('factura_pago_pdf', args=[self.pago.id])
+        self.assertEqual(renders, 1)
+        self.assertNotEqual(segunda['ETag'], primera['ETag'])
+        # Editar un abono sin cambiar el monto también cambia la factura
+        Pago.objects.filter(pk=self.pago.pk).update(fecha_modificacion=datetime(2025, 1, 1, tzinfo=dt_timezone.utc))
+        tercera, _ = self.pedir('factura_pago_pdf', args=[self.pago.id])
+        abono.observaciones = 'Transferencia'
+        abono.save()
+        self.assertNotEqual(self.pedir('factura_pago_pdf', args=[self.pago.id])[0]['ETag'], tercera['ETag'])
+
+    def test_desalojo_lru(self):
+        for i, clave in enumerate(('a', 'b', 'c')):
+            cache_pdf.guardar(clave, b'x' * 100)
+            os.utime(os.path.join(self.directorio, f'{clave}.pdf'), (1000 + i, 1000 + i))
+        cache_pdf.obtener('a')  # usado recientemente
+        self.assertEqual(cache_pdf.desalojar(limite=250), 1)
+        self.assertEqual(sorted(os.listdir(self.directorio)), ['a.pdf', 'c.pdf'])
+
+
+class MotoresPDFTests(TestCase):
+    def setUp(self):
+        self.admin = Usuario.objects.create_user(username='admin', password='x', rol=Usuario.Rol.ADMIN)
+        clase = Horario.objects.create(
+            curso=Curso.objects.create(nombre='Curso de Canto', precio=0),
+            fecha_inicio=date(2025, 1, 1), fecha_fin=date(2025, 6, 30),
+            hora_inicio=time(8, 0), hora_fin=time(9, 0),
+        )
+        estudiante = Usuario.objects.create_user(
+            username='est', password='x', first_name='Lucía', last_name='Núñez', rol=Usuario.Rol.ESTUDIANTE
+        )
+        matricula = Matricula.objects.create(estudiante=estudiante, clase=clase)
+        Pago.objects.create(matricula=matricula, monto=30)
+        Asistencia.objects.create(matricula=matricula, clase=clase, fecha=date(2025, 1, 6), estado=EstadoAsistencia.TARDE)
+
+    def generar(self, tipo, motor):
+        destino = io.BytesIO()
+        usado = generar_reporte(tipo, {}, self.admin, destino, motor=motor)
+        destino.seek(0)
+        texto = ''.join(pagina.extract_text() for pagina in PdfReader(destino).pages)
+        return usado, texto
+
+    def test_reportlab_genera_pagos_y_asistencias(self):
+        usado, texto = self.generar(TipoReporte.PAGOS, 'reportlab')
+        self.assertEqual(usado, 'reportlab')
+        self.assertIn('Núñez, Lucía', texto)
+        self.assertIn('$ 30.00', texto)
+        usado, texto = self.generar(TipoReporte.ASISTENCIAS, 'reportlab')
+        self.assertEqual(usado, 'reportlab')
+        self.assertIn('06/01', texto)
+        self.assertIn('1/1', texto)
+
+    def test_respaldo_xhtml2pdf(self):
+        # Reporte no implementado en reportlab
+        self.assertEqual(motores.motor_para(TipoReporte.ASISTENCIAS_PROFESOR, 'reportlab').nombre, 'xhtml2pdf')
+        # Falla del motor elegido
+        with mock.patch.object(motores.MotorReportlab, '_pagos', side_effect=RuntimeError), \
+                self.assertLogs('reportes.motores', 'ERROR'):
+            usado, texto = self.generar(TipoReporte.PAGOS, 'reportlab')
+        self.assertEqual(usado, 'xhtml2pdf')
+        self.assertIn('Reporte de Pagos', texto)
+
+    def test_benchmark(self):
+        salida = io.StringIO()
+        call_command('benchmark_reportes', estudiantes=[3], dias=2, stdout=salida)
+        self.assertEqual(len(salida.getvalue().splitlines()), 1 + 2 * 2)
+
+
+class EstadisticasReporteTests(TestCase):
+    def setUp(self):
+        self.admin = Usuario.objects.create_user(username='admin', password='x', rol=Usuario.Rol.ADMIN)
+        clase = Horario.objects.create(
+            curso=Curso.objects.create(nombre='Curso de Flauta', precio=0),
+            fecha_inicio=date(2025, 1, 1), fecha_fin=date(2025, 6, 30),
+            hora_inicio=time(8, 0), hora_fin=time(9, 0),
+        )
+        estados = [EstadoAsistencia.PRESENTE, EstadoAsistencia.TARDE, EstadoAsistencia.AUSENTE]
+        for i in range(3):
+            estudiante = Usuario.objects.create_user(
+                username=f'est{i}', password='x', first_name=f'E{i}', rol=Usuario.Rol.ESTUDIANTE
+            )
+            matricula = Matricula.objects.create(estudiante=estudiante, clase=clase)
+            Pago.objects.create(matricula=matricula, monto=10 * (i + 1), estado=[
+                EstadoPago.PAGADO, EstadoPago.PENDIENTE, EstadoPago.PENDIENTE
+            ][i])
+            for dia in (6, 13):
+                Asistencia.objects.create(matricula=matricula, clase=clase, fecha=date(2025, 1, dia), estado=estados[i])
+
+    def test_pagos_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            contexto = contexto_reporte_pagos({}, self.admin)
+        self.assertEqual(
+            (contexto['total_pagos'], contexto['total_pagados'], contexto['total_pendientes'], contexto['total_cancelados']),
+            (60, 10, 50, 0),
+        )
+        self.assertEqual((contexto['count_pagos'], contexto['count_pendientes'], contexto['count_cancelados']), (3, 2, 0))
+        self.assertEqual(contexto['periodo_inicio'], date.today())
+
+    def test_asistencias_agregado_y_una_pasada(self):
+        with self.assertNumQueries(2):
+            contexto = contexto_reporte_asistencias({'estado': EstadoAsistencia.TARDE}, self.admin)
+        self.assertEqual((contexto['total_asistencias'], contexto['total_tardanzas'], contexto['total_presentes']), (2, 2, 0))
+        with self.assertNumQueries(2):
+            contexto = contexto_reporte_asistencias({}, self.admin)
+        self.assertEqual(contexto['fechas_periodo'], [date(2025, 1, 6), date(2025, 1, 13)])
+        self.assertEqual((contexto['total_dias'], contexto['total_estudiantes'], contexto['total_ausentes']), (2, 3, 2))
+        self.assertEqual(contexto['porcentaje_presentes'], 33.3)
+        self.assertEqual([fila['asistio'] for fila in contexto['filas_asistencia']], [2, 2, 0])
+        self.assertEqual([total['asistio'] for total in contexto['totales_fecha']], [2, 2])
+        self.assertEqual((contexto['periodo_inicio'], contexto['periodo_fin']), (date(2025, 1, 6), date(2025, 1, 13)))
+
+
+class ExportacionReporteTests(TestCase):
+    def setUp(self):
+        self.admin = Usuario.objects.create_user(username='admin', password='x', rol=Usuario.Rol.ADMIN)
+        clase = Horario.objects.create(
+            curso=Curso.objects.create(nombre='Curso de Cello', precio=0),
+            fecha_inicio=date(2025, 1, 1), fecha_fin=date(2025, 6, 30),
+            hora_inicio=time(8, 0), hora_fin=time(9, 0),
+        )
+        for i, estado in enumerate([EstadoPago.PENDIENTE, EstadoPago.PAGADO]):
+            estudiante = Usuario.objects.create_user(
+                username=f'est{i}', password='x', first_name=f'Ñandú{i}', last_name='Pérez & Cía',
+                cedula=f'09000000{i}', rol=Usuario.Rol.ESTUDIANTE,
+            )
+            matricula = Matricula.objects.create(estudiante=estudiante, clase=clase)
+            Pago.objects.create(matricula=matricula, monto=25, estado=estado, observaciones='a, "b"')
+            Asistencia.objects.create(matricula=matricula, clase=clase, fecha=date(2025, 1, 6))
+        self.client.force_login(self.admin)
+
+    def descargar(self, nombre, **params):
+        response = self.client.get(reverse(nombre), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv_pagos_con_filtros(self):
+        contenido = self.descargar('reporte_pagos_exportar', formato='csv', estado=EstadoPago.PAGADO).decode('utf-8-sig')
+        lineas = contenido.splitlines()
+        self.assertEqual(lineas[0], 'ID,Fecha,Cédula,Apellidos,Nombres,Curso,Monto,Abonado,Saldo,Estado,Observaciones')
+        self.assertEqual(len(lineas), 2)
+        self.assertIn('090000001,Pérez & Cía,Ñandú1,Curso de Cello,25.00,0.00,25.00,Pagado,"a, ""b"""', lineas[1])
+
+    def test_csv_por_bloques(self):
+        estudiante = Usuario.objects.create_user(
+            username='est2', password='x', first_name='Ñandú0', last_name='Pérez & Cía', cedula='090000002',
+            rol=Usuario.Rol.ESTUDIANTE,
+        )
+        Pago.objects.create(matricula=Matricula.objects.create(estudiante=estudiante, clase=Horario.objects.get()), monto=5)
+        completo = self.descargar('reporte_pagos_exportar', formato='csv')
+        # Bloques de una fila: mismas filas y mismo orden, aun con fechas y nombres repetidos
+        with mock.patch('reportes.exportacion.TAMANO_BLOQUE', 1):
+            por_bloques = self.descargar('reporte_pagos_exportar', formato='csv')
+        self.assertEqual(por_bloques, completo)
+        self.assertEqual(len(completo.decode('utf-8-sig').splitlines()), 4)
+
+    def test_csv_sin_formulas(self):
+        Pago.objects.update(observaciones='=HYPERLINK("http://x";"clic")')
+        Usuario.objects.filter(username='est1').update(first_name='@SUMA(A1)', last_name='-2+3')
+        contenido = self.descargar('reporte_pagos_exportar', formato='csv', estado=EstadoPago.PAGADO).decode('utf-8-sig')
+        # Texto con apóstrofo inicial; los montos siguen siendo números
+        self.assertIn(""",'-2+3,'@SUMA(A1),Curso de Cello,25.00,""", contenido)
+        self.assertIn('''"'=HYPERLINK(""http://x"";""clic"")"''', contenido)
+
+    def test_xlsx_asistencias_es_un_libro_valido(self):
+        contenido = self.descargar('reporte_asistencias_exportar', formato='xlsx')
+        with zipfile.ZipFile(io.BytesIO(contenido)) as libro:
+            self.assertIsNone(libro.testzip())
+            self.assertIn('xl/workbook.xml', libro.namelist())
+            hoja = libro.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(hoja.count('<row '), 3)
+        # Fecha serial de Excel con estilo de fecha y texto escapado
+        self.assertIn('<c r="A2" s="1"><v>45663</v></c>', hoja)
+        self.assertIn('Pérez &amp; Cía', hoja)
+
+    def test_formato_invalido_y_permisos(self):
+        response = self.client.get(reverse('reporte_pagos_exportar'), {'formato': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+        self.client.force_login(Usuario.objects.get(username='est0'))
+        response = self.client.get(reverse('reporte_pagos_exportar'), {'formato': 'csv'})
+        self.assertRedirects(response, reverse('login'), fetch_redirect_response=False)
+
+
+class RenderizadorPDFTests(TestCase):
+    def setUp(self):
+        renderizador.limpiar()
+        self.addCleanup(renderizador.limpiar)
+        self.admin = Usuario.objects.create_user(username='admin', password='x', rol=Usuario.Rol.ADMIN)
+        clase = Horario.objects.create(
+            curso=Curso.objects.create(nombre='Curso de Arpa', precio=0),
+            fecha_inicio=date(2025, 1, 1), fecha_fin=date(2025, 6, 30),
+            hora_inicio=time(8, 0), hora_fin=time(9, 0),
+        )
+        estudiante = Usuario.objects.create_user(
+            username='est', password='x', first_name='Inés', last_name='Ortiz', rol=Usuario.Rol.ESTUDIANTE
+        )
+        self.pago = Pago.objects.create(matricula=Matricula.objects.create(estudiante=estudiante, clase=clase), monto=40)
+        PagoParcial.objects.create(pago=self.pago, monto=15)
+        self.contexto = {'pago': self.pago, 'usuario_generador': self.admin, 'fecha_generacion': datetime(2025, 2, 1, 10, 0)}
+
+    def paginas(self, destino):
+        destino.seek(0)
+        return [pagina.get_contents().get_data() for pagina in PdfReader(destino).pages]
+
+    def test_mismo_pdf_que_xhtml2pdf_directo(self):
+        html = get_template(facturas.PLANTILLA_FACTURA).render(self.contexto)
+        directo = io.BytesIO()
+        pisa.pisaDocument(io.BytesIO(html.encode('UTF-8')), directo)
+        renderizador.precalentar()
+        # La segunda vez usa las hojas de estilo y los atributos ya resueltos
+        for _ in range(2):
+            destino = io.BytesIO()
+            self.assertFalse(renderizador.renderizar(facturas.PLANTILLA_FACTURA, self.contexto, destino).err)
+            self.assertEqual(self.paginas(destino), self.paginas(directo))
+
+    def test_precalentar_llena_las_caches(self):
+        with self.assertNoLogs('reportes.renderizador', 'ERROR'):
+            renderizador.precalentar()
+        self.assertEqual(set(renderizador._plantillas), set(renderizador.PLANTILLAS_PDF))
+        self.assertTrue(renderizador._hojas)
+        textos = []
+        original = renderizador._parse_css_original
+
+        def analizar(contexto_pisa):
+            textos.append((contexto_pisa.cssText, contexto_pisa.cssDefaultText))
+            return original(contexto_pisa)
+
+        with mock.patch.object(renderizador, '_parse_css_original', analizar):
+            renderizador.renderizar(facturas.PLANTILLA_FACTURA, self.contexto, io.BytesIO())
+        # Solo se analizan las reglas @page de la plantilla, no la hoja por defecto de pisa
+        self.assertEqual(len(textos), 1)
+        self.assertTrue(textos[0][0].startswith('@page'))
+        self.assertEqual(textos[0][1], '')
+
+    def test_hojas_con_tope(self):
+        with mock.patch.object(renderizador, 'MAXIMO_HOJAS', 1):
+            renderizador.precalentar()
+            self.assertEqual(len(renderizador._hojas), 1)
+            # Con la caché llena la factura se analiza entera, como sin caché
+            destino = io.BytesIO()
+            self.assertFalse(renderizador.renderizar(facturas.PLANTILLA_FACTURA, self.contexto, destino).err)
+        self.assertEqual(len(renderizador._hojas), 1)
+        self.assertEqual(len(PdfReader(destino).pages), 1)
+
+    def test_benchmark(self):
+        salida = io.StringIO()
+        call_command('benchmark_renderizador', documentos=1, estudiantes=2, stdout=salida)
+        self.assertEqual(len(salida.getvalue().splitlines()), 2 + len(renderizador.PLANTILLAS_PDF) + 1)
+
+
+class FacturasLoteTests(TestCase):
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        ajustes = override_settings(REPORTES_DIR=self.directorio)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.admin = Usuario.objects.create_user(username='admin', password='x', rol=Usuario.Rol.ADMIN)
+        self.curso = Curso.objects.create(nombre='Curso de Oboe', precio=0)
+        clase = Horario.objects.create(
+            curso=self.curso, fecha_inicio=date(2025, 1, 1), fecha_fin=date(2025, 6, 30),
+            hora_inicio=time(8, 0), hora_fin=time(9, 0),
+        )
+        self.pagos = []
+        for i in range(5):
+            estudiante = Usuario.objects.create_user(username=f'est{i}', password='x', rol=Usuario.Rol.ESTUDIANTE)
+            matricula = Matricula.objects.create(estudiante=estudiante, clase=clase)
+            self.pagos.append(Pago.objects.create(
+                matricula=matricula, monto=20, estado=EstadoPago.PAGADO if i < 3 else EstadoPago.PENDIENTE
+            ))
+        PagoParcial.objects.create(pago=self.pagos[0], monto=5)
+
+    def test_pdf_unido_en_varios_procesos(self):
+        avance = []
+        destino = io.BytesIO()
+        with mock.patch.object(facturas, 'TAMANO_LOTE', 2):
+            total = facturas.generar_facturas(
+                {'estado': EstadoPago.PAGADO}, self.admin, destino,
+                progreso=lambda hechas, total: avance.append(hechas), procesos=2,
+            )
+        self.assertEqual(total, 3)
+        self.assertEqual(avance, [0, 2, 3])
+        self.assertEqual(len(PdfReader(destino).pages), 3)
+
+    def test_zip_con_una_factura_por_pago(self):
+        destino = io.BytesIO()
+        # Conteo, ids, pagos y abonos: el renderizado no consulta la base de datos
+        with self.assertNumQueries(4):
+            facturas.generar_facturas({'curso': str(self.curso.id), 'formato': 'zip'}, self.admin, destino, procesos=1)
+        with zipfile.ZipFile(destino) as archivo:
+            nombres = archivo.namelist()
+            self.assertEqual(archivo.read(nombres[0])[:4], b'%PDF')
+        self.assertEqual(sorted(nombres), sorted(f'factura_pago_{p.id}.pdf' for p in self.pagos))
+
+    def test_pagos_por_partes_en_el_orden_del_reporte(self):
+        esperado = [p.id for p in facturas.filtrar_pagos({})[0].order_by(*ORDEN_PAGOS)]
+        with mock.patch.object(facturas, 'TAMANO_CARGA', 2), mock.patch('reportes.exportacion.TAMANO_BLOQUE', 3):
+            pagos = list(facturas.pagos_para_facturar({}))
+        self.assertEqual([p.id for p in pagos], esperado)
+        # Cada parte trae sus abonos: el renderizado no consulta la base de datos
+        with self.assertNumQueries(0):
+            self.assertEqual(sum(len(p.pagos_parciales.all()) for p in pagos), 1)
+
+    def test_pdf_unido_con_tope(self):
+        with self.settings(REPORTES_MAXIMO_FACTURAS_PDF=2):
+            with self.assertRaisesMessage(motores.ErrorGeneracionPDF, 'hasta 2 facturas (3 pedidas)'):
+                facturas.generar_facturas({'estado': EstadoPago.PAGADO}, self.admin, io.BytesIO(), procesos=1)
+            # El ZIP se escribe factura por factura y no tiene tope
+            facturas.generar_facturas(
+                {'estado': EstadoPago.PAGADO, 'formato': 'zip'}, self.admin, io.BytesIO(), procesos=1,
+            )
+
+    def test_trabajo_informa_avance_y_descarga_zip(self):
+        self.client.force_login(self.admin)
+        respuesta = self.client.post(reverse('reporte_trabajo_solicitar'), {
+            'tipo': TipoReporte.FACTURAS, 'estado': EstadoPago.PENDIENTE, 'formato': 'ZIP',
+        })
+        self.assertEqual(respuesta.status_code, 202)
+        trabajo = TrabajoReporte.objects.get(id=respuesta.json()['id'])
+        self.assertEqual(trabajo.parametros, {'estado': EstadoPago.PENDIENTE, 'formato': 'zip'})
+
+        call_command('procesar_reportes', una_vez=True, stdout=io.StringIO(), stderr=io.StringIO())
+        estado = self.client.get(reverse('reporte_trabajo_estado', args=[trabajo.id])).json()
+        self.assertEqual((estado['estado'], estado['progreso'], estado['total']), (EstadoTrabajo.COMPLETADO, 2, 2))
+        response = self.client.get(estado['url_descarga'])
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assertTrue(response['Content-Disposition'].endswith('.zip"'))
+
+    def test_comando(self):
+        salida = os.path.join(self.directorio, 'facturas.pdf')
+        out = io.StringIO()
+        call_command('generar_facturas', estado=EstadoPago.PAGADO, procesos=1, salida=salida, stdout=out)
+        self.assertIn('3/3 facturas', out.getvalue())
+        self.assertEqual(len(PdfReader(salida).pages), 3)
+        trabajo = TrabajoReporte.objects.get(tipo=TipoReporte.FACTURAS)
+        self.assertEqual((trabajo.estado, trabajo.progreso, trabajo.usuario), (EstadoTrabajo.COMPLETADO, 3, self.admin))
+        self.assertIsNotNone(trabajo.latido)
+
+    def test_sin_pagos_el_trabajo_queda_en_error(self):
+        trabajo = TrabajoReporte.objects.create(
+            tipo=TipoReporte.FACTURAS, usuario=self.admin, parametros={'estado': EstadoPago.CANCELADO},
+        )
+        procesar_trabajo(trabajo)
+        self.assertEqual(trabajo.estado, EstadoTrabajo.ERROR)
+        self.assertIn('No hay pagos', trabajo.error)
@@ -6,6 +6,11 @@ urlpatterns = [
     path('admin/', views.admin_reportes, name='admin_reportes'),
     path('pagos/pdf/', views.reporte_pagos_pdf, name='reporte_pagos_pdf'),
     path('asistencias/pdf/', views.reporte_asistencias_pdf, name='reporte_asistencias_pdf'),
+    path('pagos/exportar/', views.reporte_pagos_exportar, name='reporte_pagos_exportar'),
+    path('asistencias/exportar/', views.reporte_asistencias_exportar, name='reporte_asistencias_exportar'),
+    path('trabajos/solicitar/', views.reporte_trabajo_solicitar, name='reporte_trabajo_solicitar'),
+    path('trabajos/<int:trabajo_id>/estado/', views.reporte_trabajo_estado, name='reporte_trabajo_estado'),
+    path('trabajos/<int:trabajo_id>/descargar/', views.reporte_trabajo_descargar, name='reporte_trabajo_descargar'),
     path('matriculas/pdf/', views.reporte_matriculas_pdf, name='reporte_matriculas_pdf'),
     # --- NUEVA RUTA PARA FACTURA PDF ---
     path('factura_pago/<int:pago_id>/', usuarios_views.factura_pago_pdf, name='factura_pago_pdf'),
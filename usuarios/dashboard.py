@@ -0,0 +1,121 @@
+"""
+Métricas del panel de administración cacheadas con el framework de caché de Django.
+
+Las métricas se invalidan con señales post_save/post_delete (ver usuarios.signals),
+al confirmarse la transacción. Tras una invalidación solo un worker recalcula:
+el lock es la fila de CandadoDashboard tomada con SELECT ... FOR UPDATE SKIP
+LOCKED, que a diferencia de cache.add() es atómico con cualquier backend de
+caché (FileBasedCache hace has_key + set). El resto sirve la última copia
+conocida mientras tanto.
+"""
+import time
+from contextlib import contextmanager
+from datetime import date
+
+from django.core.cache import cache
+from django.db import transaction
+
+from cursos.models import Curso
+from horarios.models import Horario
+from matriculas.models import Matricula, EstadoMatricula
+from pagos.models import Pago, EstadoPago
+from .models import CandadoDashboard, Usuario
+
+CACHE_KEY = 'dashboard:metricas'
+STALE_KEY = 'dashboard:metricas:stale'
+STATS_KEYS = {
+    'hits': 'dashboard:metricas:hits',
+    'misses': 'dashboard:metricas:misses',
+    'recalculos': 'dashboard:metricas:recalculos',
+}
+
+# Respaldo por si algún cambio no pasa por señales (p. ej. QuerySet.update)
+CACHE_TIMEOUT = 300
+ESPERA_LOCK = 0.05
+INTENTOS_LOCK = 20
+
+
+def _contar(nombre):
+    # Un solo incr() por petición; add() solo la primera vez (o si se limpió la caché)
+    key = STATS_KEYS[nombre]
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            # Otro worker creó la clave entre incr() y add()
+            cache.incr(key)
+
+
+def calcular_metricas():
+    """Consulta la base de datos y arma el diccionario de métricas del dashboard"""
+    fecha_hoy = date.today()
+    return {
+        'fecha': fecha_hoy,
+        'total_estudiantes': Usuario.objects.filter(rol=Usuario.Rol.ESTUDIANTE).count(),
+        'total_profesores': Usuario.objects.filter(rol=Usuario.Rol.PROFESOR).count(),
+        'total_cursos': Curso.objects.count(),
+        'total_matriculas': Matricula.objects.filter(estado=EstadoMatricula.ACTIVA).count(),
+        'pagos_pendientes': list(
+            Pago.objects.filter(estado=EstadoPago.PENDIENTE).select_related(
+                'matricula__estudiante', 'matricula__clase__curso'
+            )[:5]
+        ),
+        'clases_hoy': list(
+            Horario.objects.filter(
+                fecha_inicio__lte=fecha_hoy,
+                fecha_fin__gte=fecha_hoy
+            ).select_related('curso', 'profesor', 'aula').order_by('hora_inicio')
+        ),
+    }
+
+
+def _vigente(metricas):
+    # Las clases de hoy cambian con la fecha aunque no cambien los datos
+    return metricas is not None and metricas['fecha'] == date.today()
+
+
+@contextmanager
+def _candado():
+    """True si este worker tomó el lock del recálculo; False si lo tiene otro (no espera)"""
+    CandadoDashboard.objects.get_or_create(pk=1)
+    with transaction.atomic():
+        yield CandadoDashboard.objects.select_for_update(skip_locked=True).filter(pk=1).exists()
+
+
+def obtener_metricas():
+    """Devuelve las métricas desde la caché, recalculándolas en un solo worker si hace falta"""
+    metricas = cache.get(CACHE_KEY)
+    if _vigente(metricas):
+        _contar('hits')
+        return metricas
+
+    _contar('misses')
+    for _ in range(INTENTOS_LOCK):
+        with _candado() as tomado:
+            if tomado:
+                metricas = calcular_metricas()
+                cache.set(CACHE_KEY, metricas, timeout=CACHE_TIMEOUT)
+                cache.set(STALE_KEY, metricas, timeout=None)
+                _contar('recalculos')
+                return metricas
+
+        # Otro worker está recalculando: servir la copia anterior si existe
+        anterior = cache.get(STALE_KEY)
+        if _vigente(anterior):
+            return anterior
+        time.sleep(ESPERA_LOCK)
+        metricas = cache.get(CACHE_KEY)
+        if _vigente(metricas):
+            return metricas
+
+    # El lock no se liberó a tiempo: calcular sin cachear
+    return calcular_metricas()
+
+
+def invalidar_metricas():
+    cache.delete(CACHE_KEY)
+
+
+def estadisticas_cache():
+    valores = cache.get_many(list(STATS_KEYS.values()))
+    return {nombre: valores.get(key, 0) for nombre, key in STATS_KEYS.items()}
@@ -0,0 +1,270 @@
+"""
+Importación masiva de estudiantes y profesores desde CSV o XLSX.
+
+Las filas se leen en streaming y se procesan por lotes: una consulta por lote
+para detectar cédulas, emails y teléfonos ya registrados, el hash de las
+contraseñas (PBKDF2 es intencionalmente lento) y un bulk_create por lote. El
+comando import_usuarios reparte el hash entre varios procesos. La subida desde
+el panel no importa dentro de la petición (cientos de hashes superan el timeout
+del worker web): encolar_importacion() guarda el archivo y crea un
+TrabajoReporte que procesa el worker procesar_reportes, con su propio pool.
+"""
+import csv
+import io
+import os
+import unicodedata
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from openpyxl import load_workbook
+
+from reportes.models import TipoReporte, TrabajoReporte, directorio_reportes
+from .dashboard import invalidar_metricas
+from .models import CAMPOS_UNICOS, Usuario, _comparable
+
+TAMANO_LOTE = 500
+
+# Encabezados aceptados (sin tildes, en minúsculas) -> campo de Usuario
+COLUMNAS = {
+    'cedula': 'cedula',
+    'nombre': 'first_name',
+    'nombres': 'first_name',
+    'first_name': 'first_name',
+    'apellido': 'last_name',
+    'apellidos': 'last_name',
+    'last_name': 'last_name',
+    'email': 'email',
+    'correo': 'email',
+    'telefono': 'telefono',
+    'direccion': 'direccion',
+    'instrumento': 'instrumento',
+    'password': 'password',
+    'contrasena': 'password',
+}
+OBLIGATORIOS = {'first_name': 'nombre', 'email': 'email', 'password': 'contraseña'}
+
+
+def _normalizar_encabezado(texto):
+    texto = unicodedata.normalize('NFKD', str(texto or '')).encode('ascii', 'ignore').decode()
+    return texto.strip().lower().replace(' ', '_')
+
+
+def _filas_csv(archivo):
+    if isinstance(archivo, (str, os.PathLike)):
+        with open(archivo, newline='', encoding='utf-8-sig') as f:
+            yield from _filas_csv(f)
+        return
+    if not isinstance(archivo, io.TextIOBase):
+        archivo = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    lector = csv.reader(archivo)
+    encabezados = next(lector, [])
+    for valores in lector:
+        if any(valores):
+            yield dict(zip(encabezados, valores))
+
+
+def _filas_xlsx(archivo):
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        filas = libro.active.iter_rows(values_only=True)
+        encabezados = next(filas, ())
+        for valores in filas:
+            if any(v not in (None, '') for v in valores):
+                yield {e: '' if v is None else str(v) for e, v in zip(encabezados, valores)}
+    finally:
+        libro.close()
+
+
+def leer_filas(archivo, nombre):
+    """Genera diccionarios {campo de Usuario: valor} a partir de un CSV o XLSX"""
+    lector = _filas_xlsx if nombre.lower().endswith('.xlsx') else _filas_csv
+    for fila in lector(archivo):
+        datos = {}
+        for encabezado, valor in fila.items():
+            campo = COLUMNAS.get(_normalizar_encabezado(encabezado))
+            if campo:
+                datos[campo] = (valor or '').strip()
+        yield datos
+
+
+def _inicializar_proceso():
+    # Con el método spawn el proceso hijo arranca sin Django configurado
+    if not apps.ready:
+        django.setup()
+
+
+def _validar_lote(lote):
+    """
+    Separa las filas válidas de las que tienen errores. Los duplicados contra la
+    base de datos se buscan con una sola consulta para todo el lote.
+    """
+    condicion = Q()
+    for campo in CAMPOS_UNICOS:
+        valores = {datos[campo] for _, datos in lote if datos.get(campo)}
+        if valores:
+            condicion |= Q(**{f'{campo}__in': valores})
+    emails = {datos['email'] for _, datos in lote if datos.get('email')}
+    if emails:
+        condicion |= Q(username__in=emails)
+
+    # Valores comparados como lo hace la collation de la base (Ana@x.com y ana@x.com son el mismo email)
+    existentes = {campo: set() for campo in CAMPOS_UNICOS}
+    if condicion:
+        for fila in Usuario.objects.filter(condicion).values(*CAMPOS_UNICOS, 'username'):
+            for campo in CAMPOS_UNICOS:
+                if fila[campo]:
+                    existentes[campo].add(_comparable(fila[campo]))
+            existentes['email'].add(_comparable(fila['username']))
+
+    validas, errores = [], []
+    for numero, datos in lote:
+        faltantes = [nombre for campo, nombre in OBLIGATORIOS.items() if not datos.get(campo)]
+        if faltantes:
+            errores.append((numero, f"Faltan datos: {', '.join(faltantes)}"))
+            continue
+        try:
+            validate_email(datos['email'])
+        except ValidationError:
+            errores.append((numero, f"Email inválido: {datos['email']}"))
+            continue
+        comparables = {campo: _comparable(datos[campo]) for campo in CAMPOS_UNICOS if datos.get(campo)}
+        duplicados = [campo for campo, valor in comparables.items() if valor in existentes[campo]]
+        if duplicados:
+            errores.append((numero, f"Ya registrado: {', '.join(duplicados)}"))
+            continue
+        # Las filas siguientes del mismo archivo tampoco pueden repetir estos datos
+        for campo, valor in comparables.items():
+            existentes[campo].add(valor)
+        validas.append((numero, datos))
+    return validas, errores
+
+
+def _crear_lote(validas, hashes, rol):
+    usuarios = [
+        Usuario(
+            username=datos['email'],
+            email=datos['email'],
+            password=hash_,
+            first_name=datos.get('first_name', ''),
+            last_name=datos.get('last_name', ''),
+            rol=rol,
+            # bulk_create no pasa por Usuario.save(): los vacíos se guardan como NULL aquí
+            cedula=datos.get('cedula') or None,
+            telefono=datos.get('telefono') or None,
+            direccion=datos.get('direccion', ''),
+            instrumento=datos.get('instrumento', '') if rol == Usuario.Rol.PROFESOR else None,
+            is_active=True,
+        )
+        for (_, datos), hash_ in zip(validas, hashes)
+    ]
+    try:
+        with transaction.atomic():
+            Usuario.objects.bulk_create(usuarios)
+        return len(usuarios), []
+    except IntegrityError:
+        pass
+
+    # Alguien registró los mismos datos mientras tanto: reintentar fila por fila
+    creados, errores = 0, []
+    for (numero, _), usuario in zip(validas, usuarios):
+        try:
+            with transaction.atomic():
+                usuario.save()
+            creados += 1
+        except IntegrityError:
+            errores.append((numero, "Ya registrado (cédula, email o teléfono)"))
+    return creados, errores
+
+
+def _hashes(validas, pool, procesos):
+    contrasenas = [datos['password'] for _, datos in validas]
+    if pool:
+        return list(pool.map(make_password, contrasenas, chunksize=max(1, len(contrasenas) // (procesos * 4))))
+    return [make_password(c) for c in contrasenas]
+
+
+def importar_usuarios(archivo, nombre, rol, procesos=1, tamano_lote=TAMANO_LOTE, progreso=None):
+    """
+    Importa usuarios con el rol indicado desde `archivo` (ruta o archivo abierto).
+    `nombre` decide el formato por su extensión (.csv o .xlsx). Con procesos > 1
+    los hashes de contraseña se calculan en un pool de ese tamaño. `progreso(filas)`
+    recibe las filas procesadas al terminar cada lote.
+
+    Devuelve {'creados': n, 'errores': [(número de fila, mensaje), ...]}; la fila
+    1 es la de encabezados.
+    """
+    procesos = procesos or 1
+    filas = enumerate(leer_filas(archivo, nombre), start=2)
+    creados, errores, leidas = 0, [], 0
+    pool = ProcessPoolExecutor(procesos, initializer=_inicializar_proceso) if procesos > 1 else None
+    try:
+        while True:
+            lote = list(islice(filas, tamano_lote))
+            if not lote:
+                break
+            leidas += len(lote)
+            validas, errores_lote = _validar_lote(lote)
+            errores += errores_lote
+            if validas:
+                creados_lote, errores_lote = _crear_lote(validas, _hashes(validas, pool, procesos), rol)
+                creados += creados_lote
+                errores += errores_lote
+            if progreso:
+                progreso(leidas)
+    finally:
+        if pool:
+            pool.shutdown()
+
+    if creados:
+        # bulk_create no dispara post_save
+        invalidar_metricas()
+    errores.sort()
+    return {'creados': creados, 'errores': errores}
+
+
+def encolar_importacion(archivo, rol, usuario):
+    """Guarda el archivo subido junto a los reportes y crea el trabajo que lo importa"""
+    directorio = directorio_reportes()
+    os.makedirs(directorio, exist_ok=True)
+    extension = '.xlsx' if archivo.name.lower().endswith('.xlsx') else '.csv'
+    guardado = f"importacion_{uuid.uuid4().hex}{extension}"
+    with open(os.path.join(directorio, guardado), 'wb') as destino:
+        for bloque in archivo.chunks():
+            destino.write(bloque)
+    return TrabajoReporte.objects.create(
+        tipo=TipoReporte.IMPORTACION_USUARIOS,
+        parametros={'archivo': guardado, 'nombre': archivo.name, 'rol': rol},
+        usuario=usuario,
+    )
+
+
+def procesar_importacion(parametros, progreso=None, procesos=None):
+    """
+    Importa el archivo de un trabajo encolado por encolar_importacion() y lo
+    elimina. `progreso(hechas, total)` recibe las filas procesadas; sin
+    `procesos` se usa un proceso por CPU, como en el comando import_usuarios.
+    """
+    ruta = os.path.join(directorio_reportes(), parametros['archivo'])
+    try:
+        total = sum(1 for _ in leer_filas(ruta, parametros['nombre']))
+        resultado = importar_usuarios(
+            ruta,
+            parametros['nombre'],
+            parametros['rol'],
+            procesos=procesos or os.cpu_count() or 1,
+            progreso=(lambda hechas: progreso(hechas, total)) if progreso else None,
+        )
+    except (ValueError, csv.Error) as e:
+        raise ValueError(f'No se pudo leer el archivo: {e}') from e
+    finally:
+        if os.path.exists(ruta):
+            os.remove(ruta)
+    return resultado
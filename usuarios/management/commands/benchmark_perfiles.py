@@ -0,0 +1,104 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+from usuarios.models import Usuario
+
+PERFILES = ['config.settings.dev', 'config.settings.prod']
+RUTAS = ['index', 'admin_dashboard', 'admin_estudiantes', 'admin_pagos']
+
+
+def _host():
+    # El cliente de pruebas usa 'testserver', que fuera de los tests no está en ALLOWED_HOSTS
+    for host in settings.ALLOWED_HOSTS:
+        if host not in ('*', '') and not host.startswith('.'):
+            return host
+    return 'localhost'
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara la latencia de peticiones entre perfiles de settings (por defecto dev y prod): ejecuta cada "
+        "perfil en un proceso aparte, con la base de datos y la caché que este configure, como un usuario "
+        "administrador. prod necesita DJANGO_SECRET_KEY, DJANGO_ALLOWED_HOSTS y collectstatic previo"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--perfiles',
+            nargs='+',
+            default=PERFILES,
+            help='Módulos de settings a comparar (por defecto: config.settings.dev config.settings.prod)',
+        )
+        parser.add_argument('--rutas', nargs='+', default=RUTAS, help='Nombres de URL a pedir')
+        parser.add_argument('--peticiones', type=int, default=100, help='Peticiones por ruta (por defecto: 100)')
+        parser.add_argument(
+            '--usuario',
+            help='Usuario con el que se inicia sesión (por defecto: el primer administrador activo)',
+        )
+        # Uso interno: mide en este proceso con los settings actuales y escribe JSON
+        parser.add_argument('--medir', action='store_true', help='(interno) medir solo el perfil actual')
+
+    def handle(self, *args, **options):
+        if options['medir']:
+            self.stdout.write(json.dumps(self.medir(options)))
+            return
+
+        resultados = {}
+        for perfil in options['perfiles']:
+            comando = [
+                sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'benchmark_perfiles', '--medir',
+                '--peticiones', str(options['peticiones']), '--rutas', *options['rutas'],
+            ]
+            if options['usuario']:
+                comando += ['--usuario', options['usuario']]
+            proceso = subprocess.run(
+                comando, env={**os.environ, 'DJANGO_SETTINGS_MODULE': perfil}, capture_output=True, text=True,
+            )
+            if proceso.returncode:
+                raise CommandError(f"El perfil {perfil} falló:\n{proceso.stderr.strip()}")
+            resultados[perfil] = json.loads(proceso.stdout.strip().splitlines()[-1])
+
+        self.stdout.write(f"{'ruta':<20} {'perfil':<24} {'primera ms':>10} {'mediana ms':>10} {'p95 ms':>8}")
+        for ruta in options['rutas']:
+            for perfil, medidas in resultados.items():
+                primera, tiempos = medidas[ruta]
+                p95 = statistics.quantiles(tiempos, n=20)[-1] if len(tiempos) > 1 else tiempos[0]
+                self.stdout.write(
+                    f"{ruta:<20} {perfil:<24} {primera:>10.1f} {statistics.median(tiempos):>10.1f} {p95:>8.1f}"
+                )
+        for perfil, medidas in resultados.items():
+            media = statistics.mean(t for _, tiempos in medidas.values() for t in tiempos)
+            self.stdout.write(self.style.SUCCESS(f"{perfil}: {media:.1f} ms por petición en promedio."))
+
+    def medir(self, options):
+        """{ruta: [ms de la primera petición, [ms de las siguientes]]} con los settings de este proceso"""
+        if options['usuario']:
+            usuario = Usuario.objects.filter(username=options['usuario']).first()
+        else:
+            usuario = Usuario.objects.filter(rol=Usuario.Rol.ADMIN, is_active=True).order_by('id').first()
+        if usuario is None:
+            raise CommandError("No se encontró el usuario para iniciar sesión.")
+        cliente = Client(HTTP_HOST=_host())
+        cliente.force_login(usuario)
+
+        medidas = {}
+        for ruta in options['rutas']:
+            url = reverse(ruta)
+            tiempos = []
+            # La primera petición incluye compilar plantillas y abrir la conexión
+            for _ in range(options['peticiones'] + 1):
+                inicio = time.perf_counter()
+                respuesta = cliente.get(url)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+                if respuesta.status_code != 200:
+                    raise CommandError(f"{url} respondió {respuesta.status_code}")
+            medidas[ruta] = [tiempos[0], tiempos[1:]]
+        return medidas
@@ -0,0 +1,57 @@
+import csv
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from usuarios.importacion import TAMANO_LOTE, importar_usuarios
+from usuarios.models import Usuario
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa estudiantes o profesores desde un archivo CSV o XLSX. Columnas: cedula, nombres, "
+        "apellidos, email, telefono, direccion, instrumento, password (nombres, email y password obligatorias)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo .csv o .xlsx')
+        parser.add_argument(
+            '--rol',
+            choices=['estudiante', 'profesor'],
+            default='estudiante',
+            help='Rol de los usuarios importados (por defecto: estudiante)',
+        )
+        parser.add_argument(
+            '--procesos',
+            type=int,
+            default=None,
+            help='Procesos para calcular los hashes de contraseña (por defecto: uno por CPU)',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=TAMANO_LOTE,
+            help=f'Filas por lote de validación e inserción (por defecto: {TAMANO_LOTE})',
+        )
+
+    def handle(self, *args, **options):
+        rol = Usuario.Rol.PROFESOR if options['rol'] == 'profesor' else Usuario.Rol.ESTUDIANTE
+        inicio = time.monotonic()
+        try:
+            resultado = importar_usuarios(
+                options['archivo'],
+                options['archivo'],
+                rol,
+                procesos=options['procesos'] or os.cpu_count() or 1,
+                tamano_lote=options['lote'],
+            )
+        except (OSError, ValueError, csv.Error) as e:
+            raise CommandError(f"No se pudo leer el archivo: {e}")
+
+        for numero, mensaje in resultado['errores']:
+            self.stderr.write(f"Fila {numero}: {mensaje}")
+        segundos = time.monotonic() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['creados']} usuarios importados, {len(resultado['errores'])} filas con errores "
+            f"({segundos:.1f} s)."
+        ))
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("usuarios", "0002_usuario_instrumento"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="usuario",
+            index=models.Index(
+                fields=["rol", "last_name", "first_name"], name="usuario_rol_nombre_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="usuario",
+            index=models.Index(fields=["cedula"], name="usuario_cedula_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="usuario",
+            index=models.Index(fields=["email"], name="usuario_email_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="usuario",
+            index=models.Index(fields=["telefono"], name="usuario_telefono_idx"),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:43
+
+import usuarios.models
+from django.db import migrations, models
+from django.db.models import Count
+
+CAMPOS_UNICOS = ("cedula", "email", "telefono")
+
+
+def vacios_a_null(apps, schema_editor):
+    Usuario = apps.get_model("usuarios", "Usuario")
+    conflictos = []
+    for campo in CAMPOS_UNICOS:
+        Usuario.objects.filter(**{campo: ""}).update(**{campo: None})
+        repetidos = (
+            Usuario.objects.exclude(**{f"{campo}__isnull": True})
+            .values(campo)
+            .annotate(total=Count("id"))
+            .filter(total__gt=1)
+            .values_list(campo, flat=True)
+        )
+        conflictos += [f"{campo}={valor}" for valor in repetidos]
+    if conflictos:
+        raise RuntimeError(
+            "Hay usuarios con identificadores repetidos; corríjalos antes de migrar: "
+            + ", ".join(conflictos)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("usuarios", "0003_usuario_indices"),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name="usuario",
+            managers=[
+                ("objects", usuarios.models.UsuarioManager()),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name="usuario",
+            name="usuario_cedula_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="usuario",
+            name="usuario_email_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="usuario",
+            name="usuario_telefono_idx",
+        ),
+        # email pasa a admitir NULL antes de normalizar los vacíos
+        migrations.AlterField(
+            model_name="usuario",
+            name="email",
+            field=models.EmailField(
+                blank=True, max_length=254, null=True, verbose_name="email address"
+            ),
+        ),
+        migrations.RunPython(vacios_a_null, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="usuario",
+            name="cedula",
+            field=models.CharField(blank=True, max_length=20, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name="usuario",
+            name="email",
+            field=models.EmailField(
+                blank=True,
+                max_length=254,
+                null=True,
+                unique=True,
+                verbose_name="email address",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="usuario",
+            name="telefono",
+            field=models.CharField(blank=True, max_length=20, null=True, unique=True),
+        ),
+    ]
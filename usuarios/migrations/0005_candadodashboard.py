@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:38
+
+from django.db import migrations, models
+
+
+def crear_fila(apps, schema_editor):
+    apps.get_model("usuarios", "CandadoDashboard").objects.get_or_create(pk=1)
+    # El lock anterior usaba una fila de MarcaAgregacion
+    MarcaAgregacion = apps.get_model("asistencias", "MarcaAgregacion")
+    MarcaAgregacion.objects.filter(nombre="dashboard_metricas").delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("asistencias", "0003_asistencia_diaria"),
+        ("usuarios", "0004_usuario_identificadores_unicos"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CandadoDashboard",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(crear_fila, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,61 @@
-from django.contrib.auth.models import AbstractUser
+import unicodedata
+
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
 
+# Identificadores que no pueden repetirse entre usuarios (vacío = sin dato)
+CAMPOS_UNICOS = ('cedula', 'email', 'telefono')
+
+
+# utf8mb4_general_ci no expande caracteres: ß pesa lo mismo que s (no que ss)
+PESOS_ESPECIALES = {'ß': 'S'}
+
+
+def _peso(caracter):
+    if ord(caracter) > 0xFFFF:
+        # Fuera del plano básico (emojis, etc.) todos pesan lo mismo
+        return '\ufffd'
+    if caracter in PESOS_ESPECIALES:
+        return PESOS_ESPECIALES[caracter]
+    # Letra base de la descomposición canónica (á -> a), sin expandir ligaduras (ﬁ no es fi)
+    base = unicodedata.normalize('NFD', caracter)[0]
+    mayuscula = base.upper()
+    return mayuscula if len(mayuscula) == 1 else base
+
+
+def _comparable(valor):
+    """
+    Valor como lo compara la collation de las tablas (utf8mb4_general_ci, ver
+    respaldo_academia.sql): carácter por carácter, sin distinguir mayúsculas ni
+    tildes y sin los espacios finales
+    """
+    return ''.join(_peso(c) for c in str(valor or '')).rstrip(' ')
+
+
+class UsuarioManager(UserManager):
+    def campos_duplicados(self, excluir_id=None, **valores):
+        """
+        Devuelve los campos de CAMPOS_UNICOS cuyo valor ya usa otro usuario,
+        con una sola consulta. Ej.: campos_duplicados(cedula='1', email='a@b.c')
+        """
+        valores = {campo: valor for campo, valor in valores.items() if campo in CAMPOS_UNICOS and valor}
+        if not valores:
+            return []
+        condicion = models.Q()
+        for campo, valor in valores.items():
+            condicion |= models.Q(**{campo: valor})
+        otros = self.filter(condicion)
+        if excluir_id:
+            otros = otros.exclude(pk=excluir_id)
+        # La base de datos encontró la fila con su collation; compararla igual aquí
+        # (Ana@x.com y ana@x.com son el mismo email para MySQL)
+        buscados = {campo: _comparable(valor) for campo, valor in valores.items()}
+        duplicados = set()
+        for fila in otros.values(*valores):
+            duplicados.update(campo for campo, valor in buscados.items() if _comparable(fila[campo]) == valor)
+        return [campo for campo in CAMPOS_UNICOS if campo in duplicados]
+
+
 class Usuario(AbstractUser):
     class Rol(models.TextChoices):
         ADMIN = 'ADMIN', 'Administrador'
@@ -10,11 +65,35 @@ class Usuario(AbstractUser):
     rol = models.CharField(max_length=10, choices=Rol.choices, default=Rol.ESTUDIANTE)
 
     # Campos adicionales
-    cedula = models.CharField(max_length=20, blank=True, null=True)
-    telefono = models.CharField(max_length=20, blank=True, null=True)
+    cedula = models.CharField(max_length=20, blank=True, null=True, unique=True)
+    telefono = models.CharField(max_length=20, blank=True, null=True, unique=True)
     direccion = models.CharField(max_length=255, blank=True, null=True)
     instrumento = models.CharField(max_length=100, blank=True, null=True)  # <--- NUEVO CAMPO
+    # Redefinido para poder ser único: los usuarios sin email guardan NULL
+    email = models.EmailField('email address', blank=True, null=True, unique=True)
+
+    objects = UsuarioManager()
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Listados por rol ordenados por apellido y nombre
+            models.Index(fields=['rol', 'last_name', 'first_name'], name='usuario_rol_nombre_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Cadena vacía -> NULL, para que la restricción única permita varios usuarios sin dato
+        for campo in CAMPOS_UNICOS:
+            if not getattr(self, campo):
+                setattr(self, campo, None)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.username} ({self.get_rol_display()})"
 
+
+
+class CandadoDashboard(models.Model):
+    """Fila única que un worker bloquea (SELECT ... FOR UPDATE) mientras recalcula las métricas del panel"""
+
+    def __str__(self):
+        return f"Candado del dashboard {self.pk}"
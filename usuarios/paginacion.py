@@ -0,0 +1,125 @@
+"""
+Paginación por cursor (keyset) para los listados del panel de administración.
+
+En lugar de OFFSET, cada página filtra por los valores de orden de la última
+fila vista, así el costo de una página no depende de cuántas filas hay antes.
+"""
+import base64
+import json
+from functools import reduce
+from operator import or_
+from urllib.parse import urlencode
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+TAMANO_PAGINA = 50
+TAMANO_MAXIMO = 200
+
+
+def _codificar(valores):
+    data = json.dumps(valores, cls=DjangoJSONEncoder).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def _decodificar(cursor):
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        valores = json.loads(data)
+    except (ValueError, TypeError):
+        return None
+    return valores if isinstance(valores, list) else None
+
+
+def _valor(obj, campo):
+    for parte in campo.split('__'):
+        obj = getattr(obj, parte)
+    return obj
+
+
+def _despues_de(orden, valores, invertir=False):
+    """Q para las filas que van después (o antes, si invertir) de `valores` según `orden`"""
+    condiciones = []
+    for i, campo in enumerate(orden):
+        nombre = campo.lstrip('-')
+        descendente = campo.startswith('-') != invertir
+        iguales = {o.lstrip('-'): v for o, v in zip(orden[:i], valores[:i])}
+        condiciones.append(Q(**iguales) & Q(**{f"{nombre}__{'lt' if descendente else 'gt'}": valores[i]}))
+    return reduce(or_, condiciones)
+
+
+class PaginaCursor:
+    def __init__(self, filas, siguiente, anterior, params):
+        self.object_list = filas
+        self.siguiente = siguiente
+        self.anterior = anterior
+        self._params = params
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def _url(self, clave, cursor):
+        return '?' + urlencode({**self._params, clave: cursor})
+
+    @property
+    def url_siguiente(self):
+        return self._url('despues', self.siguiente) if self.siguiente else None
+
+    @property
+    def url_anterior(self):
+        return self._url('antes', self.anterior) if self.anterior else None
+
+
+def _pagina(queryset, orden, tamano, antes, despues):
+    """(filas, hay siguiente, hay anterior) de la página pedida con los cursores ya decodificados"""
+    if antes and len(antes) == len(orden):
+        invertido = [c[1:] if c.startswith('-') else f'-{c}' for c in orden]
+        filas = list(queryset.filter(_despues_de(orden, antes, invertir=True)).order_by(*invertido)[:tamano + 1])
+        hay_mas = len(filas) > tamano
+        filas = filas[:tamano][::-1]
+        return filas, bool(filas), hay_mas
+    if despues and len(despues) == len(orden):
+        queryset = queryset.filter(_despues_de(orden, despues))
+    else:
+        despues = None
+    filas = list(queryset.order_by(*orden)[:tamano + 1])
+    siguiente = len(filas) > tamano
+    filas = filas[:tamano]
+    return filas, siguiente, bool(despues and filas)
+
+
+def paginar_por_cursor(queryset, request, orden, tamano=TAMANO_PAGINA):
+    """
+    Devuelve una PaginaCursor de `queryset` ordenado por `orden`.
+    El último campo de `orden` debe ser único (normalmente 'id' o '-id').
+    Lee los parámetros GET 'despues', 'antes' y 'tamano'.
+    """
+    try:
+        tamano = int(request.GET.get('tamano', tamano))
+    except ValueError:
+        pass
+    tamano = max(1, min(tamano, TAMANO_MAXIMO))
+    params = {
+        k: v for k, v in request.GET.items()
+        if k not in ('despues', 'antes') and v
+    }
+
+    antes = _decodificar(request.GET.get('antes', ''))
+    despues = _decodificar(request.GET.get('despues', ''))
+    try:
+        filas, siguiente, anterior = _pagina(queryset, orden, tamano, antes, despues)
+    except (ValueError, TypeError, ValidationError):
+        # Cursor editado a mano con valores que no son del tipo del campo (o None): como si no hubiera
+        filas, siguiente, anterior = _pagina(queryset, orden, tamano, None, None)
+
+    campos = [c.lstrip('-') for c in orden]
+    return PaginaCursor(
+        filas,
+        siguiente=_codificar([_valor(filas[-1], c) for c in campos]) if siguiente and filas else None,
+        anterior=_codificar([_valor(filas[0], c) for c in campos]) if anterior and filas else None,
+        params=params,
+    )
@@ -0,0 +1,31 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from cursos.models import Curso
+from horarios.models import Horario
+from matriculas.models import Matricula
+from pagos.models import Pago
+from .dashboard import invalidar_metricas
+from .models import Usuario
+
+MODELOS_DASHBOARD = (Usuario, Curso, Matricula, Pago, Horario)
+
+
+def invalidar_al_confirmar(invalidar, modelos, prefijo):
+    """
+    Llama a invalidar() al confirmarse la transacción que guarda o elimina
+    alguno de `modelos`: si se invalida antes, otro worker puede volver a
+    cachear los datos sin confirmar bajo la versión nueva. Los guardados que
+    solo actualizan last_login (el login) no invalidan.
+    """
+    def receptor(sender, update_fields=None, **kwargs):
+        if update_fields and set(update_fields) <= {'last_login'}:
+            return
+        transaction.on_commit(invalidar)
+
+    for modelo in modelos:
+        post_save.connect(receptor, sender=modelo, weak=False, dispatch_uid=f'{prefijo}_save_{modelo.__name__}')
+        post_delete.connect(receptor, sender=modelo, weak=False, dispatch_uid=f'{prefijo}_delete_{modelo.__name__}')
+    return receptor
+
+
+invalidar_dashboard = invalidar_al_confirmar(invalidar_metricas, MODELOS_DASHBOARD, 'dashboard')
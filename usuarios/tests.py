@@ -1,3 +1,455 @@
-from django.test import TestCase
+import importlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+from datetime import date, time
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from openpyxl import Workbook
+
+from asistencias.models import Asistencia, AsistenciaDiaria, EstadoAsistencia
+from cursos.models import Curso
+from horarios.models import Horario
+from matriculas.models import Matricula, EstadoMatricula
+from pagos.models import Pago, EstadoPago
+from reportes.generacion import procesar_trabajo
+from reportes.models import EstadoTrabajo, TipoReporte, TrabajoReporte
+from usuarios import dashboard
+from usuarios.importacion import importar_usuarios
+from usuarios.models import Usuario, _comparable
+from usuarios.paginacion import _codificar
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class DashboardMetricasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = Usuario.objects.create_user(username='admin', password='x', rol=Usuario.Rol.ADMIN)
+        self.client.force_login(self.admin)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_hits_y_misses(self):
+        self.client.get(reverse('admin_dashboard'))
+        self.client.get(reverse('admin_dashboard'))
+
+        stats = self.client.get(reverse('admin_dashboard_cache_stats')).json()
+
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['recalculos'], 1)
+
+    def test_se_invalida_al_guardar(self):
+        self.assertEqual(dashboard.obtener_metricas()['total_cursos'], 0)
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            Curso.objects.create(nombre='Curso de Piano', precio=0)
+        # Hasta confirmar la transacción se sigue sirviendo la copia anterior
+        self.assertEqual(dashboard.obtener_metricas()['total_cursos'], 0)
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(dashboard.obtener_metricas()['total_cursos'], 1)
+
+    def test_login_no_invalida(self):
+        dashboard.obtener_metricas()
+        self.client.login(username='admin', password='x')
+        self.assertIsNotNone(cache.get(dashboard.CACHE_KEY))
+
+    def test_un_solo_worker_recalcula(self):
+        anterior = dashboard.obtener_metricas()
+        dashboard.invalidar_metricas()
+        # Simula otro worker con la fila del lock bloqueada (SKIP LOCKED no la devuelve)
+        bloqueada = mock.patch.object(
+            dashboard.CandadoDashboard.objects, 'select_for_update',
+            return_value=dashboard.CandadoDashboard.objects.none(),
+        )
+
+        with bloqueada, mock.patch.object(dashboard, 'calcular_metricas') as calcular:
+            metricas = dashboard.obtener_metricas()
+
+        calcular.assert_not_called()
+        self.assertEqual(metricas['total_estudiantes'], anterior['total_estudiantes'])
+
+
+class PaginacionCursorTests(TestCase):
+    def setUp(self):
+        self.admin = Usuario.objects.create_user(username='admin', password='x', rol=Usuario.Rol.ADMIN)
+        self.client.force_login(self.admin)
+        for i in range(5):
+            Usuario.objects.create_user(
+                username=f'est{i}', password='x', rol=Usuario.Rol.ESTUDIANTE,
+                first_name='Ana', last_name='Pérez', cedula=f'09000000{i}',
+            )
+
+    def test_recorre_todas_las_paginas_sin_repetir(self):
+        url = reverse('admin_estudiantes') + '?tamano=2'
+        vistos = []
+        while url:
+            pagina = self.client.get(url).context['pagina']
+            vistos += [estudiante.id for estudiante in pagina]
+            url = reverse('admin_estudiantes') + pagina.url_siguiente if pagina.url_siguiente else None
+
+        self.assertEqual(len(vistos), 5)
+        self.assertEqual(len(set(vistos)), 5)
+
+    def test_pagina_anterior(self):
+        primera = self.client.get(reverse('admin_estudiantes') + '?tamano=2').context['pagina']
+        segunda = self.client.get(reverse('admin_estudiantes') + primera.url_siguiente).context['pagina']
+        anterior = self.client.get(reverse('admin_estudiantes') + segunda.url_anterior).context['pagina']
+
+        self.assertEqual([e.id for e in anterior], [e.id for e in primera])
+        self.assertIsNone(anterior.url_anterior)
+
+    def test_cursor_editado_se_ignora(self):
+        primera = self.client.get(reverse('admin_estudiantes') + '?tamano=2').context['pagina']
+        for parametro in ('despues', 'antes'):
+            for valores in (['Pérez', 'Ana', 'x'], [None, None, None]):
+                respuesta = self.client.get(
+                    reverse('admin_estudiantes'), {'tamano': 2, parametro: _codificar(valores)}
+                )
+                self.assertEqual(respuesta.status_code, 200)
+                pagina = respuesta.context['pagina']
+                self.assertEqual([e.id for e in pagina], [e.id for e in primera])
+                self.assertIsNone(pagina.url_anterior)
+
+    def test_busqueda_por_cedula(self):
+        pagina = self.client.get(reverse('admin_estudiantes'), {'q': '090000003'}).context['pagina']
+        self.assertEqual([e.username for e in pagina], ['est3'])
+
+
+class RosterAsistenciaTests(TestCase):
+    def setUp(self):
+        self.admin = Usuario.objects.create_user(username='admin', password='x', rol=Usuario.Rol.ADMIN)
+        self.client.force_login(self.admin)
+        curso = Curso.objects.create(nombre='Curso de Violín', precio=0)
+        self.clases = [
+            Horario.objects.create(
+                curso=curso, fecha_inicio=date(2025, 1, 1), fecha_fin=date(2025, 6, 30),
+                hora_inicio=time(8, 0), hora_fin=time(9, 0),
+            )
+            for _ in range(2)
+        ]
+        self.estudiantes = [
+            Usuario.objects.create_user(username=f'est{i}', password='x', rol=Usuario.Rol.ESTUDIANTE, first_name=f'E{i}')
+            for i in range(3)
+        ]
+        self.fecha = date(2025, 3, 3)
+        for estudiante in self.estudiantes:
+            Matricula.objects.create(estudiante=estudiante, clase=self.clases[0])
+        # El mismo estudiante también asiste a otra clase ese día
+        otra = Matricula.objects.create(estudiante=self.estudiantes[0], clase=self.clases[1])
+        Asistencia.objects.create(matricula=otra, clase=self.clases[1], fecha=self.fecha, estado=EstadoAsistencia.TARDE)
+        Asistencia.objects.create(
+            matricula=Matricula.objects.get(estudiante=self.estudiantes[1], clase=self.clases[0]),
+            clase=self.clases[0], fecha=self.fecha, estado=EstadoAsistencia.PRESENTE,
+        )
+
+    def test_roster_con_asistencia_en_una_consulta(self):
+        with CaptureQueriesContext(connection) as consultas:
+            data = self.client.get(reverse('admin_asistencias_roster'), {
+                'clase_id': self.clases[0].id, 'fecha': self.fecha.isoformat(),
+            }).json()
+
+        estados = {e['id']: e['estado'] for e in data['estudiantes']}
+        self.assertEqual(estados, {
+            self.estudiantes[0].id: None,
+            self.estudiantes[1].id: EstadoAsistencia.PRESENTE,
+            self.estudiantes[2].id: None,
+        })
+        # Aparte de la sesión y el usuario, solo la consulta del roster
+        self.assertEqual(len([q for q in consultas.captured_queries if 'matricula' in q['sql']]), 1)
+
+    def test_roster_parametros_invalidos(self):
+        response = self.client.get(reverse('admin_asistencias_roster'), {'clase_id': 'x', 'fecha': '2025-03-03'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_asistencias_fecha_respeta_clase(self):
+        response = self.client.post(
+            reverse('obtener_asistencias_fecha'),
+            data={'clase_id': self.clases[0].id, 'fecha': self.fecha.isoformat(),
+                  'estudiante_ids': [e.id for e in self.estudiantes]},
+            content_type='application/json',
+        )
+        self.assertEqual(set(response.json()), {str(self.estudiantes[1].id)})
+
+    def test_historial_por_sesion(self):
+        AsistenciaDiaria.objects.refrescar()
+        response = self.client.get(reverse('admin_asistencias'), {'clase_filtro': self.clases[0].id})
+
+        sesiones = list(response.context['sesiones'])
+        self.assertEqual([(s.clase_id, s.fecha, s.total) for s in sesiones], [(self.clases[0].id, self.fecha, 1)])
+
+    def test_historial_consultas_constantes(self):
+        def consultas():
+            with CaptureQueriesContext(connection) as capturadas:
+                self.client.get(reverse('admin_asistencias'))
+            return len(capturadas)
+
+        AsistenciaDiaria.objects.refrescar()
+        antes = consultas()
+        matricula = Matricula.objects.get(estudiante=self.estudiantes[2], clase=self.clases[0])
+        for dia in range(1, 6):
+            Asistencia.objects.create(matricula=matricula, clase=self.clases[0], fecha=date(2025, 4, dia))
+        AsistenciaDiaria.objects.refrescar()
+        self.assertEqual(consultas(), antes)
+        # La página solo lee el resumen: no toma la marca del refresco
+        with CaptureQueriesContext(connection) as capturadas:
+            self.client.get(reverse('admin_asistencias'))
+        self.assertFalse([q for q in capturadas.captured_queries if 'marcaagregacion' in q['sql'].lower()])
+
+    def test_detalle_sesion(self):
+        data = self.client.get(reverse('admin_asistencias_detalle'), {
+            'clase_id': self.clases[1].id, 'fecha': self.fecha.isoformat(),
+        }).json()
+
+        self.assertEqual(len(data['asistencias']), 1)
+        self.assertEqual(data['asistencias'][0]['estado'], EstadoAsistencia.TARDE)
+
+
+class IndicesConsultasTests(TestCase):
+    """Las consultas frecuentes deben resolverse con un índice (EXPLAIN en SQLite y MySQL)"""
+
+    def plan(self, queryset):
+        if connection.vendor == 'mysql':
+            return queryset.explain(format='json')
+        return queryset.explain()
+
+    def assertUsaIndice(self, queryset, nombre=None):
+        """Sin nombre basta con cualquier índice (los de unique llevan nombres propios de cada motor)"""
+        plan = self.plan(queryset)
+        if connection.vendor == 'mysql':
+            # "possible_keys" también lista el índice; lo que importa es "key"
+            clave = f'"key": "{nombre}"' if nombre else '"key": '
+            self.assertIn(clave, json.dumps(json.loads(plan)), plan)
+        else:
+            self.assertRegex(plan, rf'USING (COVERING )?INDEX {nombre or ""}', plan)
+        return plan
+
+    def test_asistencias(self):
+        hoy = date(2025, 3, 3)
+        self.assertUsaIndice(Asistencia.objects.filter(clase_id=1, fecha=hoy), 'asistencia_clase_fecha_idx')
+        self.assertUsaIndice(
+            Asistencia.objects.filter(fecha__gte=hoy, fecha__lte=hoy, estado=EstadoAsistencia.PRESENTE),
+            'asistencia_fecha_estado_idx',
+        )
+
+    def test_asistencias_por_matricula(self):
+        # (matricula, fecha) lo cubre el índice de unique_together
+        plan = self.assertUsaIndice(Asistencia.objects.filter(matricula_id=1).order_by('fecha'))
+        self.assertNotIn('USE TEMP B-TREE', plan)
+
+    def test_pagos_matriculas_y_clases(self):
+        self.assertUsaIndice(
+            Pago.objects.filter(estado=EstadoPago.PENDIENTE).order_by('fecha_pago'), 'pago_estado_fecha_idx'
+        )
+        self.assertUsaIndice(
+            Matricula.objects.filter(clase_id=1, estado=EstadoMatricula.ACTIVA), 'matricula_clase_estado_idx'
+        )
+        hoy = date(2025, 3, 3)
+        self.assertUsaIndice(
+            Horario.objects.filter(fecha_inicio__lte=hoy, fecha_fin__gte=hoy), 'horario_vigencia_idx'
+        )
+
+    def test_usuarios(self):
+        self.assertUsaIndice(
+            Usuario.objects.filter(rol=Usuario.Rol.ESTUDIANTE).order_by('last_name', 'first_name'),
+            'usuario_rol_nombre_idx',
+        )
+        # Restricciones únicas de los identificadores
+        for campo in ['cedula', 'email', 'telefono']:
+            self.assertUsaIndice(Usuario.objects.filter(**{campo: 'x'}))
+
+
+class CamposDuplicadosTests(TestCase):
+    def setUp(self):
+        self.existente = Usuario.objects.create_user(
+            username='ana@x.com', email='ana@x.com', password='x', cedula='0911111111', telefono='0991111111'
+        )
+
+    def test_una_consulta_con_los_campos_en_conflicto(self):
+        with self.assertNumQueries(1):
+            campos = Usuario.objects.campos_duplicados(cedula='0911111111', email='otro@x.com', telefono='0991111111')
+        self.assertEqual(campos, ['cedula', 'telefono'])
+
+    def test_excluye_al_usuario_editado(self):
+        campos = Usuario.objects.campos_duplicados(excluir_id=self.existente.id, cedula='0911111111', email='ana@x.com')
+        self.assertEqual(campos, [])
+
+    def test_compara_como_la_collation_de_mysql(self):
+        # La fila la encuentra la cédula; el email solo difiere en mayúsculas y espacios finales
+        campos = Usuario.objects.campos_duplicados(cedula='0911111111', email='ANA@x.com ')
+        self.assertEqual(campos, ['cedula', 'email'])
+
+    def test_comparable_pliega_como_utf8mb4_general_ci(self):
+        self.assertEqual(_comparable('José Ñandú  '), _comparable('JOSE NANDU'))
+        self.assertEqual(_comparable('Straße'), _comparable('STRASE'))
+        # Sin expansiones: ß no es ss y la ligadura ﬁ no es fi
+        self.assertNotEqual(_comparable('Straße'), _comparable('strasse'))
+        self.assertNotEqual(_comparable('ﬁn'), _comparable('fin'))
+        self.assertEqual(_comparable('a😀'), _comparable('a🎵'))
+
+    def test_vacios_no_chocan(self):
+        Usuario.objects.create_user(username='sin-datos-1', password='x', cedula='', telefono='')
+        Usuario.objects.create_user(username='sin-datos-2', password='x', cedula='', telefono='')
+        self.assertEqual(Usuario.objects.campos_duplicados(cedula='', email='', telefono=''), [])
+
+    def test_restriccion_en_base_de_datos(self):
+        with self.assertRaises(IntegrityError):
+            Usuario.objects.create_user(username='otra', password='x', cedula='0911111111')
+
+    def test_alta_duplicada_muestra_campos(self):
+        admin = Usuario.objects.create_user(username='admin', password='x', rol=Usuario.Rol.ADMIN)
+        self.client.force_login(admin)
+        response = self.client.post(reverse('admin_estudiantes'), {
+            'cedula': '0922222222', 'email': 'ana@x.com', 'telefono': '',
+            'password': 'x', 'confirm_password': 'x',
+        })
+        self.assertTrue(response.context['mostrar_modal_duplicado'])
+        self.assertEqual(response.context['campos_duplicados'], ['email'])
+
+
+class ImportacionUsuariosTests(TestCase):
+    CSV = (
+        "Cédula,Nombres,Apellidos,Correo,Teléfono,Contraseña\n"
+        "0911111111,Ana,Paz,ana@x.com,0991111111,clave1\n"
+        "0922222222,Luis,Mora,luis@x.com,,clave2\n"
+        "0911111111,Repetida,En archivo,rep@x.com,,clave3\n"
+        ",Sin,Correo,,,clave4\n"
+        "0933333333,Eva,Ríos,existente@x.com,,clave5\n"
+    )
+
+    def setUp(self):
+        Usuario.objects.create_user(username='existente@x.com', email='existente@x.com', password='x')
+
+    def test_importa_por_lotes_y_reporta_errores(self):
+        with self.assertNumQueries(4):
+            resultado = importar_usuarios(io.StringIO(self.CSV), 'alumnos.csv', Usuario.Rol.ESTUDIANTE, procesos=1)
+        self.assertEqual(resultado['creados'], 2)
+        self.assertEqual([fila for fila, _ in resultado['errores']], [4, 5, 6])
+        ana = Usuario.objects.get(username='ana@x.com')
+        self.assertEqual((ana.rol, ana.cedula, ana.last_name), (Usuario.Rol.ESTUDIANTE, '0911111111', 'Paz'))
+        self.assertTrue(ana.check_password('clave1'))
+        self.assertIsNone(Usuario.objects.get(username='luis@x.com').telefono)
+
+    def test_duplicados_como_la_collation(self):
+        csv_ = (
+            "Nombres,Correo,Contraseña\n"
+            "Ana,Ana@x.com,clave1\n"
+            "Otra Ana,ANA@x.com,clave2\n"
+        )
+        with self.assertNumQueries(4):
+            resultado = importar_usuarios(io.StringIO(csv_), 'alumnos.csv', Usuario.Rol.ESTUDIANTE)
+        # Sin volver a insertar fila por fila: el lote ya no choca con el índice único
+        self.assertEqual(resultado['creados'], 1)
+        self.assertEqual([fila for fila, _ in resultado['errores']], [3])
+
+    def test_varios_procesos(self):
+        resultado = importar_usuarios(io.StringIO(self.CSV), 'alumnos.csv', Usuario.Rol.ESTUDIANTE, procesos=2)
+        self.assertEqual(resultado['creados'], 2)
+        self.assertTrue(Usuario.objects.get(username='luis@x.com').check_password('clave2'))
+
+    def test_xlsx(self):
+        libro = Workbook()
+        for linea in self.CSV.splitlines():
+            libro.active.append(linea.split(','))
+        archivo = io.BytesIO()
+        libro.save(archivo)
+        archivo.seek(0)
+        resultado = importar_usuarios(archivo, 'alumnos.xlsx', Usuario.Rol.ESTUDIANTE)
+        self.assertEqual(resultado['creados'], 2)
+        self.assertEqual([fila for fila, _ in resultado['errores']], [4, 5, 6])
+
+    def test_comando(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as f:
+            f.write(self.CSV)
+        self.addCleanup(os.remove, f.name)
+        salida, errores = io.StringIO(), io.StringIO()
+        call_command('import_usuarios', f.name, rol='profesor', procesos=1, stdout=salida, stderr=errores)
+        self.assertIn('2 usuarios importados', salida.getvalue())
+        self.assertIn('Fila 4', errores.getvalue())
+        self.assertEqual(Usuario.objects.filter(rol=Usuario.Rol.PROFESOR).count(), 2)
+
+    def test_subida_desde_el_panel(self):
+        admin = Usuario.objects.create_user(username='admin', password='x', rol=Usuario.Rol.ADMIN)
+        self.client.force_login(admin)
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        archivo = SimpleUploadedFile('alumnos.csv', self.CSV.encode('utf-8'), content_type='text/csv')
+
+        # La petición solo encola: los hashes los calcula el worker de reportes
+        with override_settings(REPORTES_DIR=directorio), mock.patch('usuarios.importacion.make_password') as hashear:
+            response = self.client.post(reverse('admin_estudiantes'), {'archivo_importacion': archivo})
+        hashear.assert_not_called()
+        trabajo = TrabajoReporte.objects.get(tipo=TipoReporte.IMPORTACION_USUARIOS)
+        self.assertRedirects(response, f"{reverse('admin_estudiantes')}?importacion={trabajo.id}")
+        self.assertEqual(trabajo.estado, EstadoTrabajo.PENDIENTE)
+        self.assertContains(self.client.get(response.url), 'importacion-en-curso')
+
+        with override_settings(REPORTES_DIR=directorio):
+            procesar_trabajo(TrabajoReporte.objects.tomar_siguiente(), procesos=1)
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, EstadoTrabajo.COMPLETADO)
+        self.assertEqual((trabajo.progreso, trabajo.total), (5, 5))
+        self.assertEqual(trabajo.resultado['creados'], 2)
+        self.assertEqual([fila for fila, _ in trabajo.resultado['errores']], [4, 5, 6])
+        self.assertTrue(Usuario.objects.filter(username='luis@x.com', rol=Usuario.Rol.ESTUDIANTE).exists())
+        # El archivo subido se elimina al terminar
+        self.assertEqual(os.listdir(directorio), [])
+
+        response = self.client.get(response.url)
+        self.assertContains(response, '2 estudiantes importados.')
+        self.assertEqual(self.client.get(reverse('reporte_trabajo_estado', args=[trabajo.id])).json().get('url_descarga'), None)
+
+
+class PerfilesSettingsTests(TestCase):
+    def cargar_prod(self, **variables):
+        sys.modules.pop('config.settings.prod', None)
+        self.addCleanup(sys.modules.pop, 'config.settings.prod', None)
+        with mock.patch.dict(os.environ, variables):
+            return importlib.import_module('config.settings.prod')
+
+    def test_prod_exige_clave_y_hosts(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop('DJANGO_SECRET_KEY', None)
+            with self.assertRaises(ImproperlyConfigured):
+                self.cargar_prod()
+        with self.assertRaises(ImproperlyConfigured):
+            self.cargar_prod(DJANGO_SECRET_KEY='clave', DJANGO_ALLOWED_HOSTS='')
+
+    def test_prod(self):
+        from config.settings import base
+
+        prod = self.cargar_prod(DJANGO_SECRET_KEY='clave', DJANGO_ALLOWED_HOSTS='academia.ec, www.academia.ec')
+        self.assertFalse(prod.DEBUG)
+        self.assertEqual(prod.ALLOWED_HOSTS, ['academia.ec', 'www.academia.ec'])
+        self.assertEqual(prod.DATABASES['default']['CONN_MAX_AGE'], 600)
+        self.assertTrue(prod.DATABASES['default']['CONN_HEALTH_CHECKS'])
+        self.assertEqual(prod.TEMPLATES[0]['OPTIONS']['loaders'][0][0], 'django.template.loaders.cached.Loader')
+        self.assertEqual(prod.SESSION_ENGINE, 'django.contrib.sessions.backends.cached_db')
+        self.assertIn('Manifest', prod.STORAGES['staticfiles']['BACKEND'])
+        # base.py no se modifica: dev sigue con sus valores
+        self.assertNotIn('CONN_MAX_AGE', base.DATABASES['default'])
+        self.assertTrue(base.TEMPLATES[0]['APP_DIRS'])
+        locmem = self.cargar_prod(DJANGO_SECRET_KEY='clave', DJANGO_ALLOWED_HOSTS='academia.ec', DJANGO_CACHE='locmem')
+        self.assertIn('LocMemCache', locmem.CACHES['default']['BACKEND'])
+
+    def test_benchmark_mide_el_perfil_actual(self):
+        Usuario.objects.create_user(username='admin', password='x', rol=Usuario.Rol.ADMIN)
+        salida = io.StringIO()
+        call_command('benchmark_perfiles', medir=True, peticiones=2, rutas=['index', 'admin_dashboard'], stdout=salida)
+        medidas = json.loads(salida.getvalue())
+        self.assertEqual(set(medidas), {'index', 'admin_dashboard'})
+        self.assertEqual(len(medidas['admin_dashboard'][1]), 2)
@@ -3,23 +3,32 @@ from django.contrib.auth import authenticate, login
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from .models import Usuario
-from django.db import IntegrityError
+from .dashboard import obtener_metricas, estadisticas_cache
+from .importacion import encolar_importacion
+from .paginacion import paginar_por_cursor
+from django.db import IntegrityError, transaction
 from django.contrib.auth import logout
 from cursos.models import Curso, Nivel
 from horarios.models import Horario
-from matriculas.models import Matricula
+from matriculas.models import Matricula, EstadoMatricula
 from pagos.models import Pago, EstadoPago, PagoParcial
-from asistencias.models import Asistencia, EstadoAsistencia
+from asistencias.models import Asistencia, AsistenciaDiaria, EstadoAsistencia
+from asistencias.servicios import registrar_asistencias
 from datetime import datetime, date
+from decimal import Decimal, InvalidOperation
 from django.http import JsonResponse, HttpResponse
+from django.urls import reverse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.cache import never_cache
 from django.db import models
+from django.db.models import FilteredRelation, Q
+import io
 import json
 from aulas.models import Aula, Sede, Edificio, Piso
 from django.views.decorators.csrf import csrf_exempt
-from django.template.loader import get_template
-from xhtml2pdf import pisa
+from reportes.cache_pdf import clave_reporte, respuesta_pdf_cacheada, sello_datos
+from reportes.generacion import ErrorGeneracionPDF, renderizar_pdf
+from reportes.models import TipoReporte, TrabajoReporte
 
 
 @never_cache
@@ -61,39 +70,65 @@ def logout_view(request):
     logout(request)
     return redirect('login')
 
+def _buscar_usuarios(queryset, q, prefijo=''):
+    """Filtra por nombre, apellido, cédula o email (prefijo para recorrer relaciones)"""
+    condicion = Q()
+    for palabra in q.split():
+        condicion &= (
+            Q(**{f'{prefijo}first_name__icontains': palabra})
+            | Q(**{f'{prefijo}last_name__icontains': palabra})
+            | Q(**{f'{prefijo}cedula__icontains': palabra})
+            | Q(**{f'{prefijo}email__icontains': palabra})
+        )
+    return queryset.filter(condicion)
+
+
+def _importar_archivo(request, rol, vista):
+    """Encola la importación del archivo subido y vuelve al listado, que muestra su avance"""
+    archivo = request.FILES['archivo_importacion']
+    trabajo = encolar_importacion(archivo, rol, request.user)
+    return redirect(f"{reverse(vista)}?importacion={trabajo.id}")
+
+
+def _importacion_en_curso(request):
+    """Trabajo de importación de este usuario indicado en ?importacion=<id>, o None"""
+    trabajo_id = request.GET.get('importacion', '')
+    if not trabajo_id.isdigit():
+        return None
+    return TrabajoReporte.objects.filter(
+        id=trabajo_id, usuario=request.user, tipo=TipoReporte.IMPORTACION_USUARIOS
+    ).first()
+
+
+def _filtros_listado(request, *campos):
+    return {campo: request.GET.get(campo, '').strip() for campo in campos}
+
+
 @login_required
 def admin_dashboard(request):
     if request.user.rol != Usuario.Rol.ADMIN:
         return redirect('login')
     
-    # Obtener métricas del dashboard
-    total_estudiantes = Usuario.objects.filter(rol=Usuario.Rol.ESTUDIANTE).count()
-    total_profesores = Usuario.objects.filter(rol=Usuario.Rol.PROFESOR).count()
-    total_cursos = Curso.objects.count()
-    total_matriculas = Matricula.objects.filter(estado='ACTIVA').count()
-    
-    # Obtener pagos pendientes (primeros 5)
-    pagos_pendientes = Pago.objects.filter(estado=EstadoPago.PENDIENTE).select_related(
-        'matricula__estudiante', 'matricula__clase__curso'
-    )[:5]
-    
-    # Obtener clases de hoy
-    fecha_hoy = date.today()
-    clases_hoy = Horario.objects.filter(
-        fecha_inicio__lte=fecha_hoy,
-        fecha_fin__gte=fecha_hoy
-    ).select_related('curso', 'profesor').order_by('hora_inicio')
-    
+    # Métricas cacheadas; se invalidan al guardar/eliminar los modelos involucrados
+    metricas = obtener_metricas()
+
     return render(request, 'usuarios/admin_dashboard.html', {
         'active_tab': 'inicio',
-        'total_estudiantes': total_estudiantes,
-        'total_profesores': total_profesores,
-        'total_cursos': total_cursos,
-        'total_matriculas': total_matriculas,
-        'pagos_pendientes': pagos_pendientes,
-        'clases_hoy': clases_hoy,
+        'total_estudiantes': metricas['total_estudiantes'],
+        'total_profesores': metricas['total_profesores'],
+        'total_cursos': metricas['total_cursos'],
+        'total_matriculas': metricas['total_matriculas'],
+        'pagos_pendientes': metricas['pagos_pendientes'],
+        'clases_hoy': metricas['clases_hoy'],
     })
 
+@login_required
+def admin_dashboard_cache_stats(request):
+    """Contadores de hits/misses de la caché de métricas del dashboard"""
+    if request.user.rol != Usuario.Rol.ADMIN:
+        return JsonResponse({'error': 'No autorizado'}, status=403)
+    return JsonResponse(estadisticas_cache())
+
 @login_required
 def admin_profesores(request):
     if request.user.rol != Usuario.Rol.ADMIN:
@@ -102,8 +137,11 @@ def admin_profesores(request):
     # Variables para controlar modales
     mostrar_modal_duplicado = False
     mostrar_modal_duplicado_edicion = False
+    campos_duplicados = []
     
-    if request.method == 'POST':
+    if request.method == 'POST' and request.FILES.get('archivo_importacion'):
+        return _importar_archivo(request, Usuario.Rol.PROFESOR, 'admin_profesores')
+    elif request.method == 'POST':
         profesor_id = request.POST.get('profesor_id')
         # Eliminar profesor si el form de eliminación fue enviado
         if request.POST.get('eliminar_profesor') == '1' and profesor_id:
@@ -123,19 +161,12 @@ def admin_profesores(request):
                 telefono = request.POST.get('telefono', '')
                 password = request.POST.get('password', '')
                 confirm_password = request.POST.get('confirm_password', '')
-                # Validar duplicados en edición (excluyendo el profesor actual)
-                duplicados_edicion = []
-                
-                if cedula and Usuario.objects.filter(cedula=cedula).exclude(id=profesor.id).exists():
-                    duplicados_edicion.append(f'Ya existe un usuario con la cédula: {cedula}')
-                
-                if email and Usuario.objects.filter(email=email).exclude(id=profesor.id).exists():
-                    duplicados_edicion.append(f'Ya existe un usuario con el email: {email}')
-                
-                if telefono and Usuario.objects.filter(telefono=telefono).exclude(id=profesor.id).exists():
-                    duplicados_edicion.append(f'Ya existe un usuario con el teléfono: {telefono}')
+                # Validar duplicados en edición (excluyendo el profesor actual) en una sola consulta
+                campos_duplicados = Usuario.objects.campos_duplicados(
+                    excluir_id=profesor.id, cedula=cedula, email=email, telefono=telefono
+                )
                 
-                if duplicados_edicion:
+                if campos_duplicados:
                     # Mostrar modal de duplicado para edición
                     mostrar_modal_duplicado_edicion = True
                 else:
@@ -155,9 +186,17 @@ def admin_profesores(request):
                         else:
                             messages.error(request, 'Las contraseñas no coinciden.')
                             return redirect('admin_profesores')
-                    profesor.save()
-                    messages.success(request, 'Profesor actualizado exitosamente.')
-                    return redirect('admin_profesores')
+                    try:
+                        profesor.save()
+                    except IntegrityError:
+                        # Otro registro tomó el mismo dato entre la validación y el guardado
+                        campos_duplicados = Usuario.objects.campos_duplicados(
+                            excluir_id=profesor.id, cedula=cedula, email=email, telefono=telefono
+                        )
+                        mostrar_modal_duplicado_edicion = True
+                    else:
+                        messages.success(request, 'Profesor actualizado exitosamente.')
+                        return redirect('admin_profesores')
                     
             except Usuario.DoesNotExist:
                 messages.error(request, 'Profesor no encontrado.')
@@ -180,19 +219,12 @@ def admin_profesores(request):
                 messages.error(request, 'Las contraseñas no coinciden.')
                 return redirect('admin_profesores')
             
-            # Validar duplicados de manera simple
-            duplicado_encontrado = False
-            
-            if cedula and Usuario.objects.filter(cedula=cedula).exists():
-                duplicado_encontrado = True
-            
-            if email and Usuario.objects.filter(email=email).exists():
-                duplicado_encontrado = True
-            
-            if telefono and Usuario.objects.filter(telefono=telefono).exists():
-                duplicado_encontrado = True
+            # Validar duplicados en una sola consulta
+            campos_duplicados = Usuario.objects.campos_duplicados(
+                cedula=cedula, email=email, telefono=telefono
+            )
             
-            if duplicado_encontrado:
+            if campos_duplicados:
                 mostrar_modal_duplicado = True
             else:
                 try:
@@ -212,12 +244,22 @@ def admin_profesores(request):
                     messages.success(request, 'Profesor registrado exitosamente.')
                     return redirect('admin_profesores')
                 except IntegrityError:
+                    # Otro registro tomó el mismo dato entre la validación y el alta
+                    campos_duplicados = Usuario.objects.campos_duplicados(
+                        cedula=cedula, email=email, telefono=telefono
+                    )
                     mostrar_modal_duplicado = True
     
-    profesores = Usuario.objects.filter(rol=Usuario.Rol.PROFESOR)
+    filtros = _filtros_listado(request, 'q')
+    profesores = _buscar_usuarios(Usuario.objects.filter(rol=Usuario.Rol.PROFESOR), filtros['q'])
+    pagina = paginar_por_cursor(profesores, request, orden=('last_name', 'first_name', 'id'))
     return render(request, 'usuarios/admin_profesores.html', {
-        'profesores': profesores,
+        'profesores': pagina,
+        'pagina': pagina,
+        'filtros': filtros,
         'active_tab': 'profesores',
+        'campos_duplicados': campos_duplicados,
+        'importacion': _importacion_en_curso(request),
         'mostrar_modal_duplicado': mostrar_modal_duplicado,
         'mostrar_modal_duplicado_edicion': mostrar_modal_duplicado_edicion
     })
@@ -328,8 +370,11 @@ def admin_estudiantes(request):
     # Variables para controlar modales
     mostrar_modal_duplicado = False
     mostrar_modal_duplicado_edicion = False
+    campos_duplicados = []
     
-    if request.method == 'POST':
+    if request.method == 'POST' and request.FILES.get('archivo_importacion'):
+        return _importar_archivo(request, Usuario.Rol.ESTUDIANTE, 'admin_estudiantes')
+    elif request.method == 'POST':
         estudiante_id = request.POST.get('estudiante_id')
         # Eliminar estudiante si el form de eliminación fue enviado
         if request.POST.get('eliminar_estudiante') == '1' and estudiante_id:
@@ -349,19 +394,12 @@ def admin_estudiantes(request):
                 telefono = request.POST.get('telefono', '')
                 password = request.POST.get('password', '')
                 confirm_password = request.POST.get('confirm_password', '')
-                # Validar duplicados en edición (excluyendo el estudiante actual)
-                duplicados_edicion = []
-                
-                if cedula and Usuario.objects.filter(cedula=cedula).exclude(id=estudiante.id).exists():
-                    duplicados_edicion.append(f'Ya existe un usuario con la cédula: {cedula}')
-                
-                if email and Usuario.objects.filter(email=email).exclude(id=estudiante.id).exists():
-                    duplicados_edicion.append(f'Ya existe un usuario con el email: {email}')
-                
-                if telefono and Usuario.objects.filter(telefono=telefono).exclude(id=estudiante.id).exists():
-                    duplicados_edicion.append(f'Ya existe un usuario con el teléfono: {telefono}')
+                # Validar duplicados en edición (excluyendo el estudiante actual) en una sola consulta
+                campos_duplicados = Usuario.objects.campos_duplicados(
+                    excluir_id=estudiante.id, cedula=cedula, email=email, telefono=telefono
+                )
                 
-                if duplicados_edicion:
+                if campos_duplicados:
                     # Mostrar modal de duplicado para edición
                     mostrar_modal_duplicado_edicion = True
                 else:
@@ -380,9 +418,17 @@ def admin_estudiantes(request):
                         else:
                             messages.error(request, 'Las contraseñas no coinciden.')
                             return redirect('admin_estudiantes')
-                    estudiante.save()
-                    messages.success(request, 'Estudiante actualizado exitosamente.')
-                    return redirect('admin_estudiantes')
+                    try:
+                        estudiante.save()
+                    except IntegrityError:
+                        # Otro registro tomó el mismo dato entre la validación y el guardado
+                        campos_duplicados = Usuario.objects.campos_duplicados(
+                            excluir_id=estudiante.id, cedula=cedula, email=email, telefono=telefono
+                        )
+                        mostrar_modal_duplicado_edicion = True
+                    else:
+                        messages.success(request, 'Estudiante actualizado exitosamente.')
+                        return redirect('admin_estudiantes')
                     
             except Usuario.DoesNotExist:
                 messages.error(request, 'Estudiante no encontrado.')
@@ -405,19 +451,12 @@ def admin_estudiantes(request):
                 messages.error(request, 'Las contraseñas no coinciden.')
                 return redirect('admin_estudiantes')
             
-            # Validar duplicados de manera simple
-            duplicado_encontrado = False
-            
-            if cedula and Usuario.objects.filter(cedula=cedula).exists():
-                duplicado_encontrado = True
-            
-            if email and Usuario.objects.filter(email=email).exists():
-                duplicado_encontrado = True
-            
-            if telefono and Usuario.objects.filter(telefono=telefono).exists():
-                duplicado_encontrado = True
+            # Validar duplicados en una sola consulta
+            campos_duplicados = Usuario.objects.campos_duplicados(
+                cedula=cedula, email=email, telefono=telefono
+            )
             
-            if duplicado_encontrado:
+            if campos_duplicados:
                 mostrar_modal_duplicado = True
             else:
                 try:
@@ -437,12 +476,22 @@ def admin_estudiantes(request):
                     messages.success(request, 'Estudiante registrado exitosamente.')
                     return redirect('admin_estudiantes')
                 except IntegrityError:
+                    # Otro registro tomó el mismo dato entre la validación y el alta
+                    campos_duplicados = Usuario.objects.campos_duplicados(
+                        cedula=cedula, email=email, telefono=telefono
+                    )
                     mostrar_modal_duplicado = True
     
-    estudiantes = Usuario.objects.filter(rol=Usuario.Rol.ESTUDIANTE)
+    filtros = _filtros_listado(request, 'q')
+    estudiantes = _buscar_usuarios(Usuario.objects.filter(rol=Usuario.Rol.ESTUDIANTE), filtros['q'])
+    pagina = paginar_por_cursor(estudiantes, request, orden=('last_name', 'first_name', 'id'))
     return render(request, 'usuarios/admin_estudiantes.html', {
-        'estudiantes': estudiantes,
+        'estudiantes': pagina,
+        'pagina': pagina,
+        'filtros': filtros,
         'active_tab': 'estudiantes',
+        'campos_duplicados': campos_duplicados,
+        'importacion': _importacion_en_curso(request),
         'mostrar_modal_duplicado': mostrar_modal_duplicado,
         'mostrar_modal_duplicado_edicion': mostrar_modal_duplicado_edicion
     })
@@ -456,12 +505,8 @@ def admin_clases(request):
     profesores = Usuario.objects.filter(rol=Usuario.Rol.PROFESOR)
     # CAMBIO: Mostrar todas las aulas, no sólo las activas
     aulas = Aula.objects.all().order_by('sede', 'edificio', 'piso', 'nombre')
-    clases = Horario.objects.select_related('curso', 'profesor', 'aula').all().order_by('-fecha_inicio', '-hora_inicio')
-
-    # Calcular cupos_disponibles para cada clase
-    for clase in clases:
-        total_matriculados = Matricula.objects.filter(clase=clase, estado='ACTIVA').count()
-        clase.cupos_disponibles = max(clase.cupos - total_matriculados, 0)
+    # cupos_disponibles se calcula en la misma consulta (with_occupancy)
+    clases = Horario.objects.select_related('curso', 'profesor', 'aula').with_occupancy().order_by('-fecha_inicio', '-hora_inicio')
 
     if request.method == 'POST':
         clase_id = request.POST.get('clase_id')
@@ -551,44 +596,65 @@ def admin_matriculas(request):
 
         try:
             estudiante = Usuario.objects.get(id=estudiante_id, rol=Usuario.Rol.ESTUDIANTE)
-            clase = Horario.objects.get(id=clase_id)
+            with transaction.atomic():
+                # Bloquear la clase para que dos matrículas simultáneas no superen los cupos
+                clase = Horario.objects.select_for_update().select_related('curso').get(id=clase_id)
 
-            if Matricula.objects.filter(estudiante=estudiante, clase=clase).exists():
-                messages.error(request, "Este estudiante ya está matriculado en esta clase.")
-            else:
-                matricula = Matricula.objects.create(
-                    estudiante=estudiante,
-                    clase=clase,
-                    observaciones=observaciones
-                )
-                
-                # Crear automáticamente el pago pendiente
-                if clase.curso and clase.curso.precio > 0:
-                    Pago.objects.create(
-                        matricula=matricula,
-                        monto=clase.curso.precio,
-                        estado=EstadoPago.PENDIENTE,
-                        observaciones=f"Pago automático generado para el curso {clase.curso.nombre}"
+                if Matricula.objects.filter(estudiante=estudiante, clase=clase).exists():
+                    messages.error(request, "Este estudiante ya está matriculado en esta clase.")
+                elif clase.inscritos_activos >= clase.cupos:
+                    messages.error(request, "La clase no tiene cupos disponibles.")
+                else:
+                    matricula = Matricula.objects.create(
+                        estudiante=estudiante,
+                        clase=clase,
+                        observaciones=observaciones
                     )
-                
-                messages.success(request, "Matrícula registrada exitosamente y pago pendiente creado.")
-                return redirect('admin_matriculas')
+
+                    # Crear automáticamente el pago pendiente
+                    if clase.curso and clase.curso.precio > 0:
+                        Pago.objects.create(
+                            matricula=matricula,
+                            monto=clase.curso.precio,
+                            estado=EstadoPago.PENDIENTE,
+                            observaciones=f"Pago automático generado para el curso {clase.curso.nombre}"
+                        )
+
+                    messages.success(request, "Matrícula registrada exitosamente y pago pendiente creado.")
+                    return redirect('admin_matriculas')
 
         except (Usuario.DoesNotExist, Horario.DoesNotExist):
             messages.error(request, "Estudiante o clase inválido.")
 
     # GET o POST con errores: mostrar datos
-    matriculas = Matricula.objects.select_related('estudiante', 'clase', 'clase__curso', 'clase__profesor')
+    filtros = _filtros_listado(request, 'q', 'estado', 'curso', 'profesor', 'fecha')
+    matriculas = _buscar_usuarios(
+        Matricula.objects.select_related('estudiante', 'clase', 'clase__curso', 'clase__profesor'),
+        filtros['q'], prefijo='estudiante__',
+    )
+    if filtros['estado']:
+        matriculas = matriculas.filter(estado=filtros['estado'])
+    if filtros['curso'].isdigit():
+        matriculas = matriculas.filter(clase__curso_id=filtros['curso'])
+    if filtros['profesor'].isdigit():
+        matriculas = matriculas.filter(clase__profesor_id=filtros['profesor'])
+    if filtros['fecha']:
+        try:
+            matriculas = matriculas.filter(fecha_matricula=date.fromisoformat(filtros['fecha']))
+        except ValueError:
+            pass
+    pagina = paginar_por_cursor(matriculas, request, orden=('-fecha_matricula', '-id'))
     estudiantes = Usuario.objects.filter(rol=Usuario.Rol.ESTUDIANTE)
-    clases = Horario.objects.select_related('curso', 'profesor', 'aula').all().order_by('-fecha_inicio', '-hora_inicio')
-
-    # Calcular cupos_disponibles para cada clase (después de registrar matrícula)
-    for clase in clases:
-        total_matriculados = Matricula.objects.filter(clase=clase, estado='ACTIVA').count()
-        clase.cupos_disponibles = max(clase.cupos - total_matriculados, 0)
+    # cupos_disponibles se calcula en la misma consulta (después de registrar matrícula)
+    clases = Horario.objects.select_related('curso', 'profesor', 'aula').with_occupancy().order_by('-fecha_inicio', '-hora_inicio')
 
     return render(request, 'usuarios/admin_matriculas.html', {
-        'matriculas': matriculas,
+        'matriculas': pagina,
+        'pagina': pagina,
+        'filtros': filtros,
+        'cursos': Curso.objects.order_by('nombre'),
+        'profesores': Usuario.objects.filter(rol=Usuario.Rol.PROFESOR).order_by('first_name', 'last_name'),
+        'estados_matricula': EstadoMatricula.choices,
         'estudiantes': estudiantes,
         'clases': clases,
         'active_tab': 'matriculas',
@@ -599,15 +665,17 @@ def admin_pagos(request):
     if request.user.rol != Usuario.Rol.ADMIN:
         return redirect('login')
 
-    pagos = Pago.objects.select_related('matricula', 'matricula__estudiante', 'matricula__clase', 'matricula__clase__curso').order_by('-fecha_pago')
-    matriculas = Matricula.objects.select_related('estudiante', 'clase', 'clase__curso').all()
-
     if request.method == 'POST':
         pago_id = request.POST.get('pago_id')
         matricula_id = request.POST.get('matricula')
-        monto_pago = float(request.POST.get('monto', 0))
         observaciones = request.POST.get('observaciones', '')
 
+        try:
+            monto_pago = Decimal(request.POST.get('monto', '0'))
+        except InvalidOperation:
+            messages.error(request, 'Monto inválido.')
+            return redirect('admin_pagos')
+
         try:
             pago = Pago.objects.get(id=pago_id)
             # Crear el pago parcial
@@ -623,9 +691,34 @@ def admin_pagos(request):
         except Pago.DoesNotExist:
             messages.error(request, 'Pago no encontrado.')
 
+    filtros = _filtros_listado(request, 'q', 'estado', 'curso', 'monto_min', 'fecha')
+    pagos = _buscar_usuarios(
+        Pago.objects.select_related('matricula', 'matricula__estudiante', 'matricula__clase', 'matricula__clase__curso').with_saldo(),
+        filtros['q'], prefijo='matricula__estudiante__',
+    )
+    if filtros['estado']:
+        pagos = pagos.filter(estado=filtros['estado'])
+    if filtros['curso'].isdigit():
+        pagos = pagos.filter(matricula__clase__curso_id=filtros['curso'])
+    try:
+        if filtros['monto_min']:
+            pagos = pagos.filter(monto__gte=Decimal(filtros['monto_min']))
+        if filtros['fecha']:
+            pagos = pagos.filter(fecha_pago=date.fromisoformat(filtros['fecha']))
+    except (InvalidOperation, ValueError):
+        pass
+    pagina = paginar_por_cursor(pagos.prefetch_related('pagos_parciales'), request, orden=('-fecha_pago', '-id'))
+    # El historial JSON solo incluye las matrículas de la página actual
+    matriculas = Matricula.objects.filter(
+        id__in={pago.matricula_id for pago in pagina}
+    ).prefetch_related('pagos')
+
     return render(request, 'usuarios/admin_pagos.html', {
         'active_tab': 'pagos',
-        'pagos': pagos,
+        'pagos': pagina,
+        'pagina': pagina,
+        'filtros': filtros,
+        'cursos': Curso.objects.order_by('nombre'),
         'matriculas': matriculas,
         'estados_pago': EstadoPago.choices,
     })
@@ -651,48 +744,11 @@ def admin_asistencias(request):
     if request.user.rol != Usuario.Rol.ADMIN:
         return redirect('login')
 
-    # Obtener todas las asistencias
-    asistencias = Asistencia.objects.select_related(
-        'matricula__estudiante', 
-        'matricula__clase__curso',
-        'clase'
-    ).order_by('-fecha', 'matricula__estudiante__first_name')
-
-    # Agrupar asistencias por clase y fecha
-    historial_clases = {}
-    for asistencia in asistencias:
-        key = (asistencia.clase.id, asistencia.fecha)
-        if key not in historial_clases:
-            historial_clases[key] = {
-                'clase': asistencia.clase,
-                'curso': asistencia.curso,
-                'fecha': asistencia.fecha,
-                'profesor': asistencia.clase.profesor,
-                'asistencias': []
-            }
-        historial_clases[key]['asistencias'].append(asistencia)
-
-    # CAMBIO: Obtener todas las matrículas agrupadas por clase para el JavaScript
-    # Esto es más simple que hacer una llamada API
+    # Los estudiantes de cada clase se piden bajo demanda a admin_asistencias_roster
     clases_con_estudiantes = Horario.objects.select_related('curso', 'profesor').annotate(
         total_estudiantes=models.Count('matriculas')
     ).filter(total_estudiantes__gt=0).order_by('-fecha_inicio', 'hora_inicio')
 
-    # NUEVO: Preparar datos de estudiantes por clase para JavaScript
-    # Crear un diccionario con todas las matrículas organizadas por clase
-    estudiantes_por_clase = {}
-    for clase in clases_con_estudiantes:
-        matriculas = Matricula.objects.filter(clase=clase).select_related('estudiante')
-        estudiantes_por_clase[str(clase.id)] = [
-            {
-                'id': matricula.estudiante.id,
-                'nombre': matricula.estudiante.get_full_name(),
-                'cedula': matricula.estudiante.cedula,
-                'matricula_id': matricula.id,
-            }
-            for matricula in matriculas
-        ]
-
     if request.method == 'POST':
         # Eliminar asistencia individual
         if request.POST.get('eliminar_asistencia') == '1':
@@ -713,46 +769,27 @@ def admin_asistencias(request):
             try:
                 clase = Horario.objects.get(id=clase_id)
                 fecha_asistencia = datetime.strptime(fecha_str, '%Y-%m-%d').date()
-                
-                # Obtener todas las matrículas de esta clase
-                matriculas_clase = Matricula.objects.filter(clase=clase).select_related('estudiante')
-                
-                if not matriculas_clase.exists():
+
+                # Estado y observaciones enviados por estudiante (estado_<id>, observaciones_<id>)
+                registros = {}
+                for clave, estado in request.POST.items():
+                    if clave.startswith('estado_'):
+                        estudiante_id = clave[len('estado_'):]
+                        registros[estudiante_id] = {
+                            'estado': estado,
+                            'observaciones': request.POST.get(f'observaciones_{estudiante_id}', ''),
+                        }
+                # Los matriculados sin estado enviado quedan como ausentes
+                resultado = registrar_asistencias(
+                    clase, fecha_asistencia, registros, estado_por_defecto=EstadoAsistencia.AUSENTE
+                )
+                asistencias_creadas = resultado['creadas']
+                asistencias_actualizadas = resultado['actualizadas']
+
+                if not asistencias_creadas and not asistencias_actualizadas:
                     messages.warning(request, 'No hay estudiantes matriculados en esta clase.')
                     return redirect('admin_asistencias')
-                
-                asistencias_creadas = 0
-                asistencias_actualizadas = 0
-                
-                for matricula in matriculas_clase:
-                    estudiante_id = str(matricula.estudiante.id)
-                    estado = request.POST.get(f'estado_{estudiante_id}', EstadoAsistencia.AUSENTE)
-                    observaciones = request.POST.get(f'observaciones_{estudiante_id}', '')
-                    
-                    # Verificar si ya existe asistencia para esta fecha y matrícula
-                    asistencia_existente = Asistencia.objects.filter(
-                        matricula=matricula, 
-                        fecha=fecha_asistencia
-                    ).first()
-                    
-                    if asistencia_existente:
-                        # Actualizar asistencia existente
-                        asistencia_existente.estado = estado
-                        asistencia_existente.observaciones = observaciones
-                        asistencia_existente.clase = clase
-                        asistencia_existente.save()
-                        asistencias_actualizadas += 1
-                    else:
-                        # Crear nueva asistencia
-                        Asistencia.objects.create(
-                            matricula=matricula,
-                            clase=clase,
-                            fecha=fecha_asistencia,
-                            estado=estado,
-                            observaciones=observaciones
-                        )
-                        asistencias_creadas += 1
-                
+
                 if asistencias_creadas > 0 and asistencias_actualizadas > 0:
                     messages.success(request, f'Asistencias procesadas: {asistencias_creadas} creadas, {asistencias_actualizadas} actualizadas.')
                 elif asistencias_creadas > 0:
@@ -768,73 +805,112 @@ def admin_asistencias(request):
                 messages.error(request, 'Clase no encontrada o fecha inválida.')
                 return redirect('admin_asistencias')
 
-    # Filtros para la vista
-    fecha_filtro = request.GET.get('fecha_filtro')
-    clase_filtro = request.GET.get('clase_filtro')
-    
-    if fecha_filtro:
+    # Historial: una fila por sesión (clase, fecha) desde el resumen diario,
+    # filtrado y paginado en la base de datos. El detalle se pide al expandir.
+    # El resumen se refresca al registrar asistencias y con refresh_attendance_rollup
+    # programado; la página solo lo lee.
+    filtros = _filtros_listado(request, 'fecha_filtro', 'clase_filtro', 'curso', 'profesor')
+    sesiones = AsistenciaDiaria.objects.select_related('clase__curso', 'clase__profesor', 'clase__aula')
+    if filtros['fecha_filtro']:
         try:
-            fecha_obj = datetime.strptime(fecha_filtro, '%Y-%m-%d').date()
-            asistencias = asistencias.filter(fecha=fecha_obj)
-        except ValueError:
-            pass
-    
-    if clase_filtro:
-        try:
-            asistencias = asistencias.filter(clase_id=clase_filtro)
+            sesiones = sesiones.filter(fecha=datetime.strptime(filtros['fecha_filtro'], '%Y-%m-%d').date())
         except ValueError:
             pass
-
-    # Si hay filtro, filtra historial_clases
-    if fecha_filtro or clase_filtro:
-        historial_clases = {
-            k: v for k, v in historial_clases.items()
-            if (not fecha_filtro or str(v['fecha']) == fecha_filtro)
-            and (not clase_filtro or str(v['clase'].id) == clase_filtro)
-        }
-
-    # NUEVO: Convertir historial_clases a formato JSON serializable
-    historial_clases_json = {}
-    for idx, (key, clase_info) in enumerate(historial_clases.items()):
-        historial_clases_json[str(idx)] = {
-            'clase': {
-                'id': clase_info['clase'].id,
-                'aula': str(clase_info['clase'].aula) if clase_info['clase'].aula else "",
-                'hora_inicio': str(clase_info['clase'].hora_inicio),
-                'hora_fin': str(clase_info['clase'].hora_fin),
-            },
-            'curso': {
-                'nombre': clase_info['curso'].nombre,
-            },
-            'fecha': str(clase_info['fecha']),
-            'profesor': {
-                'first_name': clase_info['profesor'].first_name if clase_info['profesor'] else "",
-                'last_name': clase_info['profesor'].last_name if clase_info['profesor'] else "",
-            },
-            'asistencias': [
-                {
-                    'estudiante': {
-                        'first_name': asistencia.estudiante.first_name,
-                        'last_name': asistencia.estudiante.last_name,
-                        'cedula': asistencia.estudiante.cedula,
-                    },
-                    'estado': asistencia.estado,
-                    'observaciones': asistencia.observaciones or '',
-                }
-                for asistencia in clase_info['asistencias']
-            ]
-        }
+    if filtros['clase_filtro'].isdigit():
+        sesiones = sesiones.filter(clase_id=filtros['clase_filtro'])
+    if filtros['curso'].isdigit():
+        sesiones = sesiones.filter(clase__curso_id=filtros['curso'])
+    if filtros['profesor'].isdigit():
+        sesiones = sesiones.filter(clase__profesor_id=filtros['profesor'])
+    pagina = paginar_por_cursor(sesiones, request, orden=('-fecha', '-id'))
 
     return render(request, 'usuarios/admin_asistencias.html', {
         'active_tab': 'asistencias',
-        'historial_clases': historial_clases,
-        'historial_clases_json': json.dumps(historial_clases_json),
+        'sesiones': pagina,
+        'pagina': pagina,
+        'filtros': filtros,
+        'cursos': Curso.objects.order_by('nombre'),
+        'profesores': Usuario.objects.filter(rol=Usuario.Rol.PROFESOR).order_by('first_name', 'last_name'),
         'clases': clases_con_estudiantes,
-        'estudiantes_por_clase_json': json.dumps(estudiantes_por_clase),
         'estados_asistencia': EstadoAsistencia.choices,
         'fecha_hoy': date.today().strftime('%Y-%m-%d'),
-        'fecha_filtro': fecha_filtro,
-        'clase_filtro': clase_filtro,
+        'fecha_filtro': filtros['fecha_filtro'],
+        'clase_filtro': filtros['clase_filtro'],
+    })
+
+@login_required
+@require_http_methods(["GET"])
+def admin_asistencias_detalle(request):
+    """Asistencias de una sesión (clase, fecha) del historial, pedidas al expandirla"""
+    if request.user.rol != Usuario.Rol.ADMIN:
+        return JsonResponse({'error': 'No autorizado'}, status=403)
+
+    try:
+        clase_id = int(request.GET['clase_id'])
+        fecha_obj = datetime.strptime(request.GET['fecha'], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'Datos inválidos'}, status=400)
+
+    asistencias = Asistencia.objects.filter(clase_id=clase_id, fecha=fecha_obj).order_by(
+        'matricula__estudiante__first_name', 'matricula__estudiante__last_name'
+    ).values_list(
+        'id', 'estado', 'observaciones',
+        'matricula__estudiante__first_name', 'matricula__estudiante__last_name', 'matricula__estudiante__cedula',
+    )
+    return JsonResponse({
+        'clase_id': clase_id,
+        'fecha': str(fecha_obj),
+        'asistencias': [
+            {
+                'id': asistencia_id,
+                'estudiante': {'first_name': first_name, 'last_name': last_name, 'cedula': cedula or ''},
+                'estado': estado,
+                'observaciones': observaciones or '',
+            }
+            for asistencia_id, estado, observaciones, first_name, last_name, cedula in asistencias
+        ],
+    })
+
+def _roster_clase(clase_id, fecha):
+    """
+    Estudiantes matriculados en la clase junto con su asistencia de esa fecha
+    (si existe), en una sola consulta con LEFT JOIN.
+    """
+    filas = Matricula.objects.filter(clase_id=clase_id).annotate(
+        asistencia_fecha=FilteredRelation('asistencias', condition=Q(asistencias__fecha=fecha))
+    ).order_by('estudiante__first_name', 'estudiante__last_name', 'id').values_list(
+        'id', 'estudiante_id', 'estudiante__first_name', 'estudiante__last_name',
+        'estudiante__cedula', 'asistencia_fecha__estado', 'asistencia_fecha__observaciones',
+    )
+    return [
+        {
+            'id': estudiante_id,
+            'nombre': f"{first_name} {last_name}".strip(),
+            'cedula': cedula or '',
+            'matricula_id': matricula_id,
+            'estado': estado,
+            'observaciones': observaciones or '',
+        }
+        for matricula_id, estudiante_id, first_name, last_name, cedula, estado, observaciones in filas
+    ]
+
+@login_required
+@require_http_methods(["GET"])
+def admin_asistencias_roster(request):
+    """Lista de estudiantes de una clase con la asistencia ya registrada para una fecha"""
+    if request.user.rol != Usuario.Rol.ADMIN:
+        return JsonResponse({'error': 'No autorizado'}, status=403)
+
+    try:
+        clase_id = int(request.GET['clase_id'])
+        fecha_obj = datetime.strptime(request.GET['fecha'], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'Datos inválidos'}, status=400)
+
+    return JsonResponse({
+        'clase_id': clase_id,
+        'fecha': str(fecha_obj),
+        'estudiantes': _roster_clase(clase_id, fecha_obj),
     })
 
 @login_required
@@ -854,37 +930,9 @@ def obtener_asistencias_fecha(request):
         
         fecha_obj = datetime.strptime(fecha_str, '%Y-%m-%d').date()
         
-        # Buscar asistencias existentes para estos estudiantes en esta fecha
-        asistencias_existentes = Asistencia.objects.filter(
-            matricula__estudiante__id__in=estudiante_ids,
-            fecha=fecha_obj
-        ).select_related('matricula__estudiante')
-        
-        # Crear diccionario con estados de asistencia por estudiante
-        resultado = {}
-        for asistencia in asistencias_existentes:
-            resultado[asistencia.matricula.estudiante.id] = {
-                'estado': asistencia.estado,
-                'observaciones': asistencia.observaciones or ''
-            }
-        
-        return JsonResponse(resultado)
-        
-    except (ValueError, KeyError) as e:
-        return JsonResponse({'error': 'Datos inválidos'}, status=400)
-    except Exception as e:
-        return JsonResponse({'error': 'Error interno del servidor'}, status=500)
-    
-    try:
-        data = json.loads(request.body)
-        clase_id = data.get('clase_id')
-        fecha_str = data.get('fecha')
-        estudiante_ids = data.get('estudiante_ids', [])
-        
-        fecha_obj = datetime.strptime(fecha_str, '%Y-%m-%d').date()
-        
-        # Buscar asistencias existentes para estos estudiantes en esta fecha
+        # Asistencias de esta clase en esta fecha (un estudiante puede estar en varias clases)
         asistencias_existentes = Asistencia.objects.filter(
+            clase_id=clase_id,
             matricula__estudiante__id__in=estudiante_ids,
             fecha=fecha_obj
         ).select_related('matricula__estudiante')
@@ -899,7 +947,7 @@ def obtener_asistencias_fecha(request):
         
         return JsonResponse(resultado)
         
-    except (ValueError, KeyError) as e:
+    except (ValueError, KeyError, TypeError) as e:
         return JsonResponse({'error': 'Datos inválidos'}, status=400)
     except Exception as e:
         return JsonResponse({'error': 'Error interno del servidor'}, status=500)
@@ -973,15 +1021,8 @@ def admin_aulas(request):
                 messages.success(request, f'Aula "{nombre}" registrada exitosamente.')
                 return redirect('admin_aulas')
 
-    aulas = Aula.objects.all().prefetch_related('clases_aula__matriculas')
-    for aula in aulas:
-        total_matriculados = 0
-        for clase in aula.clases_aula.all():
-            for matricula in clase.matriculas.all():
-                if matricula.estado == 'ACTIVA':
-                    total_matriculados += 1
-        # Nunca mostrar negativos
-        aula.puestos_disponibles = max(aula.capacidad - total_matriculados, 0)
+    # puestos_disponibles se calcula en la base de datos (nunca negativo)
+    aulas = Aula.objects.with_occupancy()
 
     context = {
         'aulas': aulas,
@@ -994,24 +1035,71 @@ def admin_aulas(request):
     }
     return render(request, 'usuarios/admin_aulas.html', context)
 
+@login_required
+def admin_aulas_ocupacion(request):
+    """
+    Ocupación por aula agrupada por sede/edificio/piso en formato JSON
+    """
+    if request.user.rol != Usuario.Rol.ADMIN:
+        return JsonResponse({'error': 'No autorizado'}, status=403)
+
+    aulas = Aula.objects.with_occupancy()
+    for campo in ('sede', 'edificio', 'piso'):
+        valor = request.GET.get(campo)
+        if valor:
+            aulas = aulas.filter(**{campo: valor})
+
+    grupos = {}
+    for aula in aulas:
+        key = (aula.sede, aula.edificio, aula.piso)
+        if key not in grupos:
+            grupos[key] = {
+                'sede': aula.sede,
+                'edificio': aula.edificio,
+                'piso': aula.piso,
+                'ubicacion': aula.ubicacion_completa,
+                'capacidad': 0,
+                'matriculados': 0,
+                'aulas': [],
+            }
+        grupo = grupos[key]
+        grupo['capacidad'] += aula.capacidad
+        grupo['matriculados'] += aula.total_matriculados
+        grupo['aulas'].append({
+            'id': aula.id,
+            'nombre': aula.nombre,
+            'activa': aula.activa,
+            'capacidad': aula.capacidad,
+            'matriculados': aula.total_matriculados,
+            'puestos_disponibles': aula.puestos_disponibles,
+            'ocupacion': round(aula.total_matriculados / aula.capacidad * 100, 1) if aula.capacidad else 0,
+        })
+
+    for grupo in grupos.values():
+        grupo['ocupacion'] = round(grupo['matriculados'] / grupo['capacidad'] * 100, 1) if grupo['capacidad'] else 0
+
+    return JsonResponse({'grupos': list(grupos.values())})
+
 @login_required
 def factura_pago_pdf(request, pago_id):
     try:
         pago = Pago.objects.select_related('matricula__estudiante', 'matricula__clase__curso').get(id=pago_id)
     except Pago.DoesNotExist:
         return HttpResponse("Pago no encontrado.", status=404)
-    usuario_generador = request.user
-    fecha_generacion = datetime.now()
-    template = get_template('reportes/factura_pago_pdf.html')
-    html = template.render({
-        'pago': pago,
-        'usuario_generador': usuario_generador,
-        'fecha_generacion': fecha_generacion,
-    })
+    # Los abonos actualizan fecha_modificacion del pago (pagos.signals)
+    sello = sello_datos(Pago.objects.filter(id=pago_id))
+    clave = clave_reporte('FACTURA', {'pago': pago_id}, request.user.id, sello)
+
+    def generar():
+        result = io.BytesIO()
+        renderizar_pdf('reportes/factura_pago_pdf.html', {
+            'pago': pago,
+            'usuario_generador': request.user,
+            'fecha_generacion': datetime.now(),
+        }, result)
+        return result.getvalue()
 
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'filename="factura_pago_{pago_id}.pdf"'
-    pisa_status = pisa.CreatePDF(html, dest=response)
-    if pisa_status.err:
+    try:
+        return respuesta_pdf_cacheada(request, clave, generar, f'factura_pago_{pago_id}.pdf')
+    except ErrorGeneracionPDF:
         return HttpResponse("Error al generar el PDF", status=500)
-    return response